@@ -9,5 +9,8 @@ pip install -r requirements.txt
 # Apply migrations
 python manage.py migrate
 
+# Create the shared cache table (no-op when it exists or REDIS_URL is set)
+python manage.py createcachetable
+
 # Collect static files
 python manage.py collectstatic --noinput
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class EmailsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'emails'
+
+    def ready(self):
+        # Compile the email templates once per process instead of per message.
+        from .rendering import renderer
+        renderer.load()
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.template import engines
+
+from emails.rendering import renderer
+
+
+class Command(BaseCommand):
+    help = "Measure per-message render cost of precompiled email templates vs compiling per message."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1000)
+        parser.add_argument('--template', default='booking_confirmation', choices=renderer.TEMPLATE_NAMES)
+
+    def handle(self, *args, **options):
+        count = options['count']
+        name = options['template']
+        contexts = [self._context(name, i) for i in range(count)]
+
+        renderer.load()
+        start = time.perf_counter()
+        renderer.render_many(name, contexts)
+        precompiled = time.perf_counter() - start
+
+        # Baseline: read and compile the templates for every message.
+        engine = engines['django']
+        start = time.perf_counter()
+        for context in contexts:
+            for suffix in ('_subject.txt', '.txt', '.html'):
+                template = engine.engine.find_template(f'emails/{name}{suffix}')[0]
+                engine.from_string(template.source).render(context)
+        uncached = time.perf_counter() - start
+
+        self.stdout.write(f"template={name} messages={count}")
+        self.stdout.write(f"precompiled: {precompiled / count * 1e6:.1f} µs/message")
+        self.stdout.write(f"compile per message: {uncached / count * 1e6:.1f} µs/message")
+
+    def _context(self, name, i):
+        if name in ('order_confirmation', 'payment_received'):
+            return {
+                'order': {
+                    'id': i, 'customer_name': f'Customer {i}', 'customer_phone': '0712345678',
+                    'total_amount': '1500.00', 'transaction_id': f'QWE{i:07d}',
+                },
+                'items': [{'name': 'Eggs (tray)', 'quantity': 2}, {'name': 'Honey 500g', 'quantity': 1}],
+            }
+        return {'name': f'Guest {i}', 'date': '2026-11-01', 'time': '10:00', 'guests': i % 8 + 1}
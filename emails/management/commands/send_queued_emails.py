@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from emails.outbox import drain_outbox
+
+
+class Command(BaseCommand):
+    help = "Deliver queued emails from the outbox (run from cron, or with --loop as a worker)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--loop', action='store_true', help="Keep polling instead of exiting once drained.")
+        parser.add_argument('--interval', type=float, default=10.0, help="Seconds between polls with --loop.")
+
+    def handle(self, *args, **options):
+        while True:
+            stats = drain_outbox(options['batch_size'])
+            self.stdout.write(
+                f"sent={stats['sent']} retried={stats['retried']} failed={stats['failed']}"
+            )
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
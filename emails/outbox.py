@@ -0,0 +1,233 @@
+# emails/outbox.py
+"""
+Email outbox.
+
+Views call ``enqueue_email`` which only writes an ``OutboundEmail`` row, so the
+request never waits on SMTP. ``flush_outbox`` claims a batch of due rows and
+delivers them over a single backend connection, retrying failures with
+exponential backoff. ``outbox_worker`` runs ``flush_outbox`` in a background
+thread; the ``send_queued_emails`` management command does the same from cron.
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import OutboundEmail
+from .rendering import RenderedEmail, build_multipart_message, renderer
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _wake_worker():
+    if _setting('EMAIL_OUTBOX_WORKER', True):
+        transaction.on_commit(outbox_worker.wake)
+
+
+def enqueue_email(subject, body, recipients, from_email=None, html_body=""):
+    """
+    Store an email for background delivery and return the ``OutboundEmail`` row.
+    The background worker is woken once the surrounding transaction commits.
+    """
+    message = OutboundEmail.objects.create(
+        subject=subject,
+        body=body,
+        html_body=html_body,
+        from_email=from_email or "",
+        recipients=list(recipients),
+    )
+    _wake_worker()
+    return message
+
+
+def enqueue_template_email(template_name, context, recipients, from_email=None):
+    """Render ``template_name`` (see emails/rendering.py) and queue it."""
+    rendered = renderer.render(template_name, context)
+    return enqueue_email(rendered.subject, rendered.text, recipients, from_email, rendered.html)
+
+
+def enqueue_bulk_template_email(template_name, messages, from_email=None):
+    """
+    Queue many emails from one template.
+
+    ``messages`` is an iterable of ``(context, recipients)`` pairs. Rendering
+    happens in one batch and rows are written with a single ``bulk_create``.
+    """
+    messages = list(messages)
+    rendered = renderer.render_many(template_name, [context for context, _ in messages])
+    rows = OutboundEmail.objects.bulk_create([
+        OutboundEmail(
+            subject=email.subject,
+            body=email.text,
+            html_body=email.html,
+            from_email=from_email or "",
+            recipients=list(recipients),
+        )
+        for email, (_, recipients) in zip(rendered, messages)
+    ])
+    _wake_worker()
+    return rows
+
+
+def _claim_batch(batch_size):
+    """
+    Mark up to ``batch_size`` due messages as sending and return them.
+
+    A claimed row gets a lease: its ``next_attempt_at`` moves forward, so rows
+    left in ``sending`` by a crashed sender become due again once it expires.
+    """
+    now = timezone.now()
+    lease = timedelta(seconds=_setting('EMAIL_OUTBOX_LEASE_SECONDS', 300))
+
+    with transaction.atomic():
+        due = (
+            OutboundEmail.objects
+            .filter(
+                Q(status=OutboundEmail.STATUS_PENDING) | Q(status=OutboundEmail.STATUS_SENDING),
+                next_attempt_at__lte=now,
+            )
+            .order_by('next_attempt_at')
+        )
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        ids = list(due.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return []
+        OutboundEmail.objects.filter(id__in=ids).update(
+            status=OutboundEmail.STATUS_SENDING,
+            next_attempt_at=now + lease,
+            attempts=F('attempts') + 1,
+        )
+
+    return list(OutboundEmail.objects.filter(id__in=ids).order_by('id'))
+
+
+def _retry_or_fail(message, error, now):
+    max_attempts = _setting('EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+    backoff = _setting('EMAIL_OUTBOX_RETRY_BACKOFF', 30)
+
+    message.last_error = str(error)[:2000]
+    if message.attempts >= max_attempts:
+        message.status = OutboundEmail.STATUS_FAILED
+        logger.error("Giving up on email #%s after %s attempts: %s", message.id, message.attempts, error)
+    else:
+        message.status = OutboundEmail.STATUS_PENDING
+        delay = min(backoff * 2 ** (message.attempts - 1), 3600)
+        message.next_attempt_at = now + timedelta(seconds=delay)
+        logger.warning("Email #%s failed (attempt %s), retrying in %ss: %s", message.id, message.attempts, delay, error)
+    message.save(update_fields=['status', 'next_attempt_at', 'last_error'])
+
+
+def build_email_message(message, connection=None):
+    rendered = RenderedEmail(subject=message.subject, text=message.body, html=message.html_body)
+    return build_multipart_message(rendered, message.recipients, message.from_email or None, connection)
+
+
+def flush_outbox(batch_size=None, connection=None):
+    """
+    Deliver one batch of due messages over a single email backend connection.
+
+    Returns a dict with ``sent``, ``retried`` and ``failed`` counts. Pass a
+    ``connection`` to reuse one across several calls.
+    """
+    batch_size = batch_size or _setting('EMAIL_OUTBOX_BATCH_SIZE', 50)
+    stats = {'sent': 0, 'retried': 0, 'failed': 0}
+
+    messages = _claim_batch(batch_size)
+    if not messages:
+        return stats
+
+    conn = connection or get_connection(fail_silently=False)
+    now = timezone.now()
+
+    try:
+        # Opening explicitly keeps one SMTP session for the whole batch.
+        opened = conn.open()
+    except Exception as e:
+        for message in messages:
+            _retry_or_fail(message, e, now)
+            stats['failed' if message.status == OutboundEmail.STATUS_FAILED else 'retried'] += 1
+        return stats
+
+    sent_ids = []
+    try:
+        for message in messages:
+            try:
+                # One message per call so a single bad recipient does not
+                # mark the rest of the batch as failed.
+                conn.send_messages([build_email_message(message, conn)])
+                sent_ids.append(message.id)
+            except Exception as e:
+                _retry_or_fail(message, e, now)
+                stats['failed' if message.status == OutboundEmail.STATUS_FAILED else 'retried'] += 1
+    finally:
+        if opened:
+            conn.close()
+
+    if sent_ids:
+        OutboundEmail.objects.filter(id__in=sent_ids).update(
+            status=OutboundEmail.STATUS_SENT,
+            sent_at=timezone.now(),
+            last_error="",
+        )
+        stats['sent'] = len(sent_ids)
+
+    return stats
+
+
+def drain_outbox(batch_size=None):
+    """Flush batches until nothing is due. Returns the summed counts."""
+    totals = {'sent': 0, 'retried': 0, 'failed': 0}
+    while True:
+        stats = flush_outbox(batch_size)
+        for key, value in stats.items():
+            totals[key] += value
+        if not any(stats.values()):
+            return totals
+
+
+class OutboxWorker:
+    """
+    Background thread that drains the outbox whenever it is woken, and
+    otherwise every ``EMAIL_OUTBOX_POLL_INTERVAL`` seconds to pick up retries.
+    The thread is started lazily on the first ``wake()``.
+    """
+
+    def __init__(self):
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def wake(self):
+        self._ensure_started()
+        self._wakeup.set()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='email-outbox', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        interval = _setting('EMAIL_OUTBOX_POLL_INTERVAL', 30)
+        while True:
+            self._wakeup.wait(timeout=interval)
+            self._wakeup.clear()
+            try:
+                drain_outbox()
+            except Exception:
+                logger.exception("❌ Email outbox flush failed")
+            finally:
+                close_old_connections()
+
+
+outbox_worker = OutboxWorker()
@@ -0,0 +1,92 @@
+# emails/rendering.py
+"""
+Template-based email rendering.
+
+Each email has three templates under ``emails/templates/emails/``:
+``<name>_subject.txt``, ``<name>.txt`` and ``<name>.html``. They are compiled
+once (``EmailsConfig.ready`` calls ``renderer.load()``) and reused for every
+message, so rendering a batch only pays for the render itself.
+"""
+from dataclasses import dataclass
+
+from django.core.mail import EmailMultiAlternatives
+from django.template.loader import get_template
+
+
+@dataclass
+class RenderedEmail:
+    subject: str
+    text: str
+    html: str
+
+
+class EmailRenderer:
+    TEMPLATE_NAMES = (
+        'booking_confirmation',
+        'order_confirmation',
+        'payment_received',
+    )
+
+    def __init__(self):
+        self._compiled = {}
+
+    def load(self):
+        for name in self.TEMPLATE_NAMES:
+            self._compile(name)
+
+    def _compile(self, name):
+        compiled = (
+            get_template(f'emails/{name}_subject.txt'),
+            get_template(f'emails/{name}.txt'),
+            get_template(f'emails/{name}.html'),
+        )
+        self._compiled[name] = compiled
+        return compiled
+
+    def _templates(self, name):
+        compiled = self._compiled.get(name)
+        if compiled is None:
+            compiled = self._compile(name)
+        return compiled
+
+    def render(self, name, context):
+        subject_tpl, text_tpl, html_tpl = self._templates(name)
+        # Subjects must be a single line.
+        subject = ' '.join(subject_tpl.render(context).split())
+        return RenderedEmail(
+            subject=subject,
+            text=text_tpl.render(context).strip() + '\n',
+            html=html_tpl.render(context),
+        )
+
+    def render_many(self, name, contexts):
+        """Render one email per context, looking the templates up only once."""
+        subject_tpl, text_tpl, html_tpl = self._templates(name)
+        return [
+            RenderedEmail(
+                subject=' '.join(subject_tpl.render(context).split()),
+                text=text_tpl.render(context).strip() + '\n',
+                html=html_tpl.render(context),
+            )
+            for context in contexts
+        ]
+
+    def build_message(self, name, context, to, from_email=None, connection=None):
+        rendered = self.render(name, context)
+        return build_multipart_message(rendered, to, from_email, connection)
+
+
+def build_multipart_message(rendered, to, from_email=None, connection=None):
+    message = EmailMultiAlternatives(
+        subject=rendered.subject,
+        body=rendered.text,
+        from_email=from_email,  # None uses DEFAULT_FROM_EMAIL
+        to=to,
+        connection=connection,
+    )
+    if rendered.html:
+        message.attach_alternative(rendered.html, 'text/html')
+    return message
+
+
+renderer = EmailRenderer()
@@ -1,3 +1,93 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import OutboundEmail
+from .outbox import enqueue_email, flush_outbox
+
+
+class FailingBackend(EmailBackend):
+    def send_messages(self, messages):
+        raise ConnectionError("SMTP down")
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    EMAIL_OUTBOX_WORKER=False, EMAIL_OUTBOX_RETRY_BACKOFF=30, EMAIL_OUTBOX_MAX_ATTEMPTS=2,
+    THROTTLE_RATES={},
+)
+class OutboxTests(TestCase):
+    """Queued delivery through emails/outbox.py."""
+
+    def queue(self, subject='Hello'):
+        return enqueue_email(subject, 'Body', ['guest@example.com'], from_email='farm@example.com')
+
+    def test_enqueue_only_writes_a_row(self):
+        message = self.queue()
+        self.assertEqual((message.status, message.attempts), (OutboundEmail.STATUS_PENDING, 0))
+        self.assertEqual(mail.outbox, [])
+
+    def test_flush_delivers_due_messages(self):
+        first, second = self.queue('One'), self.queue('Two')
+        self.assertEqual(flush_outbox(), {'sent': 2, 'retried': 0, 'failed': 0})
+        self.assertEqual([m.subject for m in mail.outbox], ['One', 'Two'])
+        self.assertEqual(mail.outbox[0].to, ['guest@example.com'])
+        for message in (first, second):
+            message.refresh_from_db()
+            self.assertEqual((message.status, message.attempts), (OutboundEmail.STATUS_SENT, 1))
+            self.assertIsNotNone(message.sent_at)
+        self.assertEqual(flush_outbox(), {'sent': 0, 'retried': 0, 'failed': 0})
+
+    def test_failures_back_off_then_give_up(self):
+        message = self.queue()
+        with self.assertLogs('emails.outbox', 'WARNING'):
+            self.assertEqual(flush_outbox(connection=FailingBackend())['retried'], 1)
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), (OutboundEmail.STATUS_PENDING, 1))
+        self.assertIn('SMTP down', message.last_error)
+        self.assertGreater(message.next_attempt_at, timezone.now() + timedelta(seconds=20))
+
+        # Not due yet, so nothing is claimed.
+        self.assertEqual(flush_outbox(connection=FailingBackend())['retried'], 0)
+
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        with self.assertLogs('emails.outbox', 'ERROR'):
+            self.assertEqual(flush_outbox(connection=FailingBackend())['failed'], 1)
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), (OutboundEmail.STATUS_FAILED, 2))
+
+    def test_expired_lease_is_claimed_again(self):
+        stranded = self.queue('Stranded')
+        held = self.queue('Held')
+        OutboundEmail.objects.filter(id=stranded.id).update(
+            status=OutboundEmail.STATUS_SENDING, attempts=1, next_attempt_at=timezone.now() - timedelta(seconds=1),
+        )
+        OutboundEmail.objects.filter(id=held.id).update(
+            status=OutboundEmail.STATUS_SENDING, attempts=1, next_attempt_at=timezone.now() + timedelta(minutes=5),
+        )
+        self.assertEqual(flush_outbox()['sent'], 1)
+        self.assertEqual([m.subject for m in mail.outbox], ['Stranded'])
+        held.refresh_from_db()
+        self.assertEqual(held.status, OutboundEmail.STATUS_SENDING)
+
+    def test_book_tour_queues_and_returns_202(self):
+        response = self.client.post(reverse('book-tour'), {
+            'name': 'Amina', 'email': 'amina@example.com', 'date': '2026-11-02', 'time': '10:00', 'guests': 3,
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(mail.outbox, [])
+        message = OutboundEmail.objects.get()
+        self.assertEqual((message.recipients, message.status), (['amina@example.com'], OutboundEmail.STATUS_PENDING))
+
+        flush_outbox()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn('Amina', mail.outbox[0].body)
+
+    def test_book_tour_requires_an_email(self):
+        response = self.client.post(reverse('book-tour'), {'name': 'Amina'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(OutboundEmail.objects.exists())
@@ -3,5 +3,5 @@ from django.urls import path
 from .views import book_tour_view
 
 urlpatterns = [
-    path('book-tour/', book_tour_view),
+    path('book-tour/', book_tour_view, name='book-tour'),
 ]
@@ -2,9 +2,12 @@
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 import json
+from karen.throttling import expensive, throttle
 from .utils import send_booking_email
 
 @csrf_exempt  # only for development — add CSRF protection in production
+@expensive
+@throttle('book-tour')
 def book_tour_view(request):
     if request.method == 'POST':
         try:
@@ -15,9 +18,13 @@ def book_tour_view(request):
             time = data.get('time')
             guests = data.get('guests')
 
+            if not email:
+                return JsonResponse({'error': 'Email is required'}, status=400)
+
+            # Only writes an outbox row; delivery happens in the background.
             send_booking_email(name, email, date, time, guests)
 
-            return JsonResponse({'message': 'Email sent successfully'}, status=200)
+            return JsonResponse({'message': 'Booking received, confirmation email queued'}, status=202)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
     
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'karen.settings')
 
 application = get_asgi_application()
+
+# Background sweepers (stock reservations, ...) when not run as a separate process.
+from karen.scheduler import start_in_process_scheduler  # noqa: E402
+
+start_in_process_scheduler()
@@ -0,0 +1,119 @@
+"""
+JWT authentication without a user query on every request.
+
+``CachedJWTAuthentication`` resolves the token's user in one of three ways,
+picked by ``JWT_USER_RESOLUTION``:
+
+``db``
+    simplejwt's default: load the ``User`` row on every request.
+``cache``
+    keep users in an in-process cache for ``JWT_USER_CACHE_SECONDS``.
+    Saving or deleting a user evicts it in this process straight away;
+    other worker processes pick the change up when their entry expires.
+``claims``
+    build a ``TokenUser`` from the token itself. Tokens issued by
+    ``/api/token/`` carry ``is_staff`` and ``is_superuser`` claims (see
+    ``StaffClaimsTokenObtainPairSerializer``), so ``IsAdminUserOnly`` needs no
+    query at all. A demotion or deactivation only takes effect when the
+    token expires. Older tokens without the claims fall back to ``cache``.
+"""
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+User = get_user_model()
+
+
+class UserCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users = {}  # user id -> (user, expires_at)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None and entry[1] > time.monotonic():
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            return None
+
+    def set(self, user_id, user, ttl):
+        with self._lock:
+            self._users[user_id] = (user, time.monotonic() + ttl)
+
+    def evict(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+
+user_cache = UserCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        mode = getattr(settings, 'JWT_USER_RESOLUTION', 'cache')
+        if mode == 'claims' and 'is_staff' in validated_token:
+            if api_settings.USER_ID_CLAIM not in validated_token:
+                raise InvalidToken(_("Token contained no recognizable user identification"))
+            return TokenUser(validated_token)
+        if mode == 'db':
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = user_cache.get(user_id)
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(user_id, user, getattr(settings, 'JWT_USER_CACHE_SECONDS', 60))
+        else:
+            self._check(user, validated_token)
+        # Each request gets its own copy so nothing it sets leaks to others.
+        return copy.copy(user)
+
+    def _check(self, user, validated_token):
+        # The same checks JWTAuthentication.get_user makes after its query.
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+
+class StaffClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Adds the claims ``JWT_USER_RESOLUTION = 'claims'`` relies on."""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token['username'] = user.get_username()
+        token['is_staff'] = user.is_staff
+        token['is_superuser'] = user.is_superuser
+        return token
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def evict_cached_user(sender, instance, **kwargs):
+    user_cache.evict(getattr(instance, api_settings.USER_ID_FIELD))
@@ -0,0 +1,40 @@
+"""
+Shared pieces of the admin bulk endpoints (products/views.py, orders/views.py).
+
+Bulk updates run in one transaction: the target rows are read with
+``select_for_update()`` and each row is written back with only the fields
+its items changed (one ``bulk_update`` per distinct field set). A row that
+is only renamed never has its ``stock`` or ``is_paid`` rewritten, so
+concurrent checkouts and payment settlements are not undone.
+"""
+from collections import defaultdict
+
+from rest_framework import serializers
+
+MAX_BULK_ITEMS = 1000
+
+
+class BulkIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=MAX_BULK_ITEMS)
+
+
+def bulk_items(data):
+    """The update list from a bulk request body (a list or ``{"updates": [...]}``), or an error message."""
+    items = data.get('updates') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return None, "Send a non-empty list of updates."
+    if len(items) > MAX_BULK_ITEMS:
+        return None, f"At most {MAX_BULK_ITEMS} updates per request."
+    return items, None
+
+
+def bulk_update_changed(model, changed, batch_size=500):
+    """
+    Write ``changed`` (``{pk: (instance, {field, ...})}``) with one
+    ``bulk_update`` per distinct set of changed fields.
+    """
+    groups = defaultdict(list)
+    for instance, fields in changed.values():
+        groups[tuple(sorted(fields))].append(instance)
+    for fields, instances in groups.items():
+        model.objects.bulk_update(instances, fields, batch_size=batch_size)
@@ -0,0 +1,36 @@
+"""
+Per-transaction batching of after-commit work.
+
+Model signal receivers fire once per row, so a queryset ``delete()`` of 200
+products would otherwise queue 200 separate after-commit refreshes.
+``CommitBatch`` collects the keys added while a transaction is open and
+hands them to its function in one call when the transaction commits.
+Outside a transaction the call happens immediately, as with ``on_commit``.
+
+Keys added in a transaction that rolls back stay pending and are flushed
+with the next commit on that thread; the functions used here only
+recompute or evict, so an extra key is harmless.
+"""
+import threading
+
+from django.db import transaction
+
+
+class CommitBatch:
+    def __init__(self, func):
+        self.func = func
+        self._local = threading.local()
+
+    def add(self, keys):
+        pending = getattr(self._local, 'keys', None)
+        if pending is None:
+            pending = self._local.keys = set()
+        pending.update(keys)
+        # Registered every time (it is cheap): a callback dropped by a rollback must not strand the set.
+        transaction.on_commit(self.flush)
+
+    def flush(self):
+        keys = getattr(self._local, 'keys', None)
+        self._local.keys = None
+        if keys:
+            self.func(keys)
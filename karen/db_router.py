@@ -0,0 +1,174 @@
+"""
+Read-replica routing.
+
+Replicas are extra ``DATABASES`` aliases (``replica1``, ``replica2``, ...)
+built from ``DATABASE_REPLICA_URLS``. Nothing reads from them unless a view
+opts in with ``use_replica = True``: ``ReplicaRoutingMiddleware`` then runs
+that request's reads against a healthy replica, chosen round-robin.
+
+Writes, and any read made inside a transaction on the primary, always go to
+``default``. A client that has just written is pinned to the primary for
+``REPLICA_PIN_SECONDS`` so it reads its own writes once the replicas have
+caught up. The pin lives in the shared cache, keyed by the caller's bearer
+token or, without one, its address (DRF's ``get_ident``). A cookie would not
+do: the storefront is a cross-site SPA and mobile clients keep no cookie
+jar, so a ``SameSite=Lax`` cookie never came back. Views whose answer must
+be current (the payment callback, order creation, payment status polling)
+simply do not opt in.
+
+Each replica is probed with ``SELECT 1`` at most once per
+``REPLICA_HEALTH_CHECK_SECONDS``; a replica that fails is skipped until its
+next probe, and with no healthy replica reads fall back to the primary.
+"""
+import hashlib
+import itertools
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+PIN_KEY = 'db:pin:{}'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_read_alias = ContextVar('db_read_alias', default=None)
+
+
+def replica_aliases():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def client_identity(request):
+    """The caller's bearer token (hashed) when it sends one, else its address."""
+    authorization = request.META.get('HTTP_AUTHORIZATION')
+    if authorization:
+        return 'auth:' + hashlib.sha256(authorization.encode()).hexdigest()
+    return 'ip:' + (BaseThrottle().get_ident(request) or '')
+
+
+class ReplicaHealth:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = {}  # alias -> (healthy, checked_at)
+        self._cycle = None
+        self._aliases = None
+
+    def _probe(self, alias):
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute('SELECT 1')
+            return True
+        except DatabaseError:
+            logger.warning("⚠️ Read replica %s failed its health check", alias, exc_info=True)
+            # Drop the broken connection so the next probe reconnects.
+            connections[alias].close()
+            return False
+
+    def is_healthy(self, alias):
+        interval = getattr(settings, 'REPLICA_HEALTH_CHECK_SECONDS', 10)
+        now = time.monotonic()
+        with self._lock:
+            healthy, checked_at = self._state.get(alias, (True, None))
+        if checked_at is not None and now - checked_at < interval:
+            return healthy
+        healthy = self._probe(alias)
+        with self._lock:
+            self._state[alias] = (healthy, now)
+        return healthy
+
+    def choose(self):
+        """A healthy replica alias, or None to read from the primary."""
+        aliases = replica_aliases()
+        if not aliases:
+            return None
+        with self._lock:
+            if self._aliases != aliases:
+                self._aliases = list(aliases)
+                self._cycle = itertools.cycle(self._aliases)
+            candidates = [next(self._cycle) for _ in self._aliases]
+        for alias in candidates:
+            if self.is_healthy(alias):
+                return alias
+        return None
+
+    def status(self):
+        with self._lock:
+            return {alias: healthy for alias, (healthy, _) in self._state.items()}
+
+
+health = ReplicaHealth()
+
+
+class use_replica:
+    """Route reads in this block to ``alias`` (a replica, or None for the primary)."""
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def __enter__(self):
+        self._token = _read_alias.set(self.alias)
+        return self.alias
+
+    def __exit__(self, *exc):
+        _read_alias.reset(self._token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # Reads that belong to a write transaction must see its writes.
+            return DEFAULT_DB_ALIAS
+        if model._meta.app_label == 'django_cache':
+            # The database cache carries invalidation versions; a lagging replica would serve stale ones.
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    """Send reads of ``use_replica`` views to a replica and pin recent writers to the primary."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # process_view may set the alias; this restores it when the request ends.
+        token = _read_alias.set(None)
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_alias.reset(token)
+
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            pin = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+            if pin and replica_aliases():
+                cache.set(PIN_KEY.format(client_identity(request)), True, timeout=pin)
+        return response
+
+    def _pinned(self, request):
+        return cache.get(PIN_KEY.format(client_identity(request))) is not None
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'view_class', None) or getattr(view_func, 'cls', None)
+        if not getattr(view_class, 'use_replica', False) or request.method not in SAFE_METHODS:
+            return None
+        if not replica_aliases() or self._pinned(request):
+            return None
+        _read_alias.set(health.choose())
+        return None
@@ -0,0 +1,144 @@
+"""
+Fast path for large read-only list responses.
+
+``values_rows`` fetches rows with ``values_list()`` and maps them straight to
+dicts, converting Decimal and datetime columns with converters built once
+per field. The output matches what the equivalent ``ModelSerializer`` would
+produce (Decimals as fixed-point strings, datetimes as ISO 8601 with ``Z``).
+``FastJSONRenderer`` renders with orjson when it is installed and otherwise
+behaves exactly like DRF's ``JSONRenderer``.
+
+Views opt in per endpoint and only when ``FAST_JSON_LISTS`` is enabled;
+``manage.py bench_fast_json`` checks the output is byte-identical to the
+serializer path.
+"""
+import decimal
+
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+    ORJSON_OPTIONS = 0
+else:
+    ORJSON_OPTIONS = (
+        orjson.OPT_NON_STR_KEYS
+        | orjson.OPT_PASSTHROUGH_DATETIME
+        | orjson.OPT_PASSTHROUGH_DATACLASS
+        | orjson.OPT_PASSTHROUGH_SUBCLASS
+    )
+
+
+def is_enabled():
+    return getattr(settings, 'FAST_JSON_LISTS', False)
+
+
+def decimal_converter(max_digits, decimal_places):
+    """Same output as ``serializers.DecimalField(max_digits, decimal_places)``."""
+    exponent = decimal.Decimal('.1') ** decimal_places
+    context = decimal.getcontext().copy()
+    context.prec = max_digits
+
+    def convert(value):
+        if value is None:
+            return ''
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(str(value).strip())
+        return '{:f}'.format(value.quantize(exponent, context=context))
+    return convert
+
+
+def datetime_converter():
+    """Same output as ``serializers.DateTimeField()`` with the default ISO 8601 format."""
+    def convert(value):
+        if not value:
+            return None
+        if timezone.is_aware(value):
+            value = value.astimezone(timezone.get_current_timezone())
+        value = value.isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+def _model_field(model, lookup):
+    field = None
+    for part in lookup.split('__'):
+        field = model._meta.get_field(part)
+        if field.is_relation and field.related_model is not None:
+            model = field.related_model
+    return field
+
+
+def converter_for(field):
+    if isinstance(field, models.DecimalField):
+        return decimal_converter(field.max_digits, field.decimal_places)
+    if isinstance(field, models.DateTimeField):
+        return datetime_converter()
+    return None
+
+
+def values_rows(queryset, fields):
+    """
+    Return a list of dicts for ``queryset``.
+
+    ``fields`` is a list of lookups, ``(key, lookup)`` pairs, or ``(key, None)``
+    placeholders that are set to None for the caller to fill in (this keeps
+    the key order of the serializer being replaced). Foreign keys come out as
+    their primary key, like ``PrimaryKeyRelatedField``.
+    """
+    specs = [(field, field) if isinstance(field, str) else field for field in fields]
+    lookups = [lookup for _, lookup in specs if lookup is not None]
+    plan = []
+    column = 0
+    for key, lookup in specs:
+        if lookup is None:
+            plan.append((key, None, None))
+            continue
+        plan.append((key, column, converter_for(_model_field(queryset.model, lookup))))
+        column += 1
+
+    rows = []
+    for values in queryset.values_list(*lookups):
+        row = {}
+        for key, index, convert in plan:
+            if index is None:
+                row[key] = None
+            elif convert is None:
+                row[key] = values[index]
+            else:
+                row[key] = convert(values[index])
+        rows.append(row)
+    return rows
+
+
+class FastJSONRenderer(JSONRenderer):
+    """``JSONRenderer`` that uses orjson for compact output when available."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Types orjson would format differently from DRF (datetimes, Decimals,
+        # lazy strings, subclasses) go through DRF's encoder instead.
+        ret = orjson.dumps(data, default=self.encoder_class().default, option=ORJSON_OPTIONS)
+        # Match JSONRenderer, which escapes these so the output is valid JavaScript.
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class FastJSONMixin:
+    """Swap ``JSONRenderer`` for ``FastJSONRenderer`` on a view while ``FAST_JSON_LISTS`` is on."""
+
+    def get_renderers(self):
+        renderers = super().get_renderers()
+        if not is_enabled():
+            return renderers
+        return [FastJSONRenderer() if type(renderer) is JSONRenderer else renderer for renderer in renderers]
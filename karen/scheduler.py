@@ -0,0 +1,89 @@
+"""
+Minimal periodic task runner.
+
+Tasks are configured in ``settings.PERIODIC_TASKS`` as
+``{name: (dotted.path.to.callable, interval_seconds)}``. They run either in a
+dedicated process (``manage.py run_scheduler``) or, with
+``IN_PROCESS_SCHEDULER = True``, on a daemon thread started from ``wsgi.py``.
+Every task must be safe to run from several processes at once.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    def __init__(self, name, func, interval):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.next_run = 0.0
+
+    def run(self):
+        start = time.monotonic()
+        try:
+            result = self.func()
+            logger.debug("Periodic task %s finished in %.3fs: %s", self.name, time.monotonic() - start, result)
+            return result
+        except Exception:
+            logger.exception("❌ Periodic task %s failed", self.name)
+        finally:
+            close_old_connections()
+            self.next_run = time.monotonic() + self.interval
+
+
+def load_tasks(names=None):
+    tasks = []
+    for name, (path, interval) in getattr(settings, 'PERIODIC_TASKS', {}).items():
+        if names and name not in names:
+            continue
+        tasks.append(PeriodicTask(name, import_string(path), interval))
+    return tasks
+
+
+class Scheduler:
+    def __init__(self, tasks):
+        self.tasks = tasks
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_pending(self):
+        now = time.monotonic()
+        for task in self.tasks:
+            if task.next_run <= now:
+                task.run()
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            self.run_pending()
+            if not self.tasks:
+                return
+            delay = max(0.0, min(task.next_run for task in self.tasks) - time.monotonic())
+            self._stop.wait(min(delay, 60))
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run_forever, name='periodic-tasks', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+_scheduler = None
+
+
+def start_in_process_scheduler():
+    """Start the background scheduler once per process if enabled in settings."""
+    global _scheduler
+    if not getattr(settings, 'IN_PROCESS_SCHEDULER', False) or _scheduler is not None:
+        return None
+    _scheduler = Scheduler(load_tasks())
+    _scheduler.start()
+    return _scheduler
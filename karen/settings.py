@@ -9,11 +9,12 @@ https://docs.djangoproject.com/en/5.2/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
-from decouple import config
+from decouple import config, Csv
 from pathlib import Path
 from datetime import timedelta
 import os
 import dj_database_url
+from corsheaders.defaults import default_headers
 
 
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -25,14 +26,98 @@ EMAIL_HOST_USER = config('EMAIL_HOST_USER')  # from .env
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD')  # from .env
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
+# Email outbox (emails/outbox.py): views queue messages, a background
+# thread delivers them in batches over one SMTP connection.
+EMAIL_OUTBOX_WORKER = config('EMAIL_OUTBOX_WORKER', default=True, cast=bool)
+EMAIL_OUTBOX_BATCH_SIZE = config('EMAIL_OUTBOX_BATCH_SIZE', default=50, cast=int)
+EMAIL_OUTBOX_MAX_ATTEMPTS = config('EMAIL_OUTBOX_MAX_ATTEMPTS', default=5, cast=int)
+EMAIL_OUTBOX_RETRY_BACKOFF = config('EMAIL_OUTBOX_RETRY_BACKOFF', default=30, cast=int)  # seconds, doubles per attempt
+EMAIL_OUTBOX_POLL_INTERVAL = config('EMAIL_OUTBOX_POLL_INTERVAL', default=30, cast=int)  # seconds
+
 
 MPESA_CALLBACK_URL = config("MPESA_CALLBACK_URL")
 
+# Stock held for an unpaid order before the sweeper returns it (orders/inventory.py)
+STOCK_RESERVATION_TTL_MINUTES = config('STOCK_RESERVATION_TTL_MINUTES', default=15, cast=int)
+
+# Unpaid orders older than this are expired and no longer matched by phone+amount (orders/expiry.py)
+ORDER_UNPAID_TTL_MINUTES = config('ORDER_UNPAID_TTL_MINUTES', default=24 * 60, cast=int)
+
+# Paid or expired orders older than this move to the archive tables (orders/archive.py)
+ORDER_ARCHIVE_AFTER_DAYS = config('ORDER_ARCHIVE_AFTER_DAYS', default=365, cast=int)
+ORDER_ARCHIVE_MAX_BATCHES = config('ORDER_ARCHIVE_MAX_BATCHES', default=20, cast=int)  # per scheduler run
+
+# Opt-in values()-based fast path (and orjson rendering) for large list endpoints (karen/fastjson.py)
+FAST_JSON_LISTS = config('FAST_JSON_LISTS', default=False, cast=bool)
+
+# Shared cache for analytics reports, the storefront catalog and the archive horizon. Every
+# worker must see the same invalidation versions, so this is never per-process:
+# Redis when REDIS_URL is set (needs the redis package), otherwise the database
+# cache table (`python manage.py createcachetable`, run by build.sh).
+REDIS_URL = config('REDIS_URL', default='')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    } if REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': config('CACHE_TABLE', default='karen_cache'),
+    },
+}
+
+# Cached sales analytics (orders/analytics.py); entries are invalidated on each payment and product change.
+ANALYTICS_CACHE_TIMEOUT = config('ANALYTICS_CACHE_TIMEOUT', default=3600, cast=int)
+# Storefront product rows for the batch lookup (products/cache.py); evicted on product writes.
+CATALOG_CACHE_TIMEOUT = config('CATALOG_CACHE_TIMEOUT', default=300, cast=int)
+
+# Token-bucket throttles (karen/throttling.py): scope -> (per-client rate, per-route rate), "N/s|m|h|d".
+THROTTLE_RATES = {
+    'stk-push': ('5/m', '120/m'),  # two outbound Daraja calls per request
+    'book-tour': ('3/m', '60/m'),
+    'list': ('30/m', None),  # unpaginated list endpoints
+}
+# In-flight cap shared by all `expensive` views; extra requests get a 503. 0 disables.
+EXPENSIVE_MAX_IN_FLIGHT = config('EXPENSIVE_MAX_IN_FLIGHT', default=4, cast=int)
+
+# Idempotency-Key handling for checkout and STK push (orders/idempotency.py)
+IDEMPOTENCY_KEY_TTL_HOURS = config('IDEMPOTENCY_KEY_TTL_HOURS', default=24, cast=int)
+IDEMPOTENCY_WAIT_SECONDS = config('IDEMPOTENCY_WAIT_SECONDS', default=10, cast=int)
+IDEMPOTENCY_LEASE_SECONDS = config('IDEMPOTENCY_LEASE_SECONDS', default=120, cast=int)  # in-flight rows older than this are taken over; keep above the worker timeout
+
+# Periodic tasks: name -> (callable, interval seconds). Run with
+# `manage.py run_scheduler`, or in each web process with IN_PROCESS_SCHEDULER.
+PERIODIC_TASKS = {
+    'release-expired-reservations': ('orders.inventory.release_expired_reservations', 60),
+    'expire-unpaid-orders': ('orders.expiry.expire_stale_orders', 300),
+    'purge-idempotency-keys': ('orders.idempotency.purge_expired_keys', 3600),
+    'poll-stk-status': ('mpesa.poller.poll_pending_attempts', 30),
+    'archive-settled-orders': ('orders.archive.scheduled_archival', 3600),
+}
+IN_PROCESS_SCHEDULER = config('IN_PROCESS_SCHEDULER', default=False, cast=bool)
+
+# Payment-confirmation notifications (orders/notifications.py)
+PAYMENT_NOTIFICATION_SINKS = [
+    'orders.notifications.EmailSink',
+    'orders.notifications.WebhookSink',
+]
+PAYMENT_NOTIFICATION_EMAILS = config('PAYMENT_NOTIFICATION_EMAILS', default=EMAIL_HOST_USER, cast=Csv())  # shop inbox
+PAYMENT_WEBHOOK_URL = config('PAYMENT_WEBHOOK_URL', default='')
+PAYMENT_WEBHOOK_TIMEOUT = config('PAYMENT_WEBHOOK_TIMEOUT', default=5, cast=int)
+PAYMENT_NOTIFICATION_WORKERS = config('PAYMENT_NOTIFICATION_WORKERS', default=4, cast=int)
+PAYMENT_NOTIFICATION_QUEUE_SIZE = config('PAYMENT_NOTIFICATION_QUEUE_SIZE', default=100, cast=int)
+PAYMENT_NOTIFICATIONS_ASYNC = config('PAYMENT_NOTIFICATIONS_ASYNC', default=True, cast=bool)
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
+    "TOKEN_OBTAIN_SERIALIZER": "karen.authentication.StaffClaimsTokenObtainPairSerializer",
 }
 
+# How CachedJWTAuthentication finds the token's user (karen/authentication.py):
+# 'db' (query every request), 'cache' (per-process, JWT_USER_CACHE_SECONDS) or 'claims' (trust the token).
+JWT_USER_RESOLUTION = config('JWT_USER_RESOLUTION', default='cache')
+JWT_USER_CACHE_SECONDS = config('JWT_USER_CACHE_SECONDS', default=60, cast=int)
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -71,6 +156,7 @@ INSTALLED_APPS = [
     'orders',
     'mpesa',
     'emails',
+    'metrics',
     'cloudinary',
     'cloudinary_storage',
     
@@ -78,7 +164,7 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'karen.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
@@ -89,8 +175,22 @@ MPESA_CONSUMER_KEY = config("MPESA_CONSUMER_KEY")
 MPESA_CONSUMER_SECRET = config("MPESA_CONSUMER_SECRET")
 MPESA_SHORTCODE = config("MPESA_SHORTCODE")
 MPESA_PASSKEY = config("MPESA_PASSKEY")
+# Daraja host (mpesa/daraja.py); point at `manage.py daraja_stub` for local testing.
+MPESA_API_BASE_URL = config('MPESA_API_BASE_URL', default='https://sandbox.safaricom.co.ke')
+MPESA_HTTP_TIMEOUT = config('MPESA_HTTP_TIMEOUT', default=10, cast=int)
+
+# STK status poller for pushes whose callback never arrived (mpesa/poller.py), in seconds.
+STK_POLL_AFTER_SECONDS = config('STK_POLL_AFTER_SECONDS', default=60, cast=int)
+STK_POLL_INTERVAL_SECONDS = config('STK_POLL_INTERVAL_SECONDS', default=30, cast=int)
+STK_POLL_GIVE_UP_SECONDS = config('STK_POLL_GIVE_UP_SECONDS', default=1800, cast=int)
+STK_POLL_CONCURRENCY = config('STK_POLL_CONCURRENCY', default=4, cast=int)
+STK_POLL_BATCH_SIZE = config('STK_POLL_BATCH_SIZE', default=50, cast=int)
 
 MIDDLEWARE = [
+    'metrics.middleware.PerformanceMiddleware',  # first, so it times the whole stack
+    'metrics.querylog.QueryInspectorMiddleware',  # no-op unless QUERY_INSPECTOR_ENABLED
+    'karen.db_router.ReplicaRoutingMiddleware',
+    'karen.throttling.AdmissionControlMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -103,6 +203,16 @@ MIDDLEWARE = [
 ]
 
 CORS_ALLOW_ALL_ORIGINS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+
+# Per-route request metrics (metrics/middleware.py), served at /api/metrics/
+PERF_METRICS_ENABLED = config('PERF_METRICS_ENABLED', default=True, cast=bool)
+PERF_METRICS_SAMPLE_RATE = config('PERF_METRICS_SAMPLE_RATE', default=0.1, cast=float)  # fraction of requests timed in detail
+
+# Duplicate/slow query reports (metrics/querylog.py) — development and staging only
+QUERY_INSPECTOR_ENABLED = config('QUERY_INSPECTOR_ENABLED', default=False, cast=bool)
+QUERY_INSPECTOR_DUPLICATE_THRESHOLD = config('QUERY_INSPECTOR_DUPLICATE_THRESHOLD', default=3, cast=int)
+QUERY_INSPECTOR_SLOW_MS = config('QUERY_INSPECTOR_SLOW_MS', default=100, cast=int)
 
 ROOT_URLCONF = 'karen.urls'
 
@@ -127,10 +237,40 @@ WSGI_APPLICATION = 'karen.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Connection reuse. Each worker thread keeps its connection for DB_CONN_MAX_AGE
+# seconds (0 = close after every request) and pings it before reusing it, so a
+# connection dropped by the server is replaced instead of failing the request.
+# Behind a transaction-mode pooler such as PgBouncer (DB_POOLER=pgbouncer), the
+# pooler owns reuse: Django closes per request and avoids server-side cursors.
+# Under ASGI without a pooler, set DB_CONN_MAX_AGE=0.
+DB_POOLER = config('DB_POOLER', default='')
+DB_CONN_MAX_AGE = 0 if DB_POOLER else config('DB_CONN_MAX_AGE', default=60, cast=int)
+DB_CONN_HEALTH_CHECKS = config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool)
+_db_options = {
+    'conn_max_age': DB_CONN_MAX_AGE,
+    'conn_health_checks': DB_CONN_HEALTH_CHECKS,
+    'disable_server_side_cursors': bool(DB_POOLER),
+}
+
 DATABASES = {
-    'default': dj_database_url.config(default=config('DATABASE_URL'))
+    'default': dj_database_url.config(default=config('DATABASE_URL'), **_db_options)
 }
 
+# Optional read replicas (karen/db_router.py). Views opt in with `use_replica = True`;
+# with no replica URLs every query goes to the primary as before.
+DATABASE_REPLICAS = []
+for _index, _url in enumerate(config('DATABASE_REPLICA_URLS', default='', cast=Csv()), start=1):
+    _alias = f'replica{_index}'
+    DATABASES[_alias] = dj_database_url.parse(_url, **_db_options)
+    # Tests run against the primary's test database instead of creating one per replica.
+    DATABASES[_alias]['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICAS.append(_alias)
+
+DATABASE_ROUTERS = ['karen.db_router.ReplicaRouter']
+REPLICA_HEALTH_CHECK_SECONDS = config('REPLICA_HEALTH_CHECK_SECONDS', default=10, cast=int)
+# How long a client that just wrote keeps reading from the primary.
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=5, cast=int)
+
 
 # DATABASES = {
 #     'default': {
@@ -0,0 +1,259 @@
+import copy
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import resolve, reverse
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from emails.models import OutboundEmail
+from emails.views import book_tour_view
+from orders.permissions import IsAdminUserOnly
+from products.models import Product
+
+from . import db_router
+from .authentication import CachedJWTAuthentication, StaffClaimsTokenObtainPairSerializer, user_cache
+from .db_router import ReplicaHealth, ReplicaRouter, ReplicaRoutingMiddleware, use_replica
+from .throttling import AdmissionControlMiddleware, TokenBucket, buckets, limiter, parse_rate
+
+
+class ReplicaView:
+    use_replica = True
+
+
+class PrimaryView:
+    use_replica = False
+
+
+def view_func(view_class):
+    func = lambda request: None  # noqa: E731
+    func.view_class = view_class
+    return func
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'], REPLICA_PIN_SECONDS=5,
+                   CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ReplicaRouterTests(TestCase):
+    """karen/db_router.py; the replica aliases are never connected to, only routed to."""
+
+    def setUp(self):
+        cache.clear()
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def route(self, request, view_class=ReplicaView, alias='replica1'):
+        """Run ``request`` through the middleware; returns the alias a read made by the view would use."""
+        seen = []
+
+        def get_response(request):
+            middleware.process_view(request, view_func(view_class), (), {})
+            seen.append(self.router.db_for_read(Product))
+            return mock.Mock(status_code=200)
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        with mock.patch.object(db_router.health, 'choose', return_value=alias), self.outside_atomic():
+            middleware(request)
+        return seen[0]
+
+    def outside_atomic(self):
+        # TestCase wraps each test in a transaction; step outside it to see plain routing.
+        return mock.patch.object(db_router.connections[DEFAULT_DB_ALIAS], 'in_atomic_block', False)
+
+    def test_reads_of_opted_in_views_go_to_a_replica(self):
+        self.assertEqual(self.route(self.factory.get('/')), 'replica1')
+        self.assertEqual(self.route(self.factory.get('/'), PrimaryView), DEFAULT_DB_ALIAS)
+        self.assertEqual(self.route(self.factory.post('/')), DEFAULT_DB_ALIAS)
+        # The alias does not leak past the request.
+        self.assertEqual(self.router.db_for_read(Product), DEFAULT_DB_ALIAS)
+
+    def test_writes_atomic_blocks_and_the_cache_table_stay_on_the_primary(self):
+        cache_model = mock.Mock()
+        cache_model._meta.app_label = 'django_cache'
+        with self.outside_atomic():
+            with use_replica('replica2'):
+                self.assertEqual(self.router.db_for_read(Product), 'replica2')
+                self.assertEqual(self.router.db_for_write(Product), DEFAULT_DB_ALIAS)
+                self.assertEqual(self.router.db_for_read(cache_model), DEFAULT_DB_ALIAS)
+        with use_replica('replica2'), transaction.atomic():
+            self.assertEqual(self.router.db_for_read(Product), DEFAULT_DB_ALIAS)
+        self.assertFalse(self.router.allow_migrate('replica1', 'products'))
+
+    def test_failed_health_check_fails_over(self):
+        health = ReplicaHealth()
+        with mock.patch.object(health, '_probe', side_effect=lambda alias: alias == 'replica2') as probe:
+            self.assertEqual({health.choose() for _ in range(4)}, {'replica2'})
+            self.assertEqual(health.status(), {'replica1': False, 'replica2': True})
+            # Each replica is probed once per interval, not on every request.
+            self.assertEqual(probe.call_count, 2)
+        with mock.patch.object(health, '_probe', return_value=False), \
+                override_settings(REPLICA_HEALTH_CHECK_SECONDS=0):
+            self.assertIsNone(health.choose())
+
+    def test_a_client_that_wrote_is_pinned_to_the_primary(self):
+        self.route(self.factory.post('/', HTTP_AUTHORIZATION='Bearer alice'))
+        self.assertEqual(self.route(self.factory.get('/', HTTP_AUTHORIZATION='Bearer alice')), DEFAULT_DB_ALIAS)
+        self.assertEqual(self.route(self.factory.get('/', HTTP_AUTHORIZATION='Bearer bob')), 'replica1')
+
+        # Without a token the pin follows the address, so cookie-less clients get it too.
+        self.route(self.factory.post('/', REMOTE_ADDR='10.0.0.7'))
+        self.assertEqual(self.route(self.factory.get('/', REMOTE_ADDR='10.0.0.7')), DEFAULT_DB_ALIAS)
+        self.assertEqual(self.route(self.factory.get('/', REMOTE_ADDR='10.0.0.8')), 'replica1')
+
+        cache.clear()  # the pin has expired
+        self.assertEqual(self.route(self.factory.get('/', HTTP_AUTHORIZATION='Bearer alice')), 'replica1')
+
+
+class TokenBucketTests(SimpleTestCase):
+    """Refill math of karen/throttling.py."""
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('5/m'), (5, 5 / 60))
+        self.assertEqual(parse_rate('2/sec'), (2, 2.0))
+        self.assertIsNone(parse_rate(None))
+
+    def test_burst_then_refill_at_the_rate(self):
+        bucket = TokenBucket(2, now=0)
+        self.assertEqual([bucket.take(2, 1.0, now=0) for _ in range(2)], [0, 0])
+        self.assertEqual(bucket.take(2, 1.0, now=0), 1.0)
+        self.assertEqual(bucket.take(2, 1.0, now=0.5), 0.5)
+        self.assertEqual(bucket.take(2, 1.0, now=1.0), 0)
+        # An idle bucket refills to capacity, never past it.
+        self.assertEqual([bucket.take(2, 1.0, now=100) for _ in range(3)], [0, 0, 1.0])
+
+
+@override_settings(EMAIL_OUTBOX_WORKER=False, EXPENSIVE_MAX_IN_FLIGHT=0)
+class BookTourThrottleTests(TestCase):
+    """The ``@expensive`` / ``@throttle('book-tour')`` stack on book_tour_view."""
+
+    def setUp(self):
+        buckets.clear()
+
+    def book(self, address='10.0.0.1'):
+        return self.client.post(reverse('book-tour'), {'name': 'Amina', 'email': 'amina@example.com'},
+                                content_type='application/json', REMOTE_ADDR=address)
+
+    @override_settings(THROTTLE_RATES={'book-tour': ('2/m', None)})
+    def test_each_client_has_its_own_bucket(self):
+        self.assertEqual([self.book().status_code for _ in range(3)], [202, 202, 429])
+        response = self.book()
+        self.assertEqual((response.status_code, response['Retry-After']), (429, '30'))
+        self.assertEqual(self.book('10.0.0.2').status_code, 202)
+        self.assertEqual(OutboundEmail.objects.count(), 3)
+
+    @override_settings(THROTTLE_RATES={'book-tour': ('10/m', '3/m')})
+    def test_the_route_bucket_is_shared_by_all_clients(self):
+        statuses = [self.book(f'10.0.0.{n}').status_code for n in range(1, 5)]
+        self.assertEqual(statuses, [202, 202, 202, 429])
+
+    @override_settings(THROTTLE_RATES={}, EXPENSIVE_MAX_IN_FLIGHT=1)
+    def test_over_the_cap_is_shed_with_503(self):
+        self.assertTrue(limiter.try_acquire(1))  # another expensive request is in flight
+        try:
+            response = self.book()
+        finally:
+            limiter.release()
+        self.assertEqual((response.status_code, response['Retry-After']), (503, '1'))
+        self.assertFalse(OutboundEmail.objects.exists())
+        self.assertEqual(self.book().status_code, 202)
+        self.assertEqual(limiter.in_flight, 0)
+
+
+@override_settings(EXPENSIVE_MAX_IN_FLIGHT=1)
+class AdmissionControlTests(SimpleTestCase):
+    """karen.throttling.AdmissionControlMiddleware."""
+
+    def request(self):
+        request = RequestFactory().post(reverse('book-tour'))
+        request.resolver_match = resolve(request.path)
+        return request
+
+    def test_slot_is_released_when_the_view_raises(self):
+        def get_response(request):
+            self.assertIsNone(middleware.process_view(request, book_tour_view, (), {}))
+            self.assertEqual(limiter.in_flight, 1)
+            raise RuntimeError("upstream timed out")
+
+        middleware = AdmissionControlMiddleware(get_response)
+        with self.assertRaises(RuntimeError):
+            middleware(self.request())
+        self.assertEqual(limiter.in_flight, 0)
+
+    def test_cheap_views_are_never_counted(self):
+        middleware = AdmissionControlMiddleware(lambda request: None)
+        request = self.request()
+        self.assertIsNone(middleware.process_view(request, view_func(PrimaryView), (), {}))
+        self.assertFalse(getattr(request, '_admitted', False))
+        self.assertEqual(limiter.in_flight, 0)
+
+
+@override_settings(JWT_USER_RESOLUTION='cache', JWT_USER_CACHE_SECONDS=60)
+class CachedJWTAuthenticationTests(TestCase):
+    """karen/authentication.py."""
+
+    def setUp(self):
+        user_cache.clear()
+        self.auth = CachedJWTAuthentication()
+        self.user = User.objects.create_user('wanjiku', password='first-pass', is_staff=True)
+
+    def authenticate(self, token):
+        return self.auth.get_user(self.auth.get_validated_token(str(token)))
+
+    def test_cache_hit_skips_the_query(self):
+        token = AccessToken.for_user(self.user)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.authenticate(token), self.user)
+        with self.assertNumQueries(0):
+            user = self.authenticate(token)
+        self.assertEqual(user, self.user)
+        user.is_staff = False  # each request gets its own copy
+        self.assertTrue(self.authenticate(token).is_staff)
+
+    def test_saving_the_user_evicts_it(self):
+        token = AccessToken.for_user(self.user)
+        self.authenticate(token)
+        self.user.is_staff = False
+        self.user.save()
+        with self.assertNumQueries(1):
+            self.assertFalse(self.authenticate(token).is_staff)
+
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+
+    def test_cached_hits_are_still_checked(self):
+        token = AccessToken.for_user(self.user)
+        inactive = copy.copy(self.user)
+        inactive.is_active = False
+        user_cache.set(self.user.id, inactive, 60)  # e.g. cached before another worker saw the save
+        with self.assertNumQueries(0), self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+
+    def test_tokens_from_before_a_password_change_are_revoked_on_a_cached_hit(self):
+        with mock.patch.object(jwt_settings, 'CHECK_REVOKE_TOKEN', True):
+            old_token = AccessToken.for_user(self.user)
+            self.user.set_password('second-pass')
+            self.user.save()
+            self.assertEqual(self.authenticate(AccessToken.for_user(self.user)), self.user)
+            with self.assertNumQueries(0), self.assertRaises(AuthenticationFailed):
+                self.authenticate(old_token)
+
+    @override_settings(JWT_USER_RESOLUTION='claims')
+    def test_claims_mode_trusts_the_token(self):
+        token = StaffClaimsTokenObtainPairSerializer.get_token(self.user).access_token
+        with self.assertNumQueries(0):
+            user = self.authenticate(token)
+        self.assertIsInstance(user, TokenUser)
+        self.assertTrue(IsAdminUserOnly().has_permission(mock.Mock(user=user), None))
+
+        # Tokens issued before the claims existed use the cache instead.
+        old_token = AccessToken.for_user(self.user)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.authenticate(old_token), self.user)
+        with self.assertNumQueries(0):
+            self.authenticate(old_token)
@@ -0,0 +1,205 @@
+"""
+Per-client throttling and admission control for expensive endpoints.
+
+Throttling: each scope in ``THROTTLE_RATES`` maps to a pair of rates,
+``(per_client, per_route)``. Both are token buckets of the form ``"N/period"``
+(``s``, ``m``, ``h``, ``d``), which hold up to N tokens and refill at N per
+period, so short bursts pass while sustained floods do not. Either rate may be
+None. A request that finds a bucket empty gets a 429 with ``Retry-After``.
+DRF views use ``TokenBucketThrottle`` subclasses via ``throttle_classes``, and
+plain Django views use the ``throttle(scope)`` decorator. Buckets live in
+process memory, so every worker enforces its own share of the limit.
+
+Admission control: views marked ``expensive = True`` (an APIView class
+attribute, or the ``expensive`` decorator for function views) share one
+in-flight cap, ``EXPENSIVE_MAX_IN_FLIGHT``. ``AdmissionControlMiddleware``
+sheds any request over the cap right away with a 503, instead of queueing it
+behind slow outbound calls, so cheap routes keep their workers.
+"""
+import functools
+import threading
+import time
+
+from django.conf import settings
+from django.http import JsonResponse
+from rest_framework.throttling import BaseThrottle
+
+from metrics.registry import registry
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+THROTTLED = registry.counter('karen_throttled_total', 'Requests rejected by a token bucket, by scope and limit.')
+ADMISSION = registry.counter('karen_admission_total', 'Expensive requests admitted or shed, by route.')
+
+
+def parse_rate(rate):
+    """``"5/m"`` -> ``(capacity, tokens per second)``."""
+    if not rate:
+        return None
+    count, period = rate.split('/')
+    return int(count), int(count) / PERIODS[period[0]]
+
+
+class TokenBucket:
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, capacity, now):
+        self.tokens = float(capacity)
+        self.updated = now
+
+    def take(self, capacity, refill, now):
+        """Spend one token; returns 0 on success or the seconds until one is available."""
+        self.tokens = min(capacity, self.tokens + (now - self.updated) * refill)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / refill
+
+
+class BucketStore:
+    # Full buckets are indistinguishable from new ones; drop them now and then.
+    PRUNE_EVERY = 1000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._calls = 0
+
+    def take(self, key, rate, now=None):
+        capacity, refill = rate
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(capacity, now)
+            wait = bucket.take(capacity, refill, now)
+            self._calls += 1
+            if self._calls % self.PRUNE_EVERY == 0:
+                self._prune(now)
+            return wait
+
+    def _prune(self, now):
+        idle = [key for key, bucket in self._buckets.items() if now - bucket.updated > 86400]
+        for key in idle:
+            del self._buckets[key]
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+buckets = BucketStore()
+
+
+def scope_rates(scope):
+    client, route = getattr(settings, 'THROTTLE_RATES', {}).get(scope, (None, None))
+    return parse_rate(client), parse_rate(route)
+
+
+def check(scope, ident):
+    """Seconds the caller must wait, or 0 if both buckets had a token."""
+    client_rate, route_rate = scope_rates(scope)
+    if client_rate:
+        wait = buckets.take((scope, ident), client_rate)
+        if wait:
+            registry.record(THROTTLED.inc, (('scope', scope), ('limit', 'client')))
+            return wait
+    if route_rate:
+        wait = buckets.take((scope,), route_rate)
+        if wait:
+            registry.record(THROTTLED.inc, (('scope', scope), ('limit', 'route')))
+            return wait
+    return 0
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Set ``scope`` to a key of ``THROTTLE_RATES``."""
+    scope = None
+
+    def allow_request(self, request, view):
+        self._wait = check(self.scope, self.get_ident(request))
+        return not self._wait
+
+    def wait(self):
+        return self._wait
+
+
+class STKPushThrottle(TokenBucketThrottle):
+    scope = 'stk-push'
+
+
+class ListThrottle(TokenBucketThrottle):
+    scope = 'list'
+
+
+def throttle(scope):
+    """Token-bucket throttling for a plain Django view."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            wait = check(scope, BaseThrottle().get_ident(request))
+            if wait:
+                response = JsonResponse({'error': 'Too many requests, slow down.'}, status=429)
+                response['Retry-After'] = str(max(1, round(wait)))
+                return response
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def expensive(view):
+    """Mark a function view for admission control (``expensive = True`` on APIViews)."""
+    view.expensive = True
+    return view
+
+
+class ConcurrencyLimiter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+
+    def try_acquire(self, limit):
+        with self._lock:
+            if self.in_flight >= limit:
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+
+limiter = ConcurrencyLimiter()
+
+
+class AdmissionControlMiddleware:
+    """Shed ``expensive`` requests with a 503 while ``EXPENSIVE_MAX_IN_FLIGHT`` are already running."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            return self.get_response(request)
+        finally:
+            if getattr(request, '_admitted', False):
+                limiter.release()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'view_class', None) or getattr(view_func, 'cls', None)
+        if not (getattr(view_class, 'expensive', False) or getattr(view_func, 'expensive', False)):
+            return None
+        limit = getattr(settings, 'EXPENSIVE_MAX_IN_FLIGHT', 0)
+        if not limit:
+            return None
+        route = request.resolver_match.url_name or request.resolver_match.view_name
+        if limiter.try_acquire(limit):
+            request._admitted = True
+            registry.record(ADMISSION.inc, (('route', route), ('outcome', 'admitted')))
+            return None
+        registry.record(ADMISSION.inc, (('route', route), ('outcome', 'shed')))
+        response = JsonResponse({'error': 'Server busy, try again shortly.'}, status=503)
+        response['Retry-After'] = '1'
+        return response
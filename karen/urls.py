@@ -18,6 +18,7 @@ urlpatterns = [
     path('api/orders/', include('orders.urls')),      # distinct prefix
     path('api/mpesa/', include('mpesa.urls')),
     path('api/', include('emails.urls')), 
+    path('api/metrics/', include('metrics.urls')),
 
 ]
 
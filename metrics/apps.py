@@ -0,0 +1,18 @@
+from django.apps import AppConfig
+
+
+class MetricsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'metrics'
+
+    def ready(self):
+        from .collectors import admission_metrics, db_connection_metrics, payment_notification_metrics
+        from .dbconn import install_connection_tracking
+        from .middleware import install_serializer_timer
+        from .registry import registry
+
+        install_serializer_timer()
+        install_connection_tracking()
+        registry.register_collector(payment_notification_metrics)
+        registry.register_collector(db_connection_metrics)
+        registry.register_collector(admission_metrics)
@@ -0,0 +1,7 @@
+"""
+API benchmark suite.
+
+``seed`` builds a synthetic dataset, ``routes`` lists one request per URL
+pattern, and ``runner`` replays them through the Django test client with
+Safaricom and SMTP stubbed out. Run it with ``manage.py run_benchmarks``.
+"""
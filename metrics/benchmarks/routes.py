@@ -0,0 +1,119 @@
+"""
+One benchmark request per URL pattern in products/, orders/, mpesa/ and emails/.
+
+Paths and bodies may be callables taking ``(data, i)`` where ``data`` is the
+``SeededData`` and ``i`` the iteration number, so write routes can use fresh
+values (unique slugs, receipt numbers) on every call.
+"""
+from dataclasses import dataclass
+from typing import Any, Callable, Union
+
+from django.utils import timezone
+
+from orders.settlement import daraja_timestamp
+
+
+@dataclass
+class Route:
+    name: str
+    method: str
+    path: Union[str, Callable]
+    body: Any = None
+    admin: bool = False
+
+    def resolve_path(self, data, i):
+        return self.path(data, i) if callable(self.path) else self.path
+
+    def resolve_body(self, data, i):
+        return self.body(data, i) if callable(self.body) else self.body
+
+
+def _pick(ids, i):
+    return ids[i % len(ids)]
+
+
+def _product_body(data, i):
+    return {
+        'name': f'Bench product {i}',
+        'description': 'Created by the benchmark suite',
+        'price': '123.00',
+        'unit': 'kg',
+        'category': _pick(data.category_ids, i),
+    }
+
+
+def _order_body(data, i):
+    return {
+        'customer_name': f'Bench customer {i}',
+        'customer_phone': _pick(data.phones, i),
+        'payment_method': 'mpesa',
+        'total_amount': '500.00',
+        'items': [
+            {'product_id': _pick(data.product_ids, i + n), 'quantity': 1 + n}
+            for n in range(3)
+        ],
+    }
+
+
+def _callback_body(data, i):
+    order_id = _pick(data.order_ids, i)
+    return {
+        'Body': {
+            'stkCallback': {
+                'MerchantRequestID': f'bench-merchant-{i}',
+                'CheckoutRequestID': f'ws_CO_bench_{i}',
+                'ResultCode': 0,
+                'ResultDesc': 'The service request is processed successfully.',
+                'AccountReference': str(order_id),
+                'CallbackMetadata': {
+                    'Item': [
+                        {'Name': 'Amount', 'Value': 500},
+                        {'Name': 'MpesaReceiptNumber', 'Value': f'BENCHCB{i:07d}'},
+                        {'Name': 'TransactionDate', 'Value': daraja_timestamp(timezone.now())},
+                        {'Name': 'PhoneNumber', 'Value': int('254' + _pick(data.phones, i)[1:])},
+                    ],
+                },
+            },
+        },
+    }
+
+
+ROUTES = [
+    # products/urls.py
+    Route('product-list', 'GET', '/api/products/?sort=price_asc'),
+    Route('category-list', 'GET', '/api/categories/'),
+    Route('product-create', 'POST', '/api/products/create/', _product_body, admin=True),
+    Route('product-detail', 'GET', lambda d, i: f'/api/products/{_pick(d.product_ids, i)}/', admin=True),
+    Route('product-detail:put', 'PUT', lambda d, i: f'/api/products/{_pick(d.product_ids, i)}/', _product_body, admin=True),
+    Route('category-create', 'POST', '/api/categories/create/',
+          lambda d, i: {'name': f'Bench category {i}', 'slug': f'bench-category-{i}'}, admin=True),
+    Route('category-detail', 'PUT', lambda d, i: f'/api/categories/{_pick(d.category_ids, i)}/',
+          lambda d, i: {'name': f'Category {i}', 'slug': f'category-renamed-{i}'}, admin=True),
+    Route('frontend-product-list', 'GET', '/api/frontend/products/'),
+    Route('product-frontend-detail', 'GET', lambda d, i: f'/api/frontend/products/{_pick(d.product_ids, i)}/'),
+
+    # orders/urls.py
+    Route('order-create', 'POST', '/api/orders/create/', _order_body),
+    Route('order-by-phone', 'GET', lambda d, i: f'/api/orders/by-phone/?phone={_pick(d.phones, i)}'),
+    Route('all-orders', 'GET', '/api/orders/all/'),
+    Route('orders-by-date', 'GET', lambda d, i: f'/api/orders/by-date/?date={timezone.now().date().isoformat()}'),
+    Route('location-list', 'GET', '/api/orders/locations/'),
+    Route('location-list:post', 'POST', '/api/orders/locations/',
+          lambda d, i: {'name': f'Bench location {i}', 'delivery_price': '150.00'}, admin=True),
+    Route('location-detail', 'PUT', lambda d, i: f'/api/orders/locations/{_pick(d.location_ids, i)}/',
+          lambda d, i: {'name': f'Location renamed {i}', 'delivery_price': '200.00'}, admin=True),
+    Route('mpesa-callback', 'POST', '/api/orders/callback/', _callback_body),
+    Route('mpesa-transactions', 'GET', '/api/orders/transactions/'),
+    Route('mpesa-transactions-by-phone', 'GET', lambda d, i: f'/api/orders/transactions/by-phone/?phone={_pick(d.phones, i)}'),
+    Route('monthly-earnings', 'GET', '/api/orders/earnings/monthly/'),
+    Route('mpesa-status', 'GET', lambda d, i: f'/api/orders/status/?id={_pick(d.order_ids, i)}'),
+
+    # mpesa/urls.py (Safaricom is stubbed by the runner)
+    Route('mpesa-token', 'GET', '/api/mpesa/token/'),
+    Route('mpesa-stkpush', 'POST', '/api/mpesa/stkpush/',
+          lambda d, i: {'phone': _pick(d.phones, i), 'amount': 1, 'order_id': _pick(d.order_ids, i)}),
+
+    # emails/urls.py (SMTP replaced by the locmem backend)
+    Route('book-tour', 'POST', '/api/book-tour/',
+          lambda d, i: {'name': f'Guest {i}', 'email': f'guest{i}@example.com', 'date': '2026-11-01', 'time': '10:00', 'guests': 4}),
+]
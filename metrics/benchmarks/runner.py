@@ -0,0 +1,191 @@
+"""
+Replay the benchmark routes and build a JSON-serialisable report.
+
+Outbound calls are stubbed: the Daraja client talks to a local
+``DarajaStub`` (mpesa/daraja_stub.py), the remaining module-level
+``requests.get``/``requests.post`` calls return canned responses and the
+email backend is locmem (set by ``setup_test_environment``), so results
+measure this code base only.
+"""
+import json
+import platform
+import statistics
+import subprocess
+import time
+from contextlib import ExitStack, redirect_stdout
+from io import StringIO
+from unittest import mock
+
+import django
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from metrics.querylog import inspect_queries
+from mpesa.daraja import reset_client
+from mpesa.daraja_stub import DarajaStub
+
+from .routes import ROUTES
+
+
+class _StubResponse:
+    def __init__(self, payload, status_code=200):
+        self._payload = payload
+        self.status_code = status_code
+
+    def json(self):
+        return self._payload
+
+    def raise_for_status(self):
+        pass
+
+
+def _stub_get(url, *args, **kwargs):
+    return _StubResponse({'access_token': 'bench-token', 'expires_in': '3599'})
+
+
+def _stub_post(url, *args, **kwargs):
+    return _StubResponse({
+        'MerchantRequestID': 'bench-merchant',
+        'CheckoutRequestID': 'ws_CO_bench',
+        'ResponseCode': '0',
+        'ResponseDescription': 'Success. Request accepted for processing',
+        'CustomerMessage': 'Success. Request accepted for processing',
+    })
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _request(client, route, data, i, headers):
+    path = route.resolve_path(data, i)
+    body = route.resolve_body(data, i)
+    method = getattr(client, route.method.lower())
+    if body is None:
+        return method(path, **headers)
+    return method(path, data=json.dumps(body), content_type='application/json', **headers)
+
+
+def run_route(client, route, data, iterations, warmup, admin_headers):
+    headers = admin_headers if route.admin else {}
+    latencies, query_counts, statuses, sizes = [], [], {}, []
+
+    for i in range(warmup):
+        _request(client, route, data, i, headers)
+
+    for i in range(warmup, warmup + iterations):
+        with inspect_queries(capture_stack=False) as inspector:
+            start = time.perf_counter()
+            response = _request(client, route, data, i, headers)
+            latencies.append((time.perf_counter() - start) * 1000)
+        query_counts.append(len(inspector.queries))
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        if not response.streaming:
+            sizes.append(len(response.content))
+
+    latencies.sort()
+    return {
+        'method': route.method,
+        'iterations': iterations,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50), 3),
+            'p90': round(percentile(latencies, 90), 3),
+            'p99': round(percentile(latencies, 99), 3),
+            'mean': round(statistics.fmean(latencies), 3),
+            'min': round(latencies[0], 3),
+            'max': round(latencies[-1], 3),
+        },
+        'queries': {
+            'median': statistics.median(query_counts),
+            'max': max(query_counts),
+        },
+        'response_bytes': int(statistics.median(sizes)) if sizes else None,
+        'statuses': {str(code): count for code, count in sorted(statuses.items())},
+    }
+
+
+def run_benchmarks(data, size, iterations=20, warmup=2, only=None):
+    client = Client()
+    token = RefreshToken.for_user(data.admin).access_token
+    admin_headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+
+    routes = [r for r in ROUTES if not only or r.name in only]
+    results = {}
+    with ExitStack() as stack:
+        stack.enter_context(mock.patch('requests.get', side_effect=_stub_get))
+        stack.enter_context(mock.patch('requests.post', side_effect=_stub_post))
+        # DarajaClient uses its own requests.Session, which the patches above do not reach.
+        daraja_stub = DarajaStub().start()
+        stack.callback(daraja_stub.stop)
+        # Some views print debug output; keep it out of a report written to stdout.
+        stack.enter_context(redirect_stdout(StringIO()))
+        stack.enter_context(override_settings(
+            EMAIL_OUTBOX_WORKER=False,
+            PAYMENT_NOTIFICATIONS_ASYNC=False,
+            PAYMENT_NOTIFICATION_SINKS=['orders.notifications.LocalSink'],
+            PERF_METRICS_SAMPLE_RATE=0,
+            MPESA_API_BASE_URL=daraja_stub.base_url,
+            # Measure the views, not the rate limits and load shedding in front of them.
+            THROTTLE_RATES={},
+            EXPENSIVE_MAX_IN_FLIGHT=0,
+        ))
+        from orders.notifications import reset_notifier
+        reset_notifier()
+        stack.callback(reset_notifier)
+        reset_client()
+        stack.callback(reset_client)
+
+        for route in routes:
+            results[route.name] = run_route(client, route, data, iterations, warmup, admin_headers)
+
+    return {
+        'meta': {
+            'commit': _git_commit(),
+            'django': django.get_version(),
+            'python': platform.python_version(),
+            'database': connection.vendor,
+            'dataset': vars(size),
+            'iterations': iterations,
+            'warmup': warmup,
+        },
+        'routes': results,
+    }
+
+
+def compare_reports(baseline, current, threshold=0.2, min_delta_ms=1.0):
+    """
+    Return regressions between two reports: routes whose p50 latency grew by
+    more than ``threshold`` (and at least ``min_delta_ms``) or whose median
+    query count went up.
+    """
+    regressions = []
+    for name, now in current['routes'].items():
+        before = baseline.get('routes', {}).get(name)
+        if before is None:
+            continue
+        old_p50, new_p50 = before['latency_ms']['p50'], now['latency_ms']['p50']
+        if new_p50 - old_p50 >= min_delta_ms and old_p50 and (new_p50 - old_p50) / old_p50 > threshold:
+            regressions.append({'route': name, 'metric': 'latency_ms.p50', 'before': old_p50, 'after': new_p50})
+        if now['queries']['median'] > before['queries']['median']:
+            regressions.append({
+                'route': name, 'metric': 'queries.median',
+                'before': before['queries']['median'], 'after': now['queries']['median'],
+            })
+    return regressions
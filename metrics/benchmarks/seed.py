@@ -0,0 +1,123 @@
+"""Deterministic synthetic dataset for the benchmark suite."""
+import random
+from dataclasses import dataclass, field
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from orders.models import Location, MpesaTransaction, Order, OrderItem
+from products.models import Category, Product
+
+
+@dataclass
+class DatasetSize:
+    categories: int = 10
+    products: int = 200
+    orders: int = 500
+    items_per_order: int = 3
+    transactions: int = 300
+    locations: int = 15
+
+
+@dataclass
+class SeededData:
+    admin: User
+    category_ids: list = field(default_factory=list)
+    product_ids: list = field(default_factory=list)
+    order_ids: list = field(default_factory=list)
+    location_ids: list = field(default_factory=list)
+    phones: list = field(default_factory=list)
+
+
+def _phone(rng):
+    return f"07{rng.randint(10000000, 99999999)}"
+
+
+def seed_dataset(size, seed=42, batch_size=500):
+    """Insert ``size`` worth of rows with bulk_create and return their ids."""
+    rng = random.Random(seed)
+    now = timezone.now()
+
+    admin = User.objects.create_user('bench-admin', password='bench-admin', is_staff=True)
+
+    categories = Category.objects.bulk_create(
+        [Category(name=f"Category {i}", slug=f"category-{i}") for i in range(size.categories)],
+        batch_size=batch_size,
+    )
+    products = Product.objects.bulk_create(
+        [
+            Product(
+                name=f"Product {i}",
+                description=f"Synthetic product {i}",
+                long_description="Lorem ipsum " * rng.randint(1, 20),
+                price=Decimal(rng.randint(50, 5000)),
+                unit=rng.choice(['kg', 'tray', 'litre', 'piece']),
+                category=rng.choice(categories),
+            )
+            for i in range(size.products)
+        ],
+        batch_size=batch_size,
+    )
+    locations = Location.objects.bulk_create(
+        [Location(name=f"Location {i}", delivery_price=Decimal(rng.randint(0, 500))) for i in range(size.locations)],
+        batch_size=batch_size,
+    )
+
+    phones = [_phone(rng) for _ in range(max(1, size.orders // 5))]
+    orders = Order.objects.bulk_create(
+        [
+            Order(
+                customer_name=f"Customer {i}",
+                customer_phone=rng.choice(phones),
+                payment_method='mpesa',
+                transaction_id="",
+                total_amount=Decimal(rng.randint(100, 20000)),
+                is_paid=rng.random() < 0.7,
+            )
+            for i in range(size.orders)
+        ],
+        batch_size=batch_size,
+    )
+    # created_at is auto_now_add; spread orders over the last year for the
+    # date-based and earnings views.
+    for order in orders:
+        order.created_at = now - timedelta(minutes=rng.randint(0, 365 * 24 * 60))
+    Order.objects.bulk_update(orders, ['created_at'], batch_size=batch_size)
+
+    OrderItem.objects.bulk_create(
+        [
+            OrderItem(order=order, product=product, quantity=rng.randint(1, 5))
+            for order in orders
+            for product in rng.sample(products, min(size.items_per_order, len(products)))
+        ],
+        batch_size=batch_size,
+    )
+
+    MpesaTransaction.objects.bulk_create(
+        [
+            MpesaTransaction(
+                receipt_number=f"BENCH{i:08d}",
+                phone_number=rng.choice(phones),
+                amount=Decimal(rng.randint(100, 20000)),
+                transaction_date=now - timedelta(minutes=rng.randint(0, 365 * 24 * 60)),
+                merchant_request_id=f"merchant-{i}",
+                checkout_request_id=f"ws_CO_{i}",
+                result_code=0,
+                result_description="The service request is processed successfully.",
+                order=rng.choice(orders) if orders and rng.random() < 0.8 else None,
+            )
+            for i in range(size.transactions)
+        ],
+        batch_size=batch_size,
+    )
+
+    return SeededData(
+        admin=admin,
+        category_ids=[c.id for c in categories],
+        product_ids=[p.id for p in products],
+        order_ids=[o.id for o in orders],
+        location_ids=[loc.id for loc in locations],
+        phones=phones,
+    )
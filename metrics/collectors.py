@@ -0,0 +1,42 @@
+"""Scrape-time collectors for counters owned by other apps."""
+
+
+def payment_notification_metrics():
+    from orders.notifications import get_notifier
+
+    stats = get_notifier().stats()
+    sinks = stats['sinks'].items()
+    return [
+        ('karen_payment_notifications_total', 'counter', 'Payment notifications delivered per sink and outcome.',
+         [((('sink', name), ('outcome', 'sent')), s['sent']) for name, s in sinks]
+         + [((('sink', name), ('outcome', 'failed')), s['failed']) for name, s in sinks]),
+        ('karen_payment_notification_avg_ms', 'gauge', 'Average sink delivery latency in milliseconds.',
+         [((('sink', name),), s['avg_ms']) for name, s in sinks]),
+        ('karen_payment_notification_max_ms', 'gauge', 'Slowest sink delivery in milliseconds.',
+         [((('sink', name),), s['max_ms']) for name, s in sinks]),
+        ('karen_payment_notifications_dropped_total', 'counter', 'Payment events dropped because the queue was full.',
+         [((), stats['dropped'])]),
+    ]
+
+
+def db_connection_metrics():
+    from .dbconn import connection_stats
+
+    stats = connection_stats().items()
+    return [
+        ('karen_db_connections_open', 'gauge', 'Database connections currently open in this process.',
+         [((('alias', alias),), s['open']) for alias, s in stats]),
+        ('karen_db_connection_max_age_seconds', 'gauge', 'Age of the oldest open database connection.',
+         [((('alias', alias),), s['max_age_s']) for alias, s in stats]),
+        ('karen_db_connection_avg_age_seconds', 'gauge', 'Average age of open database connections.',
+         [((('alias', alias),), s['avg_age_s']) for alias, s in stats]),
+    ]
+
+
+def admission_metrics():
+    from karen.throttling import limiter
+
+    return [
+        ('karen_expensive_requests_in_flight', 'gauge', 'Expensive requests currently running in this process.',
+         [((), limiter.in_flight)]),
+    ]
@@ -0,0 +1,87 @@
+"""
+Database connection instrumentation.
+
+``install_connection_tracking`` wraps ``BaseDatabaseWrapper.connect`` and
+``close`` once per process to count new connections and closes per alias and
+time how long connecting takes (the wait a request pays when it cannot
+reuse a connection). Open connections are tracked weakly so the scrape-time
+collector can report how many are open and how old they are.
+"""
+import threading
+import time
+import weakref
+
+from django.db.backends.base.base import BaseDatabaseWrapper
+
+from .registry import registry
+
+CONNECT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+CONNECTS = registry.counter('karen_db_connections_opened_total', 'New database connections opened, by alias.')
+CLOSES = registry.counter('karen_db_connections_closed_total', 'Database connections closed, by alias.')
+CONNECT_TIME = registry.histogram(
+    'karen_db_connect_seconds', 'Time spent establishing a database connection.', CONNECT_BUCKETS,
+)
+
+_open = weakref.WeakSet()
+_open_lock = threading.Lock()
+
+
+def _count_connect(labels, elapsed):
+    CONNECTS.inc(labels)
+    CONNECT_TIME.observe(elapsed, labels)
+
+
+def _wrap_connect(connect):
+    def wrapper(self, *args, **kwargs):
+        start = time.perf_counter()
+        result = connect(self, *args, **kwargs)
+        elapsed = time.perf_counter() - start
+        self._opened_at = time.monotonic()
+        with _open_lock:
+            _open.add(self)
+        registry.record(_count_connect, (('alias', self.alias),), elapsed)
+        return result
+    wrapper._conn_tracked = True
+    return wrapper
+
+
+def _wrap_close(close):
+    def wrapper(self, *args, **kwargs):
+        was_open = self.connection is not None
+        try:
+            return close(self, *args, **kwargs)
+        finally:
+            if was_open and self.connection is None:
+                with _open_lock:
+                    _open.discard(self)
+                registry.record(CLOSES.inc, (('alias', self.alias),))
+    wrapper._conn_tracked = True
+    return wrapper
+
+
+def install_connection_tracking():
+    if getattr(BaseDatabaseWrapper.connect, '_conn_tracked', False):
+        return
+    BaseDatabaseWrapper.connect = _wrap_connect(BaseDatabaseWrapper.connect)
+    BaseDatabaseWrapper.close = _wrap_close(BaseDatabaseWrapper.close)
+
+
+def connection_stats():
+    """``{alias: {'open': n, 'max_age_s': ..., 'avg_age_s': ...}}`` for connections open in this process."""
+    now = time.monotonic()
+    with _open_lock:
+        wrappers = [w for w in _open if w.connection is not None]
+    stats = {}
+    for wrapper in wrappers:
+        entry = stats.setdefault(wrapper.alias, {'open': 0, 'ages': []})
+        entry['open'] += 1
+        entry['ages'].append(now - getattr(wrapper, '_opened_at', now))
+    return {
+        alias: {
+            'open': entry['open'],
+            'max_age_s': round(max(entry['ages']), 3),
+            'avg_age_s': round(sum(entry['ages']) / len(entry['ages']), 3),
+        }
+        for alias, entry in stats.items()
+    }
@@ -0,0 +1,86 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client
+from django.test.utils import override_settings
+
+from metrics.benchmarks.runner import percentile
+from metrics.dbconn import CONNECT_TIME, CONNECTS
+
+
+def _connect_totals(alias):
+    labels = (('alias', alias),)
+    series = CONNECT_TIME._series.get(labels)
+    return CONNECTS._values.get(labels, 0), (series[1] if series else 0.0)
+
+
+class Command(BaseCommand):
+    help = (
+        "Request a read-only route repeatedly against the configured database, first closing the "
+        "connection after every request and then reusing it, and report latency and connect cost."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/categories/')
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--max-age', type=int, default=60, help="CONN_MAX_AGE for the reuse run.")
+        parser.add_argument('--database', default='default')
+
+    def run(self, client, path, alias, max_age, count):
+        connection = connections[alias]
+        connection.close()
+        connection.settings_dict['CONN_MAX_AGE'] = max_age
+        connects_before, connect_time_before = _connect_totals(alias)
+        latencies = []
+        start = time.perf_counter()
+        for _ in range(count):
+            began = time.perf_counter()
+            # The test client skips the request_started/finished connection
+            # housekeeping that the WSGI handler does, so do it here.
+            connection.close_if_unusable_or_obsolete()
+            client.get(path)
+            connection.close_if_unusable_or_obsolete()
+            latencies.append((time.perf_counter() - began) * 1000)
+        elapsed = time.perf_counter() - start
+        connects, connect_time = _connect_totals(alias)
+        connects -= connects_before
+        connect_time -= connect_time_before
+        latencies.sort()
+        return {
+            'conn_max_age': max_age,
+            'latency_ms': {
+                'p50': round(percentile(latencies, 50), 3),
+                'p90': round(percentile(latencies, 90), 3),
+                'mean': round(statistics.fmean(latencies), 3),
+            },
+            'connects': connects,
+            'connects_per_sec': round(connects / elapsed, 1),
+            'connect_ms_total': round(connect_time * 1000, 3),
+            'connect_ms_per_request': round(connect_time * 1000 / count, 3),
+        }
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        original = connections[alias].settings_dict['CONN_MAX_AGE']
+        client = Client()
+        try:
+            with override_settings(ALLOWED_HOSTS=['*'], PERF_METRICS_SAMPLE_RATE=0):
+                client.get(options['path'])  # warm up imports and caches
+                fresh = self.run(client, options['path'], alias, 0, options['requests'])
+                reused = self.run(client, options['path'], alias, options['max_age'], options['requests'])
+        finally:
+            connections[alias].close()
+            connections[alias].settings_dict['CONN_MAX_AGE'] = original
+
+        report = {
+            'database': connections[alias].vendor,
+            'path': options['path'],
+            'requests': options['requests'],
+            'connect_per_request': fresh,
+            'reuse': reused,
+            'p50_saved_ms': round(fresh['latency_ms']['p50'] - reused['latency_ms']['p50'], 3),
+        }
+        self.stdout.write(json.dumps(report, indent=2))
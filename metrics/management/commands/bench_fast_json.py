@@ -0,0 +1,84 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from karen import fastjson
+from metrics.benchmarks.seed import DatasetSize, seed_dataset
+from orders.models import Order
+from products.models import Product
+
+ENDPOINTS = ['all-orders', 'frontend-product-list']
+
+
+def _time(client, path, iterations):
+    latencies = []
+    response = None
+    for _ in range(iterations):
+        start = time.perf_counter()
+        response = client.get(path)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return response, {
+        'p50': round(statistics.median(latencies), 3),
+        'min': round(latencies[0], 3),
+        'max': round(latencies[-1], 3),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the serializer and FAST_JSON_LISTS paths of the large list endpoints on a "
+        "throwaway test database: checks the responses are byte-identical and reports latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=5000)
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--iterations', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        size = DatasetSize(products=options['products'], orders=options['orders'], transactions=0)
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            data = seed_dataset(size, seed=options['seed'])
+            # Cover the awkward cases: images, locations, non-ASCII and U+2028.
+            Product.objects.filter(id__in=data.product_ids[::3]).update(image='product_images/bench.jpg')
+            Product.objects.filter(id=data.product_ids[0]).update(name='Sukuma wiki \u2014 \u201cfresh\u201d\u2028\u2713')
+            Order.objects.filter(id__in=data.order_ids[::4]).update(location_id=data.location_ids[0])
+            report = self.compare(options['iterations'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(json.dumps(report, indent=2))
+        mismatched = [name for name, result in report['endpoints'].items() if not result['identical']]
+        if mismatched:
+            raise CommandError(f"Fast path output differs for: {', '.join(mismatched)}")
+
+    def compare(self, iterations):
+        client = Client()
+        results = {}
+        for name in ENDPOINTS:
+            path = reverse(name)
+            with override_settings(FAST_JSON_LISTS=False):
+                baseline, slow = _time(client, path, iterations)
+            with override_settings(FAST_JSON_LISTS=True):
+                fast_response, fast = _time(client, path, iterations)
+            results[name] = {
+                'identical': baseline.content == fast_response.content,
+                'rows': len(json.loads(baseline.content)),
+                'bytes': len(baseline.content),
+                'serializer_ms': slow,
+                'fast_ms': fast,
+                'speedup': round(slow['p50'] / fast['p50'], 2) if fast['p50'] else None,
+            }
+        return {'orjson': fastjson.orjson is not None, 'endpoints': results}
@@ -0,0 +1,80 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from metrics.benchmarks.routes import ROUTES
+from metrics.benchmarks.runner import compare_reports, run_benchmarks
+from metrics.benchmarks.seed import DatasetSize, seed_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database with synthetic data, hit every API route through "
+        "the Django test client and write latency percentiles and query counts as JSON."
+    )
+
+    def add_arguments(self, parser):
+        defaults = DatasetSize()
+        parser.add_argument('--categories', type=int, default=defaults.categories)
+        parser.add_argument('--products', type=int, default=defaults.products)
+        parser.add_argument('--orders', type=int, default=defaults.orders)
+        parser.add_argument('--items-per-order', type=int, default=defaults.items_per_order)
+        parser.add_argument('--transactions', type=int, default=defaults.transactions)
+        parser.add_argument('--locations', type=int, default=defaults.locations)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--route', action='append', dest='routes', help="Only run this route (repeatable).")
+        parser.add_argument('--output', help="Write the JSON report here instead of stdout.")
+        parser.add_argument('--compare', help="Baseline report to diff against; exits non-zero on regressions.")
+        parser.add_argument('--threshold', type=float, default=0.2, help="Allowed relative p50 increase (default 0.2).")
+        parser.add_argument('--keepdb', action='store_true')
+
+    def handle(self, *args, **options):
+        known = {route.name for route in ROUTES}
+        unknown = set(options['routes'] or []) - known
+        if unknown:
+            raise CommandError(f"Unknown route(s): {', '.join(sorted(unknown))}")
+
+        size = DatasetSize(
+            categories=options['categories'],
+            products=options['products'],
+            orders=options['orders'],
+            items_per_order=options['items_per_order'],
+            transactions=options['transactions'],
+            locations=options['locations'],
+        )
+
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            data = seed_dataset(size, seed=options['seed'])
+            report = run_benchmarks(
+                data, size,
+                iterations=options['iterations'],
+                warmup=options['warmup'],
+                only=options['routes'],
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                fh.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+        if options['compare']:
+            with open(options['compare']) as fh:
+                baseline = json.load(fh)
+            regressions = compare_reports(baseline, report, threshold=options['threshold'])
+            for item in regressions:
+                self.stderr.write(f"REGRESSION {item['route']} {item['metric']}: {item['before']} → {item['after']}")
+            if regressions:
+                raise CommandError(f"{len(regressions)} performance regression(s) against {options['compare']}")
+            self.stderr.write("No regressions against baseline.")
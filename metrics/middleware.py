@@ -0,0 +1,136 @@
+"""
+Request-level performance instrumentation.
+
+``PerformanceMiddleware`` times each sampled request and records, per URL name
+and method: wall time, DB query count and time (via ``execute_wrapper``),
+time spent producing serializer ``.data`` and response size. The numbers are
+aggregated in ``metrics.registry`` and served by ``MetricsView``.
+
+Only a ``PERF_METRICS_SAMPLE_RATE`` fraction of requests (default 0.1) pays
+for the DB and serializer hooks; ``karen_requests_total`` still counts every
+request.
+"""
+import random
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+from .registry import registry, DURATION_BUCKETS, COUNT_BUCKETS, SIZE_BUCKETS
+
+_current_sample = ContextVar('perf_sample', default=None)
+
+REQUESTS = registry.counter('karen_requests_total', 'Requests handled, by route, method and status.')
+DURATION = registry.histogram('karen_request_duration_seconds', 'Wall time spent in the view stack.', DURATION_BUCKETS)
+DB_QUERIES = registry.histogram('karen_request_db_queries', 'SQL queries executed per request.', COUNT_BUCKETS)
+DB_TIME = registry.histogram('karen_request_db_seconds', 'Time spent executing SQL per request.', DURATION_BUCKETS)
+SERIALIZER_TIME = registry.histogram('karen_request_serializer_seconds', 'Time spent building serializer data per request.', DURATION_BUCKETS)
+RESPONSE_SIZE = registry.histogram('karen_response_size_bytes', 'Response body size.', SIZE_BUCKETS)
+
+
+class RequestSample:
+    __slots__ = ('queries', 'db_seconds', 'serializer_seconds', 'serializer_depth')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.serializer_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Installed with connection.execute_wrapper().
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_seconds += time.perf_counter() - start
+
+
+def current_sample():
+    return _current_sample.get()
+
+
+def _timed_data(fget):
+    def data(self):
+        sample = _current_sample.get()
+        if sample is None:
+            return fget(self)
+        # Nested serializers call .data on their parents' code path; only the
+        # outermost call is timed.
+        sample.serializer_depth += 1
+        start = time.perf_counter()
+        try:
+            return fget(self)
+        finally:
+            sample.serializer_depth -= 1
+            if sample.serializer_depth == 0:
+                sample.serializer_seconds += time.perf_counter() - start
+    data._perf_timed = True
+    return data
+
+
+def install_serializer_timer():
+    """Wrap DRF's ``Serializer.data`` / ``ListSerializer.data`` properties once."""
+    from rest_framework import serializers
+
+    for cls in (serializers.Serializer, serializers.ListSerializer):
+        prop = cls.__dict__['data']
+        if getattr(prop.fget, '_perf_timed', False):
+            continue
+        cls.data = property(_timed_data(prop.fget))
+
+
+def _route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.url_name or match.view_name or 'unnamed'
+
+
+def _record(labels, status_code, elapsed, sample, size):
+    REQUESTS.inc(labels + (('status', str(status_code)),))
+    if sample is None:
+        return
+    DURATION.observe(elapsed, labels)
+    DB_QUERIES.observe(sample.queries, labels)
+    DB_TIME.observe(sample.db_seconds, labels)
+    SERIALIZER_TIME.observe(sample.serializer_seconds, labels)
+    if size is not None:
+        RESPONSE_SIZE.observe(size, labels)
+
+
+class PerformanceMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'PERF_METRICS_ENABLED', True)
+        self.sample_rate = getattr(settings, 'PERF_METRICS_SAMPLE_RATE', 0.1)
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        sampled = self.sample_rate >= 1 or random.random() < self.sample_rate
+        sample = RequestSample() if sampled else None
+        token = _current_sample.set(sample)
+        start = time.perf_counter()
+        try:
+            if sample is None:
+                response = self.get_response(request)
+            else:
+                with ExitStack() as stack:
+                    for conn in connections.all():
+                        stack.enter_context(conn.execute_wrapper(sample))
+                    response = self.get_response(request)
+        finally:
+            _current_sample.reset(token)
+        elapsed = time.perf_counter() - start
+
+        size = None
+        if sample is not None and not response.streaming:
+            size = len(response.content)
+        labels = (('route', _route_name(request)), ('method', request.method))
+        registry.record(_record, labels, response.status_code, elapsed, sample, size)
+        return response
@@ -0,0 +1,156 @@
+"""
+Slow and duplicate query detection for development and staging.
+
+``QueryInspector`` captures every SQL statement run while it is installed,
+fingerprints it (literals stripped, ``IN (...)`` lists collapsed) and
+remembers the project stack frame that issued it. ``QueryInspectorMiddleware``
+installs one per request and logs a compact report when a query shape repeats
+``QUERY_INSPECTOR_DUPLICATE_THRESHOLD`` times or more (usually an N+1) or a
+single query takes longer than ``QUERY_INSPECTOR_SLOW_MS``.
+
+The middleware removes itself (``MiddlewareNotUsed``) unless
+``QUERY_INSPECTOR_ENABLED`` is set, so production pays nothing.
+"""
+import logging
+import os
+import re
+import time
+import traceback
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\bIN\s*\((?:\s*(?:\?|%s)\s*,?)+\)', re.IGNORECASE)
+_SPACE_RE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """Reduce a statement to its shape: same query with different values → same fingerprint."""
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+_PROJECT_ROOT = str(settings.BASE_DIR) + os.sep
+_SKIP_DIRS = (os.sep + 'site-packages' + os.sep, os.sep + 'metrics' + os.sep)
+
+
+def _origin_frame():
+    for frame in reversed(traceback.extract_stack()):
+        filename = frame.filename
+        if filename.startswith(_PROJECT_ROOT) and not any(d in filename for d in _SKIP_DIRS):
+            return f"{os.path.relpath(filename, _PROJECT_ROOT)}:{frame.lineno} in {frame.name}"
+    return "<unknown>"
+
+
+class CapturedQuery:
+    __slots__ = ('sql', 'fingerprint', 'seconds', 'origin')
+
+    def __init__(self, sql, seconds, origin):
+        self.sql = sql
+        self.fingerprint = fingerprint(sql)
+        self.seconds = seconds
+        self.origin = origin
+
+
+class QueryInspector:
+    def __init__(self, capture_stack=True):
+        self.capture_stack = capture_stack
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        origin = _origin_frame() if self.capture_stack else None
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(CapturedQuery(sql, time.perf_counter() - start, origin))
+
+    @property
+    def total_seconds(self):
+        return sum(q.seconds for q in self.queries)
+
+    def duplicates(self, threshold):
+        """``[(fingerprint, [queries...]), ...]`` for shapes seen at least ``threshold`` times."""
+        groups = defaultdict(list)
+        for query in self.queries:
+            groups[query.fingerprint].append(query)
+        return sorted(
+            ((fp, group) for fp, group in groups.items() if len(group) >= threshold),
+            key=lambda item: -len(item[1]),
+        )
+
+    def slow(self, budget_seconds):
+        return [q for q in self.queries if q.seconds > budget_seconds]
+
+
+@contextmanager
+def inspect_queries(capture_stack=True):
+    """Capture queries on every database alias for the duration of the block."""
+    inspector = QueryInspector(capture_stack=capture_stack)
+    with ExitStack() as stack:
+        for conn in connections.all():
+            stack.enter_context(conn.execute_wrapper(inspector))
+        yield inspector
+
+
+def _shorten(sql, limit=160):
+    return sql if len(sql) <= limit else sql[:limit - 3] + '...'
+
+
+def format_report(inspector, label, duplicate_threshold, slow_seconds):
+    duplicates = inspector.duplicates(duplicate_threshold)
+    slow = inspector.slow(slow_seconds)
+    if not duplicates and not slow:
+        return None
+
+    lines = [
+        f"[query-inspector] {label} queries={len(inspector.queries)} "
+        f"db={inspector.total_seconds * 1000:.1f}ms"
+    ]
+    for fp, group in duplicates:
+        origins = sorted({q.origin for q in group if q.origin})
+        lines.append(
+            f"  duplicate x{len(group)} ({sum(q.seconds for q in group) * 1000:.1f}ms): {_shorten(fp)}"
+        )
+        for origin in origins[:3]:
+            lines.append(f"    at {origin}")
+    for query in slow:
+        lines.append(f"  slow {query.seconds * 1000:.1f}ms: {_shorten(query.fingerprint)}")
+        if query.origin:
+            lines.append(f"    at {query.origin}")
+    return '\n'.join(lines)
+
+
+class QueryInspectorMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_INSPECTOR_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.duplicate_threshold = getattr(settings, 'QUERY_INSPECTOR_DUPLICATE_THRESHOLD', 3)
+        self.slow_seconds = getattr(settings, 'QUERY_INSPECTOR_SLOW_MS', 100) / 1000
+
+    def __call__(self, request):
+        with inspect_queries() as inspector:
+            response = self.get_response(request)
+
+        match = getattr(request, 'resolver_match', None)
+        view = match._func_path if match else 'unmatched'
+        report = format_report(
+            inspector,
+            f"{request.method} {request.path} view={view}",
+            self.duplicate_threshold,
+            self.slow_seconds,
+        )
+        if report:
+            logger.warning(report)
+        return response
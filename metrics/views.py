@@ -0,0 +1,15 @@
+from django.http import HttpResponse
+from rest_framework.views import APIView
+from rest_framework.permissions import IsAuthenticated
+
+from orders.permissions import IsAdminUserOnly
+
+from .registry import registry, PROMETHEUS_CONTENT_TYPE
+
+
+class MetricsView(APIView):
+    """Per-route request metrics in Prometheus text format (admin only)."""
+    permission_classes = [IsAuthenticated, IsAdminUserOnly]
+
+    def get(self, request):
+        return HttpResponse(registry.render(), content_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,120 @@
+"""
+Daraja (Safaricom M-Pesa API) client.
+
+One ``DarajaClient`` per process (``get_client()``) shares a pooled HTTP
+session and the OAuth access token, which is reused until shortly before it
+expires instead of being fetched for every call. ``MPESA_API_BASE_URL``
+points the client at the sandbox, production or a local stub
+(mpesa/daraja_stub.py).
+"""
+import base64
+import datetime
+import logging
+import threading
+import time
+
+import requests
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Refresh the token this long before Daraja says it expires.
+TOKEN_EXPIRY_MARGIN = 60
+
+
+class DarajaError(Exception):
+    pass
+
+
+def timestamp():
+    return datetime.datetime.now().strftime('%Y%m%d%H%M%S')
+
+
+def stk_password(shortcode, passkey, ts):
+    return base64.b64encode(f"{shortcode}{passkey}{ts}".encode()).decode()
+
+
+class DarajaClient:
+    def __init__(self, base_url=None, timeout=None):
+        self.base_url = (base_url or getattr(settings, 'MPESA_API_BASE_URL', 'https://sandbox.safaricom.co.ke')).rstrip('/')
+        self.timeout = timeout or getattr(settings, 'MPESA_HTTP_TIMEOUT', 10)
+        self.session = requests.Session()
+        self._token_lock = threading.Lock()
+        self._token = None
+        self._token_expires = 0.0
+
+    def fetch_token(self):
+        """Request a new OAuth token. Returns ``(token, expires_in)`` or raises DarajaError."""
+        encoded = base64.b64encode(
+            f"{settings.MPESA_CONSUMER_KEY}:{settings.MPESA_CONSUMER_SECRET}".encode()
+        ).decode()
+        response = self.session.get(
+            f"{self.base_url}/oauth/v1/generate",
+            params={'grant_type': 'client_credentials'},
+            headers={"Authorization": f"Basic {encoded}"},
+            timeout=self.timeout,
+        )
+        if response.status_code != 200:
+            raise DarajaError(f"Token request failed with HTTP {response.status_code}")
+        data = response.json()
+        return data["access_token"], int(data.get("expires_in", 3599))
+
+    def get_token(self, refresh=False):
+        with self._token_lock:
+            if refresh or self._token is None or time.monotonic() >= self._token_expires:
+                token, expires_in = self.fetch_token()
+                self._token = token
+                self._token_expires = time.monotonic() + max(expires_in - TOKEN_EXPIRY_MARGIN, 0)
+            return self._token
+
+    def invalidate_token(self):
+        with self._token_lock:
+            self._token = None
+
+    def post(self, path, payload):
+        """POST with the cached token, fetching a new one once if Daraja rejects it."""
+        for attempt in range(2):
+            token = self.get_token(refresh=attempt > 0)
+            response = self.session.post(
+                f"{self.base_url}{path}",
+                json=payload,
+                headers={"Authorization": f"Bearer {token}"},
+                timeout=self.timeout,
+            )
+            if response.status_code != 401:
+                return response
+            logger.info("Daraja rejected the cached access token; fetching a new one")
+            self.invalidate_token()
+        return response
+
+    def stk_push(self, payload):
+        return self.post("/mpesa/stkpush/v1/processrequest", payload)
+
+    def stk_query(self, checkout_request_id):
+        ts = timestamp()
+        shortcode = settings.MPESA_SHORTCODE
+        return self.post("/mpesa/stkpushquery/v1/query", {
+            "BusinessShortCode": shortcode,
+            "Password": stk_password(shortcode, settings.MPESA_PASSKEY, ts),
+            "Timestamp": ts,
+            "CheckoutRequestID": checkout_request_id,
+        })
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = DarajaClient()
+        return _client
+
+
+def reset_client():
+    """Drop the shared client, e.g. after MPESA_API_BASE_URL changes."""
+    global _client
+    with _client_lock:
+        _client = None
@@ -0,0 +1,135 @@
+"""
+A local stand-in for the Daraja API, for tests and offline development.
+
+``DarajaStub`` serves the three endpoints the client uses (OAuth token, STK
+push, STK query) on a background thread. Each accepted push is remembered
+under its CheckoutRequestID, and tests set the query answer with
+``stub.complete(checkout_id, result_code)``. Until then, queries return the
+"transaction is being processed" error Daraja gives while the customer is
+still on the PIN prompt. Run it standalone with ``manage.py daraja_stub``.
+"""
+import json
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+RESULT_DESCRIPTIONS = {
+    0: "The service request is processed successfully.",
+    1: "The balance is insufficient for the transaction.",
+    1032: "Request cancelled by user",
+    1037: "DS timeout user cannot be reached",
+    2001: "The initiator information is invalid.",
+}
+
+
+class DarajaStub:
+    def __init__(self, host='127.0.0.1', port=0, token_ttl=3599):
+        self.token_ttl = token_ttl
+        self.lock = threading.Lock()
+        self.pushes = {}  # checkout id -> push payload
+        self.results = {}  # checkout id -> result code
+        self.calls = {'token': 0, 'push': 0, 'query': 0}
+        self.token = uuid.uuid4().hex
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name='daraja-stub', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def complete(self, checkout_request_id, result_code=0):
+        with self.lock:
+            self.results[checkout_request_id] = result_code
+
+    def rotate_token(self):
+        """Invalidate the issued token, as Daraja does when one expires."""
+        with self.lock:
+            self.token = uuid.uuid4().hex
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _authorized(self):
+                with stub.lock:
+                    return self.headers.get('Authorization') == f"Bearer {stub.token}"
+
+            def do_GET(self):
+                if urlparse(self.path).path != '/oauth/v1/generate':
+                    return self._send(404, {"errorMessage": "Not found"})
+                with stub.lock:
+                    stub.calls['token'] += 1
+                    token = stub.token
+                self._send(200, {"access_token": token, "expires_in": str(stub.token_ttl)})
+
+            def do_POST(self):
+                path = urlparse(self.path).path
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+                if not self._authorized():
+                    return self._send(401, {"errorCode": "404.001.03", "errorMessage": "Invalid Access Token"})
+                if path == '/mpesa/stkpush/v1/processrequest':
+                    return self._push(body)
+                if path == '/mpesa/stkpushquery/v1/query':
+                    return self._query(body)
+                self._send(404, {"errorMessage": "Not found"})
+
+            def _push(self, body):
+                checkout_id = f"ws_CO_{uuid.uuid4().hex[:20]}"
+                merchant_id = f"{uuid.uuid4().int % 100000}-{uuid.uuid4().int % 10000000}-1"
+                with stub.lock:
+                    stub.calls['push'] += 1
+                    stub.pushes[checkout_id] = dict(body, MerchantRequestID=merchant_id)
+                self._send(200, {
+                    "MerchantRequestID": merchant_id,
+                    "CheckoutRequestID": checkout_id,
+                    "ResponseCode": "0",
+                    "ResponseDescription": "Success. Request accepted for processing",
+                    "CustomerMessage": "Success. Request accepted for processing",
+                })
+
+            def _query(self, body):
+                checkout_id = body.get("CheckoutRequestID")
+                with stub.lock:
+                    stub.calls['query'] += 1
+                    push = stub.pushes.get(checkout_id)
+                    result_code = stub.results.get(checkout_id)
+                if push is None:
+                    return self._send(500, {"errorCode": "500.001.1001", "errorMessage": "Wrong credentials"})
+                if result_code is None:
+                    return self._send(500, {
+                        "errorCode": "500.001.1001",
+                        "errorMessage": "The transaction is being processed",
+                    })
+                self._send(200, {
+                    "ResponseCode": "0",
+                    "ResponseDescription": "The service request has been accepted successsfully",
+                    "MerchantRequestID": push["MerchantRequestID"],
+                    "CheckoutRequestID": checkout_id,
+                    "ResultCode": str(result_code),
+                    "ResultDesc": RESULT_DESCRIPTIONS.get(result_code, "Failed"),
+                })
+
+        return Handler
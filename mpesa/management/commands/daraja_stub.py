@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from mpesa.daraja_stub import DarajaStub
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve a local Daraja stub (token, STK push, STK query). Point MPESA_API_BASE_URL at it. "
+        "Pushes stay 'being processed' unless --auto-complete is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8099)
+        parser.add_argument('--auto-complete', type=int, metavar='RESULT_CODE',
+                            help="Answer every push with this ResultCode (0 = paid).")
+
+    def handle(self, *args, **options):
+        stub = DarajaStub(port=options['port']).start()
+        self.stdout.write(f"Daraja stub listening on {stub.base_url}")
+        try:
+            while True:
+                time.sleep(1)
+                if options['auto_complete'] is not None:
+                    with stub.lock:
+                        pending = [cid for cid in stub.pushes if cid not in stub.results]
+                    for checkout_id in pending:
+                        stub.complete(checkout_id, options['auto_complete'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stub.stop()
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.1 on 2026-10-19 20:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('orders', '0010_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StkPushAttempt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account_reference', models.CharField(max_length=50)),
+                ('phone_number', models.CharField(max_length=15)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('merchant_request_id', models.CharField(blank=True, max_length=100)),
+                ('checkout_request_id', models.CharField(max_length=100, unique=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('paid', 'Paid'), ('failed', 'Failed'), ('abandoned', 'Abandoned')], default='pending', max_length=10)),
+                ('result_code', models.IntegerField(blank=True, null=True)),
+                ('result_description', models.TextField(blank=True)),
+                ('poll_count', models.PositiveIntegerField(default=0)),
+                ('last_polled_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stk_attempts', to='orders.order')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'created_at'], name='mpesa_stk_pending_idx')],
+            },
+        ),
+    ]
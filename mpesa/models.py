@@ -1,3 +1,42 @@
 from django.db import models
 
-# Create your models here.
+
+class StkPushAttempt(models.Model):
+    """
+    An STK push accepted by Daraja. Settled by the payment callback or, if
+    that never arrives, by the status poller (mpesa/poller.py).
+    """
+    PENDING = 'pending'
+    PAID = 'paid'
+    FAILED = 'failed'
+    ABANDONED = 'abandoned'
+
+    STATUSES = [
+        (PENDING, 'Pending'),
+        (PAID, 'Paid'),
+        (FAILED, 'Failed'),
+        (ABANDONED, 'Abandoned'),  # no final answer before STK_POLL_GIVE_UP_SECONDS
+    ]
+
+    order = models.ForeignKey('orders.Order', on_delete=models.SET_NULL, null=True, blank=True,
+                              related_name='stk_attempts')
+    account_reference = models.CharField(max_length=50)
+    phone_number = models.CharField(max_length=15)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    merchant_request_id = models.CharField(max_length=100, blank=True)
+    checkout_request_id = models.CharField(max_length=100, unique=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING)
+    result_code = models.IntegerField(null=True, blank=True)
+    result_description = models.TextField(blank=True)
+    poll_count = models.PositiveIntegerField(default=0)
+    last_polled_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='mpesa_stk_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.checkout_request_id} for order {self.account_reference} ({self.status})"
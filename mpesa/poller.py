@@ -0,0 +1,141 @@
+"""
+STK push status poller.
+
+Safaricom sometimes never delivers the payment callback, which leaves the
+order unpaid and sends the customer back to retry. ``poll_pending_attempts``
+(the ``poll-stk-status`` periodic task) takes pending ``StkPushAttempt`` rows
+that are older than ``STK_POLL_AFTER_SECONDS`` and were not queried in the
+last ``STK_POLL_INTERVAL_SECONDS``, and asks the Daraja STK query API about
+them. At most ``STK_POLL_CONCURRENCY`` queries run at once, all using the
+shared client and its cached token. The answers are then settled one at a
+time on the calling thread through orders.settlement, the same code the
+callback uses.
+
+A query made while the customer is still on the PIN prompt returns an
+error; the attempt stays pending and is asked again later. Attempts that
+have no final answer after ``STK_POLL_GIVE_UP_SECONDS`` are marked abandoned.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from orders.settlement import PaymentResult, settle
+
+from .daraja import DarajaError, get_client
+from .models import StkPushAttempt
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PollReport:
+    queried: int = 0
+    paid: int = 0
+    failed: int = 0
+    still_pending: int = 0
+    errors: int = 0
+    abandoned: int = 0
+    paid_order_ids: list = field(default_factory=list)
+
+
+def _claim(batch_size, now):
+    """Pick due attempts and stamp ``last_polled_at`` so other pollers skip them."""
+    after = timedelta(seconds=getattr(settings, 'STK_POLL_AFTER_SECONDS', 60))
+    interval = timedelta(seconds=getattr(settings, 'STK_POLL_INTERVAL_SECONDS', 30))
+    due = (
+        Q(status=StkPushAttempt.PENDING, created_at__lte=now - after)
+        & (Q(last_polled_at__isnull=True) | Q(last_polled_at__lte=now - interval))
+    )
+    candidates = list(
+        StkPushAttempt.objects.filter(due).order_by('created_at').values_list('id', 'last_polled_at')[:batch_size]
+    )
+    claimed = []
+    for attempt_id, last_polled_at in candidates:
+        # Compare-and-set on last_polled_at: only one process wins each row.
+        if StkPushAttempt.objects.filter(id=attempt_id, last_polled_at=last_polled_at).update(
+            last_polled_at=now, poll_count=F('poll_count') + 1,
+        ):
+            claimed.append(attempt_id)
+    return list(StkPushAttempt.objects.filter(id__in=claimed))
+
+
+def _query(client, attempt):
+    """Returns the parsed query response, or None if Daraja has no final answer yet."""
+    try:
+        response = client.stk_query(attempt.checkout_request_id)
+        data = response.json()
+    except (requests.RequestException, DarajaError, ValueError):
+        logger.warning("STK query failed for %s", attempt.checkout_request_id, exc_info=True)
+        return None
+    if response.status_code != 200 or 'ResultCode' not in data:
+        # e.g. 500.001.1001 "The transaction is being processed"
+        logger.debug("No final STK result yet for %s: %s", attempt.checkout_request_id, data)
+        return None
+    return data
+
+
+def abandon_stale_attempts(now=None):
+    now = now or timezone.now()
+    give_up = timedelta(seconds=getattr(settings, 'STK_POLL_GIVE_UP_SECONDS', 1800))
+    count = StkPushAttempt.objects.filter(
+        status=StkPushAttempt.PENDING, created_at__lte=now - give_up,
+    ).update(status=StkPushAttempt.ABANDONED)
+    if count:
+        logger.warning("⚠️ Gave up on %s STK pushes with no final result", count)
+    return count
+
+
+def poll_pending_attempts(batch_size=None, concurrency=None, client=None, now=None):
+    now = now or timezone.now()
+    batch_size = batch_size or getattr(settings, 'STK_POLL_BATCH_SIZE', 50)
+    concurrency = concurrency or getattr(settings, 'STK_POLL_CONCURRENCY', 4)
+    client = client or get_client()
+    report = PollReport(abandoned=abandon_stale_attempts(now))
+
+    attempts = _claim(batch_size, now)
+    if not attempts:
+        return report
+    # Only the HTTP calls run on the pool; settlement stays on this thread
+    # so it uses this thread's database connection.
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(attempts))) as pool:
+        answers = list(pool.map(lambda attempt: _query(client, attempt), attempts))
+
+    report.queried = len(attempts)
+    for attempt, data in zip(attempts, answers):
+        if data is None:
+            report.still_pending += 1
+            continue
+        try:
+            result_code = int(data['ResultCode'])
+        except (TypeError, ValueError):
+            report.errors += 1
+            continue
+        try:
+            settlement = settle(PaymentResult(
+                checkout_request_id=attempt.checkout_request_id,
+                result_code=result_code,
+                result_description=data.get('ResultDesc', ''),
+                merchant_request_id=data.get('MerchantRequestID') or attempt.merchant_request_id,
+                account_reference=attempt.account_reference,
+                phone_number=attempt.phone_number,
+                amount=attempt.amount,
+            ))
+        except Exception:
+            logger.exception("❌ Settling polled STK result for %s failed", attempt.checkout_request_id)
+            report.errors += 1
+            continue
+        if result_code != 0:
+            report.failed += 1
+        elif settlement.newly_paid:
+            report.paid += 1
+            report.paid_order_ids.append(settlement.order.id)
+    if report.paid or report.failed:
+        logger.info("STK poller: %s paid, %s failed, %s still pending",
+                    report.paid, report.failed, report.still_pending)
+    return report
@@ -1,3 +1,154 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import requests
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from karen import throttling
+from orders.models import MpesaTransaction, Order
+from orders.signals import payment_confirmed
+
+from .daraja import DarajaClient, reset_client
+from .daraja_stub import DarajaStub
+from .models import StkPushAttempt
+from .poller import poll_pending_attempts
+
+
+class StkStatusPollerTests(TestCase):
+    """The poller and STK push view against a local Daraja stub."""
+
+    def setUp(self):
+        self.stub = DarajaStub().start()
+        self.addCleanup(self.stub.stop)
+        settings_override = override_settings(
+            MPESA_API_BASE_URL=self.stub.base_url, ALLOWED_HOSTS=['*'],
+            PAYMENT_NOTIFICATIONS_ASYNC=False, EMAIL_OUTBOX_WORKER=False,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        reset_client()
+        self.addCleanup(reset_client)
+        throttling.buckets.clear()
+
+        self.confirmed = []
+        receiver = lambda sender, order, **kwargs: self.confirmed.append(order.id)  # noqa: E731
+        payment_confirmed.connect(receiver, weak=False)
+        self.addCleanup(payment_confirmed.disconnect, receiver)
+
+        self.order = Order.objects.create(
+            customer_name='Wanjiku', customer_phone='0712345678', payment_method='mpesa',
+            total_amount=Decimal('150.00'),
+        )
+
+    def push(self):
+        response = APIClient().post(reverse('mpesa-stkpush'), {
+            'phone': '0712345678', 'amount': '150', 'order_id': self.order.id,
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        return StkPushAttempt.objects.get(checkout_request_id=response.data['CheckoutRequestID'])
+
+    def poll(self, seconds_later=120):
+        with self.captureOnCommitCallbacks(execute=True):
+            return poll_pending_attempts(now=timezone.now() + timedelta(seconds=seconds_later))
+
+    def test_push_records_attempt(self):
+        attempt = self.push()
+        self.assertEqual(attempt.order, self.order)
+        self.assertEqual(attempt.status, StkPushAttempt.PENDING)
+        self.assertEqual(attempt.amount, Decimal('150'))
+
+    def test_recent_attempts_are_left_for_the_callback(self):
+        self.push()
+        report = self.poll(seconds_later=10)
+        self.assertEqual(report.queried, 0)
+        self.assertEqual(self.stub.calls['query'], 0)
+
+    def test_poller_settles_paid_push(self):
+        attempt = self.push()
+        self.stub.complete(attempt.checkout_request_id, 0)
+
+        report = self.poll()
+
+        self.assertEqual(report.paid_order_ids, [self.order.id])
+        self.order.refresh_from_db()
+        self.assertTrue(self.order.is_paid)
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.status, StkPushAttempt.PAID)
+        self.assertEqual(self.confirmed, [self.order.id])
+        # The push and the query shared one cached token.
+        self.assertEqual(self.stub.calls['token'], 1)
+
+    def test_processing_then_cancelled(self):
+        attempt = self.push()
+
+        report = self.poll()
+        self.assertEqual(report.still_pending, 1)
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.status, StkPushAttempt.PENDING)
+
+        # Not queried again until STK_POLL_INTERVAL_SECONDS have passed.
+        self.assertEqual(self.poll(seconds_later=125).queried, 0)
+
+        self.stub.complete(attempt.checkout_request_id, 1032)
+        report = self.poll(seconds_later=180)
+        self.assertEqual(report.failed, 1)
+        attempt.refresh_from_db()
+        self.assertEqual((attempt.status, attempt.result_code, attempt.poll_count), (StkPushAttempt.FAILED, 1032, 2))
+        self.order.refresh_from_db()
+        self.assertFalse(self.order.is_paid)
+
+    def test_non_json_push_response_is_a_bad_gateway(self):
+        html = requests.Response()
+        html.status_code = 503
+        html._content = b'<html>Service Unavailable</html>'
+        with mock.patch.object(DarajaClient, 'stk_push', return_value=html):
+            response = APIClient().post(reverse('mpesa-stkpush'), {
+                'phone': '0712345678', 'amount': '150', 'order_id': self.order.id,
+            }, format='json')
+        self.assertEqual(response.status_code, 502)
+        self.assertFalse(StkPushAttempt.objects.exists())
+
+    def test_gives_up_after_limit(self):
+        self.push()
+        report = self.poll(seconds_later=3600)
+        self.assertEqual((report.abandoned, report.queried), (1, 0))
+
+    def test_expired_token_is_refreshed(self):
+        attempt = self.push()
+        self.stub.rotate_token()
+        self.stub.complete(attempt.checkout_request_id, 0)
+
+        self.assertEqual(self.poll().paid, 1)
+        self.assertEqual(self.stub.calls['token'], 2)
+
+    def test_late_callback_attaches_receipt_without_second_confirmation(self):
+        attempt = self.push()
+        self.stub.complete(attempt.checkout_request_id, 0)
+        self.poll()
+
+        callback = {'Body': {'stkCallback': {
+            'MerchantRequestID': attempt.merchant_request_id,
+            'CheckoutRequestID': attempt.checkout_request_id,
+            'ResultCode': 0,
+            'ResultDesc': 'The service request is processed successfully.',
+            'AccountReference': str(self.order.id),
+            'CallbackMetadata': {'Item': [
+                {'Name': 'Amount', 'Value': 150},
+                {'Name': 'MpesaReceiptNumber', 'Value': 'SLT1234XYZ'},
+                {'Name': 'TransactionDate', 'Value': 20261019120000},
+                {'Name': 'PhoneNumber', 'Value': 254712345678},
+            ]},
+        }}}
+        with self.captureOnCommitCallbacks(execute=True):
+            response = APIClient().post(reverse('mpesa-callback'), callback, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.transaction_id, 'SLT1234XYZ')
+        self.assertEqual(MpesaTransaction.objects.get().order, self.order)
+        self.assertEqual(self.confirmed, [self.order.id])
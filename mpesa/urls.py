@@ -2,6 +2,6 @@ from django.urls import path
 from .views import MpesaTokenView, MpesaSTKPushView
 
 urlpatterns = [
-    path('token/', MpesaTokenView.as_view()),
-    path('stkpush/', MpesaSTKPushView.as_view()),
+    path('token/', MpesaTokenView.as_view(), name='mpesa-token'),
+    path('stkpush/', MpesaSTKPushView.as_view(), name='mpesa-stkpush'),
 ]
@@ -5,7 +5,18 @@ from django.conf import settings
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-import datetime
+import logging
+from decimal import Decimal
+
+from karen.throttling import STKPushThrottle
+from orders.idempotency import idempotent
+from orders.models import Order
+
+from . import daraja
+from .daraja import DarajaError, get_client
+from .models import StkPushAttempt
+
+logger = logging.getLogger(__name__)
 
 def normalize_phone(phone: str) -> str:
     phone = phone.strip().replace(" ", "").replace("+", "")
@@ -41,6 +52,10 @@ class MpesaTokenView(APIView):
 
 
 class MpesaSTKPushView(APIView):
+    throttle_classes = [STKPushThrottle]
+    expensive = True  # see karen/throttling.py
+
+    @idempotent('stk-push')
     def post(self, request):
         amount = request.data.get("amount")
         order_id = request.data.get("order_id")  # <-- ✅ Expect order ID from frontend
@@ -53,29 +68,14 @@ class MpesaSTKPushView(APIView):
         if not phone or not amount or not order_id:
             return Response({"error": "Phone, amount, and order_id are required"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Get token
-        token = self.get_token()
-        if not token:
-            return Response({"error": "Unable to retrieve access token"}, status=status.HTTP_400_BAD_REQUEST)
-
-        # Prepare credentials
+        client = get_client()
         shortcode = settings.MPESA_SHORTCODE
-        passkey = settings.MPESA_PASSKEY
         callback_url = settings.MPESA_CALLBACK_URL
-        print(callback_url)
-        print(passkey)
-        print(order_id)
-        timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
-        password = base64.b64encode(f"{shortcode}{passkey}{timestamp}".encode()).decode()
-
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
+        timestamp = daraja.timestamp()
 
         payload = {
             "BusinessShortCode": shortcode,
-            "Password": password,
+            "Password": daraja.stk_password(shortcode, settings.MPESA_PASSKEY, timestamp),
             "Timestamp": timestamp,
             "TransactionType": "CustomerPayBillOnline",
             "Amount": amount,
@@ -87,18 +87,32 @@ class MpesaSTKPushView(APIView):
             "TransactionDesc": f"Payment for Order {order_id}"
         }
 
-        stk_url = "https://sandbox.safaricom.co.ke/mpesa/stkpush/v1/processrequest"
-        response = requests.post(stk_url, json=payload, headers=headers)
-        return Response(response.json(), status=response.status_code)
-        
-
-    def get_token(self):
-        consumer_key = settings.MPESA_CONSUMER_KEY
-        consumer_secret = settings.MPESA_CONSUMER_SECRET
-        auth_url = "https://sandbox.safaricom.co.ke/oauth/v1/generate?grant_type=client_credentials"
-        encoded = base64.b64encode(f"{consumer_key}:{consumer_secret}".encode()).decode()
-        headers = {"Authorization": f"Basic {encoded}"}
-        response = requests.get(auth_url, headers=headers)
-        if response.status_code == 200:
-            return response.json().get("access_token")
-        return None
+        # Uses the shared client's cached access token: one outbound call, not two.
+        try:
+            response = client.stk_push(payload)
+        except DarajaError:
+            return Response({"error": "Unable to retrieve access token"}, status=status.HTTP_400_BAD_REQUEST)
+        except requests.RequestException:
+            logger.exception("STK push request failed")
+            return Response({"error": "Unable to reach M-Pesa"}, status=status.HTTP_502_BAD_GATEWAY)
+        try:
+            data = response.json()
+        except ValueError:
+            logger.error("STK push got a non-JSON response (HTTP %s)", response.status_code)
+            return Response({"error": "Unexpected response from M-Pesa"}, status=status.HTTP_502_BAD_GATEWAY)
+        if response.status_code == 200 and str(data.get("ResponseCode")) == "0":
+            record_attempt(order_id, phone, amount, data)
+        return Response(data, status=response.status_code)
+
+
+def record_attempt(order_id, phone, amount, data):
+    """Remember an accepted push so the status poller can chase a missing callback."""
+    order_id = str(order_id)
+    StkPushAttempt.objects.create(
+        order=Order.objects.filter(id=order_id).first() if order_id.isdigit() else None,
+        account_reference=order_id,
+        phone_number=phone,
+        amount=Decimal(str(amount)),
+        merchant_request_id=data.get("MerchantRequestID", ""),
+        checkout_request_id=data["CheckoutRequestID"],
+    )
@@ -1,7 +1,16 @@
 from django.contrib import admin
-from .models import Order, MpesaTransaction, OrderItem, Location    
+from .models import (
+    Order, MpesaTransaction, OrderItem, Location, StockReservation, MonthlyEarningsSnapshot, IdempotencyKey,
+    ArchivedOrder, ArchivedOrderItem, ArchivedMpesaTransaction,
+)
 
 admin.site.register(Order)
 admin.site.register(MpesaTransaction)
 admin.site.register(OrderItem)
 admin.site.register(Location)
+admin.site.register(StockReservation)
+admin.site.register(MonthlyEarningsSnapshot)
+admin.site.register(IdempotencyKey)
+admin.site.register(ArchivedOrder)
+admin.site.register(ArchivedOrderItem)
+admin.site.register(ArchivedMpesaTransaction)
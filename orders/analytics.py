@@ -0,0 +1,240 @@
+"""
+Sales analytics over paid orders.
+
+Every report is one grouped aggregate query (``OrderItem`` joined to
+``Product`` and ``Category``, or ``Order`` joined to ``Location``) over a
+half-open ``[start, end)`` range of ``created_at``, optionally bucketed by
+day, week or month. Item revenue is ``quantity * product.price`` since order
+items do not snapshot the price they sold at. Ranges that reach back past
+the archive horizon run each query against the archive tables as well and
+add the results together (orders/archive.py).
+
+Results are cached per (report, range, granularity, options) in the shared
+cache configured in settings (Redis, or the database cache table), so every
+worker sees the same entries. Keys carry a version number that
+``bump_version`` increments whenever a payment lands or a product changes
+(revenue follows the current price), so stale entries are never read again
+and simply age out.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from karen.commit import CommitBatch
+from products.models import Product
+from products.signals import prices_changed
+
+from . import archive
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+from .signals import payment_confirmed
+
+GRANULARITIES = {
+    'total': None,
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+PERIOD_FORMATS = {'day': '%Y-%m-%d', 'week': '%Y-%m-%d', 'month': '%Y-%m'}
+DEFAULT_RANGE_DAYS = 30
+MAX_LIMIT = 100
+VERSION_KEY = 'orders:analytics:version'
+
+ITEM_REVENUE = ExpressionWrapper(
+    F('quantity') * F('product__price'), output_field=DecimalField(max_digits=14, decimal_places=2),
+)
+
+
+def _parse_day(value):
+    day = datetime.strptime(value, '%Y-%m-%d').date()
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def parse_range(params):
+    """
+    Read ``start``/``end`` (YYYY-MM-DD, end exclusive) and ``granularity`` from
+    query params. Raises ``ValueError`` with a message fit for the client.
+    """
+    try:
+        end = _parse_day(params['end']) if params.get('end') else (
+            timezone.make_aware(datetime.combine(timezone.localdate(), time.min)) + timedelta(days=1)
+        )
+        start = _parse_day(params['start']) if params.get('start') else end - timedelta(days=DEFAULT_RANGE_DAYS)
+    except ValueError:
+        raise ValueError("Dates must be YYYY-MM-DD.")
+    if start >= end:
+        raise ValueError("start must be before end.")
+    granularity = params.get('granularity') or 'total'
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of: {', '.join(GRANULARITIES)}.")
+    return start, end, granularity
+
+
+def get_version():
+    return cache.get_or_set(VERSION_KEY, 1, timeout=None)
+
+
+def bump_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 2, timeout=None)
+
+
+def _cached(name, start, end, granularity, compute, *extra):
+    key = ':'.join(['orders:analytics', str(get_version()), name, start.isoformat(), end.isoformat(), granularity,
+                    *map(str, extra)])
+    data = cache.get(key)
+    if data is None:
+        data = compute()
+        cache.set(key, data, timeout=getattr(settings, 'ANALYTICS_CACHE_TIMEOUT', 3600))
+    return data
+
+
+def _period_values(queryset, field, granularity, group_by):
+    trunc = GRANULARITIES[granularity]
+    if trunc is None:
+        return queryset.values(*group_by), None
+    return queryset.annotate(period=trunc(field)).values('period', *group_by), 'period'
+
+
+def _money(value):
+    # SQLite hands back arithmetic on decimals without their scale.
+    return str(Decimal(value or 0).quantize(Decimal('0.01')))
+
+
+def _format_period(value, granularity):
+    return value.strftime(PERIOD_FORMATS[granularity]) if value else None
+
+
+def _sources(start):
+    """``(order model, item model)`` pairs a report over ``[start, ...)`` has to read."""
+    sources = [(Order, OrderItem)]
+    if archive.includes_archive(start):
+        sources.append((ArchivedOrder, ArchivedOrderItem))
+    return sources
+
+
+def _merge(row_sets, key, sums):
+    """Add up rows from the live and archive tables that share ``key`` fields."""
+    if len(row_sets) == 1:
+        return list(row_sets[0])
+    merged = {}
+    for rows in row_sets:
+        for row in rows:
+            k = tuple(row[field] for field in key)
+            if k in merged:
+                for field in sums:
+                    merged[k][field] = (merged[k][field] or 0) + (row[field] or 0)
+            else:
+                merged[k] = dict(row)
+    return list(merged.values())
+
+
+def top_products(start, end, order_by='revenue', limit=10):
+    def compute():
+        sort_field = 'units' if order_by == 'quantity' else 'revenue'
+        sources = _sources(start)
+        row_sets = []
+        for _, item_model in sources:
+            rows = (
+                item_model.objects
+                .filter(order__is_paid=True, order__created_at__gte=start, order__created_at__lt=end)
+                .values('product_id', 'product__name')
+                .annotate(units=Sum('quantity'), revenue=Sum(ITEM_REVENUE))
+                .order_by('-' + sort_field, 'product_id')
+            )
+            # With the archive in play the limit applies after merging.
+            row_sets.append(rows[:limit] if len(sources) == 1 else rows)
+        rows = _merge(row_sets, ['product_id'], ['units', 'revenue'])
+        rows.sort(key=lambda row: (-Decimal(row[sort_field] or 0), row['product_id']))
+        return [
+            {
+                'product_id': row['product_id'],
+                'name': row['product__name'],
+                'quantity': row['units'],
+                'revenue': _money(row['revenue']),
+            }
+            for row in rows[:limit]
+        ]
+    return _cached('top-products', start, end, 'total', compute, order_by, limit)
+
+
+def sales_by_category(start, end, granularity='total'):
+    def compute():
+        row_sets = []
+        period = None
+        for _, item_model in _sources(start):
+            queryset = item_model.objects.filter(
+                order__is_paid=True, order__created_at__gte=start, order__created_at__lt=end,
+            )
+            queryset, period = _period_values(
+                queryset, 'order__created_at', granularity, ['product__category_id', 'product__category__name'],
+            )
+            row_sets.append(queryset.annotate(
+                units=Sum('quantity'), revenue=Sum(ITEM_REVENUE), orders=Count('order_id', distinct=True),
+            ).order_by())
+        rows = _merge(row_sets, [*([period] if period else []), 'product__category_id'],
+                      ['units', 'revenue', 'orders'])
+        rows.sort(key=lambda row: (
+            row[period] if period else 0, -Decimal(row['revenue'] or 0), row['product__category_id'] or 0,
+        ))
+        return [
+            {
+                **({'period': _format_period(row['period'], granularity)} if period else {}),
+                'category_id': row['product__category_id'],
+                'category': row['product__category__name'],
+                'orders': row['orders'],
+                'quantity': row['units'],
+                'revenue': _money(row['revenue']),
+            }
+            for row in rows
+        ]
+    return _cached('by-category', start, end, granularity, compute)
+
+
+def sales_by_location(start, end, granularity='total'):
+    def compute():
+        row_sets = []
+        period = None
+        for order_model, _ in _sources(start):
+            queryset = order_model.objects.filter(is_paid=True, created_at__gte=start, created_at__lt=end)
+            queryset, period = _period_values(queryset, 'created_at', granularity, ['location_id', 'location__name'])
+            row_sets.append(queryset.annotate(orders=Count('id'), revenue=Sum('total_amount')).order_by())
+        rows = _merge(row_sets, [*([period] if period else []), 'location_id'], ['orders', 'revenue'])
+        rows.sort(key=lambda row: (
+            row[period] if period else 0, -Decimal(row['revenue'] or 0), row['location_id'] or 0,
+        ))
+        return [
+            {
+                **({'period': _format_period(row['period'], granularity)} if period else {}),
+                'location_id': row['location_id'],
+                'location': row['location__name'],
+                'orders': row['orders'],
+                'revenue': _money(row['revenue']),
+            }
+            for row in rows
+        ]
+    return _cached('by-location', start, end, granularity, compute)
+
+
+# One bump per transaction however many products it saved or deleted.
+bump_on_commit = CommitBatch(lambda _: bump_version())
+
+
+@receiver(payment_confirmed)
+@receiver(prices_changed)
+def invalidate(sender, **kwargs):
+    bump_version()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed(sender, **kwargs):
+    bump_on_commit.add([sender])
@@ -0,0 +1,179 @@
+"""
+Archival of settled orders.
+
+Orders that are paid or expired and older than ``ORDER_ARCHIVE_AFTER_DAYS``
+are moved, along with their items and M-Pesa transactions, into the
+``Archived*`` tables. Transactions that never matched an order are moved
+once their transaction date passes the same cutoff. The hot tables only
+hold recent and open orders.
+
+``archive_settled_orders`` works in batches of ids in ascending order. Each
+batch copies its rows and deletes the originals in a single transaction,
+so an interrupted run leaves nothing half-moved and the next run resumes
+from the next unarchived id. The deletes bypass model signals: archiving
+does not change any total, so frozen earnings months must not go stale.
+
+Reads that cover old dates merge the archive back in (orders/earnings.py,
+orders/analytics.py, the order date views). ``includes_archive(start)``
+tells them whether a range reaches back past ``archive_horizon()``; recent
+ranges never touch the archive tables.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from mpesa.models import StkPushAttempt
+
+from .models import (
+    ArchivedMpesaTransaction,
+    ArchivedOrder,
+    ArchivedOrderItem,
+    MpesaTransaction,
+    Order,
+    OrderItem,
+    StockReservation,
+)
+
+logger = logging.getLogger(__name__)
+
+HORIZON_KEY = 'orders:archive:horizon'
+HORIZON_CACHE_SECONDS = 3600
+EMPTY = 'empty'
+
+ORDER_FIELDS = [
+    'id', 'customer_name', 'customer_phone', 'payment_method', 'transaction_id', 'total_amount',
+    'location_id', 'is_paid', 'is_expired', 'created_at',
+]
+ITEM_FIELDS = ['id', 'order_id', 'product_id', 'quantity']
+TRANSACTION_FIELDS = [
+    'id', 'receipt_number', 'phone_number', 'amount', 'transaction_date', 'merchant_request_id',
+    'checkout_request_id', 'result_code', 'result_description', 'order_id',
+]
+
+
+def archive_cutoff(now=None):
+    return (now or timezone.now()) - timedelta(days=getattr(settings, 'ORDER_ARCHIVE_AFTER_DAYS', 365))
+
+
+def archive_horizon():
+    """
+    Every archived order was created before this instant: the retention
+    cutoff, or the newest archived ``created_at`` if it is later (e.g. after
+    ``ORDER_ARCHIVE_AFTER_DAYS`` was raised). The archive query is cached per
+    process; the cutoff alone already covers rows archived since.
+    """
+    newest = cache.get(HORIZON_KEY)
+    if newest is None:
+        newest = ArchivedOrder.objects.aggregate(newest=Max('created_at'))['newest'] or EMPTY
+        cache.set(HORIZON_KEY, newest, timeout=HORIZON_CACHE_SECONDS)
+    cutoff = archive_cutoff()
+    if newest == EMPTY or newest < cutoff:
+        return cutoff
+    return newest + timedelta(microseconds=1)
+
+
+def includes_archive(start):
+    """Whether ``[start, ...)`` can contain archived rows; ``start=None`` means unbounded."""
+    return start is None or start < archive_horizon()
+
+
+def settled_orders(cutoff):
+    return Order.objects.filter(Q(is_paid=True) | Q(is_expired=True), created_at__lt=cutoff)
+
+
+def _copy(queryset, fields, archive_model):
+    rows = list(queryset.values(*fields))
+    archive_model.objects.bulk_create([archive_model(**row) for row in rows])
+    return len(rows)
+
+
+def _raw_delete(model, ids):
+    # A plain DELETE: Model.delete() would fire post_delete for every row.
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            cursor.execute(f"DELETE FROM {table} WHERE id IN ({', '.join(['%s'] * len(chunk))})", chunk)
+
+
+def _archive_order_batch(ids):
+    with transaction.atomic():
+        # Re-check under the transaction: only still-settled rows move.
+        ids = list(Order.objects.select_for_update().filter(
+            Q(is_paid=True) | Q(is_expired=True), id__in=ids,
+        ).values_list('id', flat=True))
+        if not ids:
+            return 0, 0, 0
+        orders = _copy(Order.objects.filter(id__in=ids), ORDER_FIELDS, ArchivedOrder)
+        items = _copy(OrderItem.objects.filter(order_id__in=ids), ITEM_FIELDS, ArchivedOrderItem)
+        transactions = MpesaTransaction.objects.filter(order_id__in=ids)
+        transaction_ids = list(transactions.values_list('id', flat=True))
+        moved = _copy(transactions, TRANSACTION_FIELDS, ArchivedMpesaTransaction)
+
+        StkPushAttempt.objects.filter(order_id__in=ids).update(order=None)
+        StockReservation.objects.filter(order_id__in=ids).delete()
+        _raw_delete(MpesaTransaction, transaction_ids)
+        _raw_delete(OrderItem, list(OrderItem.objects.filter(order_id__in=ids).values_list('id', flat=True)))
+        _raw_delete(Order, ids)
+    return orders, items, moved
+
+
+def _archive_unmatched_transactions(cutoff, batch_size):
+    with transaction.atomic():
+        ids = list(
+            MpesaTransaction.objects.select_for_update()
+            .filter(order__isnull=True, transaction_date__lt=cutoff)
+            .order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        moved = _copy(MpesaTransaction.objects.filter(id__in=ids), TRANSACTION_FIELDS, ArchivedMpesaTransaction)
+        _raw_delete(MpesaTransaction, ids)
+    return moved
+
+
+def archive_settled_orders(batch_size=500, max_batches=None, now=None):
+    """
+    Move settled orders older than the retention window (and their items and
+    transactions) into the archive. Returns ``{'orders': n, 'items': n,
+    'transactions': n, 'batches': n}``. ``max_batches`` bounds one run.
+    """
+    cutoff = archive_cutoff(now)
+    totals = {'orders': 0, 'items': 0, 'transactions': 0, 'batches': 0}
+
+    def budget_left():
+        return max_batches is None or totals['batches'] < max_batches
+
+    while budget_left():
+        ids = list(settled_orders(cutoff).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        orders, items, moved = _archive_order_batch(ids)
+        totals['orders'] += orders
+        totals['items'] += items
+        totals['transactions'] += moved
+        totals['batches'] += 1
+        if len(ids) < batch_size:
+            break
+
+    while budget_left():
+        moved = _archive_unmatched_transactions(cutoff, batch_size)
+        if not moved:
+            break
+        totals['transactions'] += moved
+        totals['batches'] += 1
+        if moved < batch_size:
+            break
+
+    if totals['orders'] or totals['transactions']:
+        cache.delete(HORIZON_KEY)
+        logger.info("Archived %(orders)s orders, %(items)s items and %(transactions)s transactions", totals)
+    return totals
+
+
+def scheduled_archival():
+    """The ``archive-settled-orders`` periodic task: at most ORDER_ARCHIVE_MAX_BATCHES per run."""
+    return archive_settled_orders(max_batches=getattr(settings, 'ORDER_ARCHIVE_MAX_BATCHES', 20))
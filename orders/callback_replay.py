@@ -0,0 +1,259 @@
+"""
+Concurrent replay harness for ``MpesaCallbackView``.
+
+``build_cases`` creates orders for one run and a shuffled mix of realistic
+``stkCallback`` payloads against them; ``replay`` posts the payloads from N
+threads through the Django test client and ``summarise`` turns the responses
+into throughput, a latency histogram and correctness checks (duplicates
+rejected, no order settled by two different receipts).
+
+Used by ``manage.py replay_mpesa_callbacks``. It writes to whatever database
+``DATABASE_URL`` points at, so run it against a local SQLite file or Postgres.
+"""
+import copy
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.db import close_old_connections
+from django.test import Client
+from django.utils import timezone
+
+from .models import MpesaTransaction, Order
+from .settlement import daraja_timestamp
+
+SCENARIOS = ('success', 'failure', 'duplicate', 'missing_reference', 'unmatched')
+DEFAULT_MIX = {'success': 0.55, 'failure': 0.1, 'duplicate': 0.15, 'missing_reference': 0.15, 'unmatched': 0.05}
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+RUN_PREFIX = 'replay'
+
+_UPDATED_RE = re.compile(r'Order (\d+) updated with payment')
+
+
+@dataclass
+class CallbackCase:
+    kind: str
+    payload: dict
+    receipt: str = ''
+    order_id: int = None
+
+
+@dataclass
+class CallbackResult:
+    case: CallbackCase
+    status: int
+    latency_ms: float
+    body: dict = field(default_factory=dict)
+
+
+def _payload(run_id, n, phone, amount, order_id=None, result_code=0):
+    callback = {
+        'MerchantRequestID': f'{run_id}-m{n}',
+        'CheckoutRequestID': f'ws_CO_{run_id}_{n}',
+        'ResultCode': result_code,
+        'ResultDesc': 'The service request is processed successfully.' if result_code == 0
+        else 'Request cancelled by user',
+    }
+    if order_id is not None:
+        callback['AccountReference'] = str(order_id)
+    if result_code == 0:
+        callback['CallbackMetadata'] = {'Item': [
+            {'Name': 'Amount', 'Value': float(amount)},
+            {'Name': 'MpesaReceiptNumber', 'Value': f'{run_id.upper()}{n:06d}'},
+            {'Name': 'TransactionDate', 'Value': daraja_timestamp(timezone.now())},
+            {'Name': 'PhoneNumber', 'Value': int('254' + phone[1:])},
+        ]}
+    return {'Body': {'stkCallback': callback}}
+
+
+def _counts(total, mix):
+    counts = {kind: int(total * mix.get(kind, 0)) for kind in SCENARIOS}
+    counts['success'] += total - sum(counts.values())
+    # Duplicates resend earlier successes, so they need at least one.
+    if counts['duplicate'] and not counts['success']:
+        counts['success'], counts['duplicate'] = counts['duplicate'], 0
+    # Missing-reference orders come in pairs sharing phone and amount.
+    counts['success'] += counts['missing_reference'] % 2
+    counts['missing_reference'] -= counts['missing_reference'] % 2
+    return counts
+
+
+def build_cases(total, mix=None, seed=None):
+    """
+    Create the orders a run needs and return ``(run_id, cases)``.
+
+    Missing-reference callbacks are generated in pairs for two unpaid orders
+    with the same phone and amount, which is exactly where the view's
+    phone+amount fallback can settle one order twice under concurrency.
+    """
+    rng = random.Random(seed)
+    run_id = f'{RUN_PREFIX}{uuid.uuid4().hex[:6]}'
+    counts = _counts(total, mix or DEFAULT_MIX)
+
+    def phone():
+        return f'07{rng.randint(10000000, 99999999)}'
+
+    order_specs = [(phone(), Decimal(rng.randint(10, 5000))) for _ in range(counts['success'])]
+    pair_specs = []
+    for _ in range(counts['missing_reference'] // 2):
+        spec = (phone(), Decimal(rng.randint(10, 5000)))
+        pair_specs.extend([spec, spec])
+
+    orders = Order.objects.bulk_create([
+        Order(
+            customer_name=f'{run_id}-{i}',
+            customer_phone=p,
+            payment_method='mpesa',
+            transaction_id='',
+            total_amount=amount,
+        )
+        for i, (p, amount) in enumerate(order_specs + pair_specs)
+    ])
+    if any(o.pk is None for o in orders):
+        # Backends without RETURNING (MySQL) do not set ids on bulk_create.
+        orders = list(Order.objects.filter(customer_name__startswith=f'{run_id}-').order_by('id'))
+
+    cases, n = [], 0
+    successes = []
+    for order in orders[:counts['success']]:
+        payload = _payload(run_id, n, order.customer_phone, order.total_amount, order.id)
+        case = CallbackCase('success', payload, f'{run_id.upper()}{n:06d}', order.id)
+        cases.append(case)
+        successes.append(case)
+        n += 1
+    for order in orders[counts['success']:]:
+        payload = _payload(run_id, n, order.customer_phone, order.total_amount)
+        cases.append(CallbackCase('missing_reference', payload, f'{run_id.upper()}{n:06d}'))
+        n += 1
+    for _ in range(counts['duplicate']):
+        original = rng.choice(successes)
+        cases.append(CallbackCase('duplicate', copy.deepcopy(original.payload), original.receipt, original.order_id))
+    for _ in range(counts['failure']):
+        order = rng.choice(orders)
+        cases.append(CallbackCase('failure', _payload(run_id, n, order.customer_phone, order.total_amount, order.id, result_code=1032)))
+        n += 1
+    for _ in range(counts['unmatched']):
+        cases.append(CallbackCase('unmatched', _payload(run_id, n, phone(), Decimal('999999')), f'{run_id.upper()}{n:06d}'))
+        n += 1
+
+    rng.shuffle(cases)
+    return run_id, cases
+
+
+def replay(cases, threads=8, path='/api/orders/callback/'):
+    """POST every case from ``threads`` worker threads; returns (results, wall seconds)."""
+    local = threading.local()
+
+    def send(case):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = Client(HTTP_HOST='localhost')
+        start = time.perf_counter()
+        response = client.post(path, data=json.dumps(case.payload), content_type='application/json')
+        latency = (time.perf_counter() - start) * 1000
+        try:
+            body = json.loads(response.content or b'{}')
+        except ValueError:
+            body = {}
+        return CallbackResult(case, response.status_code, latency, body)
+
+    def worker(case):
+        try:
+            return send(case)
+        finally:
+            close_old_connections()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(worker, cases))
+    return results, time.perf_counter() - start
+
+
+def _histogram(latencies):
+    buckets = Counter()
+    for value in latencies:
+        for bound in LATENCY_BUCKETS_MS:
+            if value <= bound:
+                buckets[f'<={bound}ms'] += 1
+                break
+        else:
+            buckets[f'>{LATENCY_BUCKETS_MS[-1]}ms'] += 1
+    labels = [f'<={b}ms' for b in LATENCY_BUCKETS_MS] + [f'>{LATENCY_BUCKETS_MS[-1]}ms']
+    return {label: buckets.get(label, 0) for label in labels}
+
+
+def _pct(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values), max(1, round(pct / 100 * len(sorted_values)))) - 1]
+
+
+def summarise(run_id, results, elapsed):
+    latencies = sorted(r.latency_ms for r in results)
+
+    by_kind = defaultdict(Counter)
+    for r in results:
+        by_kind[r.case.kind][str(r.status)] += 1
+
+    # An order settled by more than one distinct receipt was paid twice.
+    settled = defaultdict(set)
+    for r in results:
+        match = _UPDATED_RE.search(str(r.body.get('message', '')))
+        if match:
+            settled[int(match.group(1))].add(r.case.receipt)
+    double_paid = sorted(order_id for order_id, receipts in settled.items() if len(receipts) > 1)
+
+    # Every receipt must be stored exactly once no matter how often it was sent.
+    receipts = {r.case.receipt for r in results if r.case.receipt}
+    stored = Counter(
+        MpesaTransaction.objects.filter(receipt_number__in=receipts).values_list('receipt_number', flat=True)
+    )
+    duplicate_rows = sum(1 for count in stored.values() if count > 1)
+    accepted = Counter(
+        r.case.receipt for r in results
+        if r.case.kind in ('success', 'duplicate') and r.status == 200
+    )
+    duplicates_sent = sum(1 for r in results if r.case.kind == 'duplicate')
+
+    run_orders = Order.objects.filter(customer_name__startswith=f'{run_id}-')
+    expected_paid = {r.case.order_id for r in results if r.case.kind == 'success'}
+    unpaid_expected = run_orders.filter(id__in=expected_paid, is_paid=False).count()
+
+    return {
+        'run_id': run_id,
+        'callbacks': len(results),
+        'elapsed_s': round(elapsed, 3),
+        'callbacks_per_sec': round(len(results) / elapsed, 1) if elapsed else None,
+        'latency_ms': {
+            'p50': round(_pct(latencies, 50), 3),
+            'p90': round(_pct(latencies, 90), 3),
+            'p99': round(_pct(latencies, 99), 3),
+            'max': round(latencies[-1], 3) if latencies else 0.0,
+        },
+        'latency_histogram': _histogram(latencies),
+        'statuses_by_scenario': {kind: dict(counts) for kind, counts in sorted(by_kind.items())},
+        'correctness': {
+            'duplicates_sent': duplicates_sent,
+            # Whichever copy of a receipt arrives first wins; every other copy
+            # must be rejected.
+            'receipts_accepted_more_than_once': sum(1 for count in accepted.values() if count > 1),
+            'duplicate_receipt_rows': duplicate_rows,
+            'double_paid_orders': len(double_paid),
+            'double_paid_order_ids': double_paid[:20],
+            'referenced_orders_left_unpaid': unpaid_expected,
+            'server_errors': sum(1 for r in results if r.status >= 500),
+        },
+    }
+
+
+def cleanup(run_id):
+    """Delete the orders and transactions created by one run."""
+    MpesaTransaction.objects.filter(receipt_number__startswith=run_id.upper()).delete()
+    Order.objects.filter(customer_name__startswith=f'{run_id}-').delete()
@@ -0,0 +1,153 @@
+"""
+Monthly earnings with closed months frozen.
+
+A month's earnings stop changing once it is over, so each closed month is
+aggregated once into ``MonthlyEarningsSnapshot`` and read back from there;
+only the open month is summed live on each request. Anything that changes a
+paid order in a closed month (a late callback, reconciliation, an admin
+edit or delete) marks that month's snapshot stale and the next read
+recomputes just the stale months.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import archive
+from .models import ArchivedOrder, MonthlyEarningsSnapshot, Order
+from .signals import payment_confirmed
+
+
+def month_of(value):
+    return timezone.localtime(value).date().replace(day=1)
+
+
+def _next_month(month):
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _previous_month(month):
+    return (month - timedelta(days=1)).replace(day=1)
+
+
+def _as_datetime(month):
+    return timezone.make_aware(datetime.combine(month, time.min))
+
+
+def _aggregate(start=None, end=None):
+    """``{month: (total, count)}`` for paid orders created in ``[start, end)``, archived ones included."""
+    start_at = _as_datetime(start) if start is not None else None
+    models = [Order, ArchivedOrder] if archive.includes_archive(start_at) else [Order]
+    totals = {}
+    for model in models:
+        orders = model.objects.filter(is_paid=True)
+        if start is not None:
+            orders = orders.filter(created_at__gte=start_at)
+        if end is not None:
+            orders = orders.filter(created_at__lt=_as_datetime(end))
+        rows = (
+            orders
+            .annotate(month=TruncMonth('created_at'))
+            .values('month')
+            .annotate(total=Sum('total_amount'), count=Count('id'))
+            .order_by('month')
+        )
+        for row in rows:
+            total, count = totals.get(month_of(row['month']), (0, 0))
+            totals[month_of(row['month'])] = (total + row['total'], count + row['count'])
+    return dict(sorted(totals.items()))
+
+
+def _freeze_closed_months(current):
+    """Snapshot any closed month that is missing or stale. Returns the snapshots, oldest first."""
+    previous = _previous_month(current)
+    frozen = list(MonthlyEarningsSnapshot.objects.filter(month__lt=current).order_by('month'))
+    if frozen and frozen[-1].month >= previous and not any(s.stale for s in frozen):
+        return frozen
+
+    with transaction.atomic():
+        # Lock stale rows so a concurrent mark_stale lands after our write, not under it.
+        stale = list(
+            MonthlyEarningsSnapshot.objects.select_for_update().filter(month__lt=current, stale=True)
+            .values_list('month', flat=True)
+        )
+        snapshots = {s.month: s for s in MonthlyEarningsSnapshot.objects.filter(month__lt=current)}
+        last = max(snapshots) if snapshots else None
+
+        pending = list(stale)
+        start = None
+        if last is not None:
+            month = _next_month(last)
+            while month <= previous:
+                pending.append(month)
+                month = _next_month(month)
+            start = min(pending) if pending else None
+        totals = _aggregate(start, current)
+        if last is None:
+            # First freeze: every month of history. With no history at all the previous
+            # month is still recorded (as zero), so later reads take the fast path above.
+            month = min(totals) if totals else previous
+            while month <= previous:
+                pending.append(month)
+                month = _next_month(month)
+
+        for month in pending:
+            total, count = totals.get(month, (0, 0))
+            snapshot = snapshots.get(month) or MonthlyEarningsSnapshot(month=month)
+            snapshot.total_earnings = total
+            snapshot.order_count = count
+            snapshot.stale = False
+            snapshots[month] = snapshot
+        MonthlyEarningsSnapshot.objects.bulk_create(
+            [snapshots[month] for month in pending if snapshots[month].pk is None], ignore_conflicts=True,
+        )
+        for month in stale:
+            snapshot = snapshots[month]
+            snapshot.save(update_fields=['total_earnings', 'order_count', 'stale', 'computed_at'])
+    return [snapshots[month] for month in sorted(snapshots)]
+
+
+def monthly_earnings(now=None):
+    """``[(month, total), ...]`` for every month with paid orders, oldest first."""
+    current = month_of(now or timezone.now())
+    months = [
+        (snapshot.month, snapshot.total_earnings)
+        for snapshot in _freeze_closed_months(current)
+        if snapshot.order_count
+    ]
+    months += [(month, total) for month, (total, count) in _aggregate(start=current).items()]
+    return months
+
+
+def mark_stale(months, now=None):
+    """Flag the snapshots for ``months`` (dates) so the next read recomputes them."""
+    current = month_of(now or timezone.now())
+    closed = {month for month in months if month < current}
+    if not closed or not MonthlyEarningsSnapshot.objects.exists():
+        # Nothing frozen yet: the first read computes the whole history anyway.
+        return
+    MonthlyEarningsSnapshot.objects.bulk_create(
+        [MonthlyEarningsSnapshot(month=month, total_earnings=0, order_count=0, stale=True) for month in closed],
+        ignore_conflicts=True,
+    )
+    MonthlyEarningsSnapshot.objects.filter(month__in=closed).update(stale=True)
+
+
+def mark_stale_for_orders(orders):
+    mark_stale({month_of(order.created_at) for order in orders if order.created_at})
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def order_changed(sender, instance, **kwargs):
+    mark_stale_for_orders([instance])
+
+
+@receiver(payment_confirmed)
+def payment_landed(sender, order, **kwargs):
+    # Reconciliation marks orders paid with queryset updates, which skip post_save.
+    mark_stale_for_orders([order])
@@ -0,0 +1,54 @@
+"""
+Expiry of stale unpaid orders.
+
+Unpaid orders older than ``ORDER_UNPAID_TTL_MINUTES`` are flagged
+``is_expired`` in batches and their held stock is released. The callback's
+phone+amount fallback matcher only looks at the live window
+(``live_unpaid_orders``), so the set it scans stays small. A payment that
+names an expired order via AccountReference is still applied.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .inventory import release_order_reservations
+from .models import Order
+
+logger = logging.getLogger(__name__)
+
+
+def unpaid_ttl():
+    return timedelta(minutes=getattr(settings, 'ORDER_UNPAID_TTL_MINUTES', 24 * 60))
+
+
+def live_unpaid_orders(now=None):
+    """Unpaid orders still inside the payment window."""
+    now = now or timezone.now()
+    return Order.objects.filter(is_paid=False, is_expired=False, created_at__gte=now - unpaid_ttl())
+
+
+def expire_stale_orders(batch_size=500, now=None):
+    """Mark unpaid orders past the TTL as expired. Returns the number expired."""
+    cutoff = (now or timezone.now()) - unpaid_ttl()
+    total = 0
+    while True:
+        ids = list(
+            Order.objects
+            .filter(is_paid=False, is_expired=False, created_at__lt=cutoff)
+            .order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        with transaction.atomic():
+            # Re-check is_paid so a payment landing mid-sweep is never expired.
+            total += Order.objects.filter(id__in=ids, is_paid=False, is_expired=False).update(is_expired=True)
+            release_order_reservations(ids)
+        if len(ids) < batch_size:
+            break
+    if total:
+        logger.info("Expired %s unpaid orders older than %s", total, cutoff)
+    return total
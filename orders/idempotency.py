@@ -0,0 +1,208 @@
+"""
+``Idempotency-Key`` support for checkout endpoints.
+
+A client that retries ``POST`` with the same ``Idempotency-Key`` header gets
+the first response back instead of a second order or a second STK push:
+
+* The first request inserts an ``IdempotencyKey`` row (status NULL, i.e. in
+  flight) before running the view, then stores the status code and JSON
+  body. Responses of 500 and above, and exceptions, delete the row so the
+  client can try again.
+* A duplicate that arrives while the first is still running waits up to
+  ``IDEMPOTENCY_WAIT_SECONDS`` for it to finish. Waiters in the same process
+  are woken directly; waiters in other processes poll the row. If it is
+  still running after that, the duplicate gets a 409 with ``Retry-After``.
+* An in-flight row is a lease of ``IDEMPOTENCY_LEASE_SECONDS`` from its
+  ``created_at`` (longer than the worker timeout). A worker killed mid-request
+  never finishes its row, so once the lease runs out a retry takes the key
+  over instead of getting 409 until the key expires. The original owner only
+  ever updates or releases its own row.
+* A finished key replays its stored response with
+  ``Idempotent-Replayed: true``. A key reused with a different request
+  body is rejected with 422.
+
+Keys are scoped per endpoint and, for authenticated callers, per user.
+Anonymous checkout has no caller identity, so clients must send a fresh
+random UUID per logical request: a key reused by another client with the
+same body would be replayed to it.
+
+Keys expire after ``IDEMPOTENCY_KEY_TTL_HOURS`` and are purged by the
+``purge-idempotency-keys`` periodic task. Requests without the header are
+unaffected.
+"""
+import functools
+import hashlib
+import json
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL = 0.1
+
+_events_lock = threading.Lock()
+_events = {}  # (scope, key) -> Event set when the in-process owner finishes
+
+
+def key_ttl():
+    return timedelta(hours=getattr(settings, 'IDEMPOTENCY_KEY_TTL_HOURS', 24))
+
+
+def lease():
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_LEASE_SECONDS', 120))
+
+
+def request_fingerprint(request):
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = dict(data.lists())
+    body = json.dumps(data, cls=JSONEncoder, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode()).hexdigest()
+
+
+def caller_scope(scope, request):
+    """``scope``, narrowed to the authenticated user when there is one."""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f'{scope}:user:{user.pk}'
+    return scope
+
+
+def _claim(scope, key, fingerprint):
+    """Insert the in-flight row; returns ``(row, True)`` if we own the key, else ``(existing row, False)``."""
+    now = timezone.now()
+    while True:
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    scope=scope, key=key, request_hash=fingerprint, expires_at=now + key_ttl(),
+                )
+            return record, True
+        except IntegrityError:
+            existing = IdempotencyKey.objects.filter(scope=scope, key=key).first()
+            if existing is None:
+                continue  # released between our insert and read
+            if existing.expires_at <= now:
+                IdempotencyKey.objects.filter(pk=existing.pk, expires_at__lte=now).delete()
+                continue
+            if existing.status_code is None and existing.created_at <= now - lease():
+                # The owner died without finishing; its lease is up.
+                IdempotencyKey.objects.filter(
+                    pk=existing.pk, status_code__isnull=True, created_at__lte=now - lease(),
+                ).delete()
+                continue
+            return existing, False
+
+
+def _wait_for(scope, key, record):
+    deadline = time.monotonic() + getattr(settings, 'IDEMPOTENCY_WAIT_SECONDS', 10)
+    with _events_lock:
+        event = _events.get((scope, key))
+    while record is not None and record.status_code is None:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return record
+        if event is not None:
+            event.wait(remaining)
+            event = None  # the owner finished; the row has the outcome
+        else:
+            time.sleep(min(POLL_INTERVAL, remaining))
+        record = IdempotencyKey.objects.filter(pk=record.pk).first()
+    return record
+
+
+def _replay(record):
+    response = Response(json.loads(record.response_body) if record.response_body else None,
+                        status=record.status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(scope):
+    """Decorate an APIView handler (e.g. ``post``) to honour ``Idempotency-Key``."""
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(view, request, *args, **kwargs):
+            key = request.headers.get(HEADER)
+            if not key:
+                return handler(view, request, *args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return Response({"error": f"{HEADER} must be at most {MAX_KEY_LENGTH} characters."},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+            fingerprint = request_fingerprint(request)
+            key_scope = caller_scope(scope, request)
+            while True:
+                existing, owned = _claim(key_scope, key, fingerprint)
+                if owned:
+                    return _run(existing, handler, view, request, *args, **kwargs)
+                if existing.request_hash != fingerprint:
+                    return Response({"error": f"{HEADER} was already used for a different request."},
+                                    status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+                record = _wait_for(key_scope, key, existing)
+                if record is None or (record.status_code is None
+                                      and record.created_at <= timezone.now() - lease()):
+                    continue  # the first attempt released the key or its lease ran out; take it over
+                if record.status_code is None:
+                    response = Response({"error": "A request with this Idempotency-Key is still in progress."},
+                                        status=status.HTTP_409_CONFLICT)
+                    response['Retry-After'] = '1'
+                    return response
+                return _replay(record)
+        return wrapper
+    return decorator
+
+
+def _run(record, handler, view, request, *args, **kwargs):
+    event = threading.Event()
+    event_key = (record.scope, record.key)
+    with _events_lock:
+        _events[event_key] = event
+    # Filtered by pk: after a lease takeover the key may belong to another request.
+    own_row = IdempotencyKey.objects.filter(pk=record.pk, status_code__isnull=True)
+    stored = False
+    try:
+        response = handler(view, request, *args, **kwargs)
+        if response.status_code < 500:
+            body = '' if response.data is None else json.dumps(response.data, cls=JSONEncoder)
+            own_row.update(status_code=response.status_code, response_body=body)
+            stored = True
+        return response
+    finally:
+        if not stored:
+            own_row.delete()
+        with _events_lock:
+            if _events.get(event_key) is event:
+                _events.pop(event_key)
+        event.set()
+
+
+def purge_expired_keys(batch_size=1000, now=None):
+    """Delete expired keys in batches. Returns the number deleted."""
+    now = now or timezone.now()
+    total = 0
+    while True:
+        ids = list(
+            IdempotencyKey.objects.filter(expires_at__lte=now).values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        total += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
+        if len(ids) < batch_size:
+            break
+    if total:
+        logger.info("Purged %s expired idempotency keys", total)
+    return total
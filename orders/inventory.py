@@ -0,0 +1,144 @@
+"""
+Stock reservation.
+
+``reserve_stock`` runs inside the order-creation transaction and takes stock
+with one conditional ``UPDATE ... SET stock = stock - n WHERE stock >= n`` per
+product, so concurrent checkouts can never drive stock negative and no row is
+read before it is written. Products with ``stock`` NULL are untracked: the
+same statement matches them and leaves them NULL.
+
+Held reservations are either committed by the payment callback or returned
+to stock by ``release_expired_reservations`` once they pass ``expires_at``.
+"""
+import logging
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from products.models import Product
+
+from .models import StockReservation
+
+logger = logging.getLogger(__name__)
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product_ids):
+        self.product_ids = product_ids
+        super().__init__(f"Insufficient stock for product(s): {', '.join(map(str, product_ids))}")
+
+
+def _totals(items):
+    totals = OrderedDict()
+    # Lock rows in id order so two checkouts cannot deadlock on each other.
+    for product_id, quantity in sorted(items):
+        totals[product_id] = totals.get(product_id, 0) + quantity
+    return totals
+
+
+def _take(product_id, quantity):
+    return Product.objects.filter(
+        Q(stock__isnull=True) | Q(stock__gte=quantity), id=product_id,
+    ).update(stock=F('stock') - quantity)
+
+
+def reserve_stock(order, items):
+    """
+    Take stock for ``items`` (``(product_id, quantity)`` pairs) and hold it for
+    ``order``. Must run inside ``transaction.atomic()``: on shortage it raises
+    ``InsufficientStock`` and the caller's transaction undoes every decrement.
+    """
+    totals = _totals(items)
+    short = [product_id for product_id, quantity in totals.items() if not _take(product_id, quantity)]
+    if short:
+        raise InsufficientStock(short)
+
+    expires_at = timezone.now() + timedelta(minutes=getattr(settings, 'STOCK_RESERVATION_TTL_MINUTES', 15))
+    StockReservation.objects.bulk_create([
+        StockReservation(order=order, product_id=product_id, quantity=quantity, expires_at=expires_at)
+        for product_id, quantity in totals.items()
+    ])
+
+
+def _restore(quantities):
+    for product_id, quantity in sorted(quantities.items()):
+        Product.objects.filter(id=product_id).update(stock=F('stock') + quantity)
+
+
+def _release(reservations):
+    """Mark held reservations released and put their stock back. Returns the count."""
+    ids = [r.id for r in reservations]
+    released = StockReservation.objects.filter(id__in=ids, status=StockReservation.HELD).update(
+        status=StockReservation.RELEASED,
+    )
+    if released != len(ids):
+        # Someone committed part of this set concurrently; only restore what we flipped.
+        reservations = list(StockReservation.objects.filter(id__in=ids, status=StockReservation.RELEASED))
+    quantities = {}
+    for reservation in reservations:
+        quantities[reservation.product_id] = quantities.get(reservation.product_id, 0) + reservation.quantity
+    _restore(quantities)
+    return released
+
+
+def commit_reservations(order):
+    """
+    Turn an order's held stock into a sale. If the reservation had already
+    expired and been released, try to take the stock again; if that fails the
+    order is paid but oversold, which is logged for follow-up.
+    """
+    commit_order_reservations([order.id])
+
+
+def commit_order_reservations(order_ids):
+    """``commit_reservations`` for many orders with one UPDATE for the held rows."""
+    with transaction.atomic():
+        StockReservation.objects.filter(order_id__in=order_ids, status=StockReservation.HELD).update(
+            status=StockReservation.COMMITTED,
+        )
+        lapsed = list(StockReservation.objects.filter(order_id__in=order_ids, status=StockReservation.RELEASED))
+        for reservation in lapsed:
+            if not _take(reservation.product_id, reservation.quantity):
+                logger.warning(
+                    "⚠️ Order #%s paid after its reservation lapsed; product %s is oversold by up to %s",
+                    reservation.order_id, reservation.product_id, reservation.quantity,
+                )
+        if lapsed:
+            StockReservation.objects.filter(id__in=[r.id for r in lapsed]).update(status=StockReservation.COMMITTED)
+
+
+def release_order_reservations(order_ids):
+    """Return held stock for the given orders (e.g. when they expire unpaid)."""
+    with transaction.atomic():
+        held = StockReservation.objects.filter(order_id__in=order_ids, status=StockReservation.HELD)
+        if connection.features.has_select_for_update_skip_locked:
+            held = held.select_for_update(skip_locked=True)
+        return _release(list(held))
+
+
+def release_expired_reservations(batch_size=500, now=None):
+    """Release held reservations past ``expires_at`` in batches. Returns the number released."""
+    now = now or timezone.now()
+    total = 0
+    while True:
+        with transaction.atomic():
+            due = (
+                StockReservation.objects
+                .filter(status=StockReservation.HELD, expires_at__lte=now)
+                .order_by('expires_at')
+            )
+            if connection.features.has_select_for_update_skip_locked:
+                due = due.select_for_update(skip_locked=True)
+            batch = list(due[:batch_size])
+            if not batch:
+                break
+            total += _release(batch)
+        if len(batch) < batch_size:
+            break
+    if total:
+        logger.info("Released %s expired stock reservations", total)
+    return total
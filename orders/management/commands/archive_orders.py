@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from orders.archive import archive_cutoff, archive_settled_orders, settled_orders
+
+
+class Command(BaseCommand):
+    help = (
+        "Move paid or expired orders older than ORDER_ARCHIVE_AFTER_DAYS, with their items and "
+        "transactions, into the archive tables. Safe to interrupt and re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--max-batches', type=int, default=None)
+        parser.add_argument('--dry-run', action='store_true', help="Only count the orders that would move.")
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            cutoff = archive_cutoff()
+            self.stdout.write(f"{settled_orders(cutoff).count()} settled orders created before {cutoff:%Y-%m-%d}.")
+            return
+        totals = archive_settled_orders(batch_size=options['batch_size'], max_batches=options['max_batches'])
+        self.stdout.write(
+            f"Archived {totals['orders']} orders, {totals['items']} items and "
+            f"{totals['transactions']} transactions in {totals['batches']} batches."
+        )
@@ -0,0 +1,93 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections, transaction
+
+from orders.inventory import InsufficientStock, reserve_stock
+from orders.models import Order, OrderItem
+from products.models import Category, Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammer a few products with concurrent checkouts through reserve_stock and check "
+        "that stock never oversells. Uses the configured database and removes its rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--checkouts', type=int, default=500)
+        parser.add_argument('--products', type=int, default=3, help="Hot products shared by every checkout.")
+        parser.add_argument('--stock', type=int, default=200, help="Starting stock per product.")
+        parser.add_argument('--quantity', type=int, default=1, help="Units of each product per checkout.")
+
+    def handle(self, *args, **options):
+        category, _ = Category.objects.get_or_create(slug='bench-contention', defaults={'name': 'Bench contention'})
+        products = [
+            Product.objects.create(
+                name=f'Contention {i}', description='', price=Decimal('10.00'), unit='piece',
+                category=category, stock=options['stock'],
+            )
+            for i in range(options['products'])
+        ]
+        quantity = options['quantity']
+        items = [(p.id, quantity) for p in products]
+        outcomes = {'ok': 0, 'sold_out': 0, 'db_error': 0}
+        latencies = []
+        lock = threading.Lock()
+
+        def checkout(n):
+            start = time.perf_counter()
+            try:
+                with transaction.atomic():
+                    order = Order.objects.create(
+                        customer_name=f'contention-{n}', payment_method='mpesa',
+                        total_amount=Decimal('10.00') * len(items) * quantity,
+                    )
+                    OrderItem.objects.bulk_create([OrderItem(order=order, product_id=pid, quantity=q) for pid, q in items])
+                    reserve_stock(order, items)
+                outcome = 'ok'
+            except InsufficientStock:
+                outcome = 'sold_out'
+            except OperationalError:
+                # SQLite raises "database is locked" under heavy write contention.
+                outcome = 'db_error'
+            finally:
+                close_old_connections()
+            with lock:
+                outcomes[outcome] += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            list(pool.map(checkout, range(options['checkouts'])))
+        elapsed = time.perf_counter() - start
+
+        final_stock = dict(Product.objects.filter(id__in=[p.id for p in products]).values_list('id', 'stock'))
+        expected = options['stock'] - outcomes['ok'] * quantity
+        latencies.sort()
+        report = {
+            'threads': options['threads'],
+            'checkouts': options['checkouts'],
+            'elapsed_s': round(elapsed, 3),
+            'checkouts_per_sec': round(options['checkouts'] / elapsed, 1),
+            'latency_ms': {
+                'p50': round(latencies[len(latencies) // 2], 3),
+                'p99': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 3),
+                'max': round(latencies[-1], 3),
+            },
+            'outcomes': outcomes,
+            'final_stock': list(final_stock.values()),
+            'expected_stock': expected,
+            'oversold': any(stock != expected for stock in final_stock.values()),
+        }
+
+        Order.objects.filter(customer_name__startswith='contention-').delete()
+        Product.objects.filter(id__in=[p.id for p in products]).delete()
+        category.delete()
+
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from orders.expiry import expire_stale_orders
+
+
+class Command(BaseCommand):
+    help = "Mark unpaid orders older than ORDER_UNPAID_TTL_MINUTES as expired and release their stock."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        expired = expire_stale_orders(batch_size=options['batch_size'])
+        self.stdout.write(f"Expired {expired} unpaid orders.")
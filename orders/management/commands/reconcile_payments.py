@@ -0,0 +1,44 @@
+import json
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from orders.reconciliation import DEFAULT_MAX_GAP, reconcile
+
+
+def _parse_day(value):
+    try:
+        day = datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f"Invalid date {value!r}, expected YYYY-MM-DD")
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+class Command(BaseCommand):
+    help = (
+        "Match unlinked M-Pesa transactions to orders for a date window and print a JSON report. "
+        "Dry run unless --apply is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help="First day (YYYY-MM-DD). Defaults to --days ago.")
+        parser.add_argument('--until', help="Day after the last one (YYYY-MM-DD). Defaults to tomorrow.")
+        parser.add_argument('--days', type=int, default=30)
+        parser.add_argument(
+            '--max-gap-hours', type=float, default=DEFAULT_MAX_GAP.total_seconds() / 3600,
+            help="Latest a payment may arrive after its order was created.",
+        )
+        parser.add_argument('--apply', action='store_true', help="Write the matches.")
+
+    def handle(self, *args, **options):
+        today = timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+        end = _parse_day(options['until']) if options['until'] else today + timedelta(days=1)
+        start = _parse_day(options['since']) if options['since'] else end - timedelta(days=options['days'])
+        if start >= end:
+            raise CommandError("--since must be before --until")
+
+        report = reconcile(
+            start, end, apply=options['apply'], max_gap=timedelta(hours=options['max_gap_hours']),
+        )
+        self.stdout.write(json.dumps(report.as_dict(), indent=2))
@@ -0,0 +1,60 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from orders.callback_replay import DEFAULT_MIX, SCENARIOS, build_cases, cleanup, replay, summarise
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a burst of generated M-Pesa stkCallback payloads against MpesaCallbackView "
+        "from several threads and report throughput, latency and double-payment checks. "
+        "Writes to the database in DATABASE_URL (use a local SQLite file or Postgres)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--callbacks', type=int, default=500)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument(
+            '--mix', default=None,
+            help="Scenario shares, e.g. success=0.5,duplicate=0.2,failure=0.1,missing_reference=0.15,unmatched=0.05",
+        )
+        parser.add_argument('--keep', action='store_true', help="Keep the generated orders and transactions.")
+        parser.add_argument('--output', help="Write the JSON report here instead of stdout.")
+
+    def handle(self, *args, **options):
+        mix = DEFAULT_MIX
+        if options['mix']:
+            try:
+                mix = {k: float(v) for k, v in (part.split('=') for part in options['mix'].split(','))}
+            except ValueError:
+                raise CommandError("--mix must look like success=0.5,duplicate=0.2")
+            unknown = set(mix) - set(SCENARIOS)
+            if unknown:
+                raise CommandError(f"Unknown scenario(s): {', '.join(sorted(unknown))}")
+
+        # Keep side effects local: no SMTP or webhook calls for replayed payments.
+        with override_settings(
+            EMAIL_OUTBOX_WORKER=False,
+            PAYMENT_NOTIFICATION_SINKS=['orders.notifications.LocalSink'],
+        ):
+            from orders.notifications import reset_notifier
+            reset_notifier()
+            run_id, cases = build_cases(options['callbacks'], mix, options['seed'])
+            try:
+                results, elapsed = replay(cases, threads=options['threads'])
+                report = summarise(run_id, results, elapsed)
+            finally:
+                if not options['keep']:
+                    cleanup(run_id)
+                reset_notifier()
+
+        report['threads'] = options['threads']
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                fh.write(output + '\n')
+        else:
+            self.stdout.write(output)
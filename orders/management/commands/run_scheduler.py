@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from karen.scheduler import Scheduler, load_tasks
+
+
+class Command(BaseCommand):
+    help = "Run the periodic tasks from settings.PERIODIC_TASKS (forever, or once with --once)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Run every selected task once and exit.")
+        parser.add_argument('--task', action='append', dest='tasks', help="Only run this task (repeatable).")
+
+    def handle(self, *args, **options):
+        tasks = load_tasks(options['tasks'])
+        if not tasks:
+            raise CommandError("No periodic tasks selected.")
+
+        if options['once']:
+            for task in tasks:
+                result = task.run()
+                self.stdout.write(f"{task.name}: {result}")
+            return
+
+        self.stdout.write(f"Running {', '.join(t.name for t in tasks)}")
+        Scheduler(tasks).run_forever()
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.1 on 2026-10-19 18:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_order_location'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyEarningsSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True)),
+                ('total_earnings', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('order_count', models.PositiveIntegerField()),
+                ('stale', models.BooleanField(default=False)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['month'],
+            },
+        ),
+    ]
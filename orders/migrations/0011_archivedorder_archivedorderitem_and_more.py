@@ -0,0 +1,64 @@
+# Generated by Django 4.2.1 on 2026-10-19 20:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_product_stock'),
+        ('orders', '0010_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('customer_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('customer_phone', models.CharField(blank=True, max_length=20, null=True)),
+                ('payment_method', models.CharField(choices=[('mpesa', 'M-Pesa'), ('card', 'Card')], max_length=10)),
+                ('transaction_id', models.CharField(blank=True, default='', max_length=100)),
+                ('total_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('is_paid', models.BooleanField(default=False)),
+                ('is_expired', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('location', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='orders.location')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderItem',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='orders.archivedorder')),
+                ('product', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='products.product')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedMpesaTransaction',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('receipt_number', models.CharField(max_length=100, unique=True)),
+                ('phone_number', models.CharField(max_length=15)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('transaction_date', models.DateTimeField()),
+                ('merchant_request_id', models.CharField(max_length=100)),
+                ('checkout_request_id', models.CharField(max_length=100)),
+                ('result_code', models.IntegerField()),
+                ('result_description', models.TextField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transactions', to='orders.archivedorder')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['created_at'], name='orders_archived_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedmpesatransaction',
+            index=models.Index(fields=['transaction_date'], name='orders_archived_txn_date_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Daraja TransactionDate values were stored as naive East Africa Time and so
+# read three hours ahead in UTC. The callback now parses them as
+# Africa/Nairobi; this shifts the rows already stored to match. Kenya has no
+# daylight saving, so the offset is always three hours.
+
+from datetime import timedelta
+
+from django.db import migrations
+from django.db.models import F
+
+EAT_OFFSET = timedelta(hours=3)
+
+
+def to_utc(apps, schema_editor):
+    for name in ('MpesaTransaction', 'ArchivedMpesaTransaction'):
+        apps.get_model('orders', name).objects.update(transaction_date=F('transaction_date') - EAT_OFFSET)
+
+
+def to_eat(apps, schema_editor):
+    for name in ('MpesaTransaction', 'ArchivedMpesaTransaction'):
+        apps.get_model('orders', name).objects.update(transaction_date=F('transaction_date') + EAT_OFFSET)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0012_order_orders_created_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(to_utc, to_eat),
+    ]
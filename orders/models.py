@@ -31,9 +31,21 @@ class Order(models.Model):
     payment_method = models.CharField(max_length=10, choices=PAYMENT_METHODS)
     transaction_id = models.CharField(max_length=100, blank=True, default="")
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    location = models.ForeignKey('Location', on_delete=models.SET_NULL, null=True, blank=True, related_name='orders')
     is_paid = models.BooleanField(default=False)  # ✅ New field
+    # Set by the expiry sweeper on unpaid orders older than ORDER_UNPAID_TTL_MINUTES.
+    is_expired = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Expiry sweeper and callback fallback matcher both scan unpaid orders by age.
+            models.Index(fields=['is_paid', 'is_expired', 'created_at'], name='orders_unpaid_age_idx'),
+            models.Index(fields=['customer_phone', 'created_at'], name='orders_phone_created_idx'),
+            # Date-range search and the by-date view (orders/search.py).
+            models.Index(fields=['created_at'], name='orders_created_idx'),
+        ]
+
     def __str__(self):
         return f"Order #{self.id} - {self.payment_method.upper()}"
 
@@ -52,3 +64,139 @@ class Location(models.Model):
 
     def __str__(self):
         return self.name
+
+
+class StockReservation(models.Model):
+    """
+    Stock taken from a product for an unpaid order. Held reservations expire
+    after STOCK_RESERVATION_TTL_MINUTES and are returned to stock by the
+    sweeper; payment confirmation commits them.
+    """
+    HELD = 'held'
+    COMMITTED = 'committed'
+    RELEASED = 'released'
+
+    STATUSES = [
+        (HELD, 'Held'),
+        (COMMITTED, 'Committed'),
+        (RELEASED, 'Released'),
+    ]
+
+    order = models.ForeignKey(Order, related_name='reservations', on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, related_name='reservations', on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=10, choices=STATUSES, default=HELD)
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'expires_at'], name='orders_reservation_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} for order #{self.order_id} ({self.status})"
+
+
+class MonthlyEarningsSnapshot(models.Model):
+    """
+    Frozen earnings for a closed calendar month (orders/earnings.py). A late
+    change to an order in that month marks the row stale so it is recomputed.
+    """
+    month = models.DateField(unique=True)
+    total_earnings = models.DecimalField(max_digits=14, decimal_places=2)
+    order_count = models.PositiveIntegerField()
+    stale = models.BooleanField(default=False)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['month']
+
+    def __str__(self):
+        return f"{self.month:%Y-%m}: {self.total_earnings}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    A client-supplied ``Idempotency-Key`` and the response it produced
+    (orders/idempotency.py). ``status_code`` is NULL while the first request
+    is still running.
+    """
+    scope = models.CharField(max_length=50)
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key'], name='orders_idempotency_key_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='orders_idempotency_exp_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope}:{self.key} ({self.status_code or 'in flight'})"
+
+
+class ArchivedOrder(models.Model):
+    """
+    A settled order moved out of ``Order`` by orders/archive.py. Keeps the
+    original id and fields so reads can merge it back in.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    customer_name = models.CharField(max_length=255, blank=True, null=True)
+    customer_phone = models.CharField(max_length=20, blank=True, null=True)
+    payment_method = models.CharField(max_length=10, choices=Order.PAYMENT_METHODS)
+    transaction_id = models.CharField(max_length=100, blank=True, default="")
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    location = models.ForeignKey('Location', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    is_paid = models.BooleanField(default=False)
+    is_expired = models.BooleanField(default=False)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='orders_archived_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived order #{self.id} - {self.payment_method.upper()}"
+
+
+class ArchivedOrderItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, related_name='items', on_delete=models.CASCADE)
+    # No database constraint: products may be deleted long after their orders were archived.
+    product = models.ForeignKey(Product, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    quantity = models.PositiveIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id}"
+
+
+class ArchivedMpesaTransaction(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    receipt_number = models.CharField(max_length=100, unique=True)
+    phone_number = models.CharField(max_length=15)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    transaction_date = models.DateTimeField()
+    merchant_request_id = models.CharField(max_length=100)
+    checkout_request_id = models.CharField(max_length=100)
+    result_code = models.IntegerField()
+    result_description = models.TextField()
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.SET_NULL, null=True, blank=True,
+                              related_name='transactions')
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['transaction_date'], name='orders_archived_txn_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.receipt_number} - {self.phone_number} (archived)"
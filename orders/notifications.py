@@ -0,0 +1,218 @@
+"""
+Payment-confirmation notifications.
+
+``MpesaCallbackView`` sends ``orders.signals.payment_confirmed`` once an order
+is marked paid. The receiver below hands the order id to a bounded thread pool
+and returns straight away, so the callback response never waits on a sink.
+Each sink (email, webhook, local) keeps its own latency and failure counters.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.db import close_old_connections
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .signals import payment_confirmed
+
+logger = logging.getLogger(__name__)
+
+
+def build_payment_event(order):
+    items = [
+        {'product_id': item.product_id, 'name': item.product.name, 'quantity': item.quantity}
+        for item in order.items.select_related('product')
+    ]
+    return {
+        'event': 'payment.confirmed',
+        'order': {
+            'id': order.id,
+            'customer_name': order.customer_name,
+            'customer_phone': order.customer_phone,
+            'payment_method': order.payment_method,
+            'transaction_id': order.transaction_id,
+            'total_amount': str(order.total_amount),
+            'created_at': order.created_at.isoformat(),
+        },
+        'items': items,
+    }
+
+
+class NotificationSink:
+    name = 'sink'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def is_enabled(self):
+        return True
+
+    def send(self, event):
+        raise NotImplementedError
+
+    def deliver(self, event):
+        start = time.perf_counter()
+        try:
+            self.send(event)
+            ok = True
+        except Exception:
+            logger.exception("❌ %s notification failed for order #%s", self.name, event['order']['id'])
+            ok = False
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            if ok:
+                self.sent += 1
+            else:
+                self.failed += 1
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+        return ok
+
+    def stats(self):
+        with self._lock:
+            calls = self.sent + self.failed
+            return {
+                'sent': self.sent,
+                'failed': self.failed,
+                'avg_ms': round(self.total_seconds / calls * 1000, 3) if calls else 0.0,
+                'max_ms': round(self.max_seconds * 1000, 3),
+            }
+
+
+class EmailSink(NotificationSink):
+    """Queues a payment-received email to the shop (orders have no customer email)."""
+    name = 'email'
+
+    def is_enabled(self):
+        return bool(getattr(settings, 'PAYMENT_NOTIFICATION_EMAILS', []))
+
+    def send(self, event):
+        from emails.outbox import enqueue_template_email
+        enqueue_template_email('payment_received', event, settings.PAYMENT_NOTIFICATION_EMAILS)
+
+
+class WebhookSink(NotificationSink):
+    """POSTs the event as JSON to ``PAYMENT_WEBHOOK_URL``."""
+    name = 'webhook'
+
+    def is_enabled(self):
+        return bool(getattr(settings, 'PAYMENT_WEBHOOK_URL', ''))
+
+    def send(self, event):
+        response = requests.post(
+            settings.PAYMENT_WEBHOOK_URL,
+            json=event,
+            timeout=getattr(settings, 'PAYMENT_WEBHOOK_TIMEOUT', 5),
+        )
+        response.raise_for_status()
+
+
+class LocalSink(NotificationSink):
+    """Keeps events in memory. Meant for tests and local development."""
+    name = 'local'
+
+    def __init__(self):
+        super().__init__()
+        self.events = []
+
+    def send(self, event):
+        with self._lock:
+            self.events.append(event)
+
+
+class PaymentNotifier:
+    """
+    Fans each event out to every enabled sink on a bounded worker pool.
+
+    At most ``queue_size`` notifications may be waiting or running; beyond
+    that new ones are dropped and counted rather than piling up in memory.
+    """
+
+    def __init__(self, sinks, workers=4, queue_size=100, run_async=True):
+        self.sinks = sinks
+        self.run_async = run_async
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='payment-notify') if run_async else None
+
+    def notify(self, order_id):
+        if not self.run_async:
+            self._fan_out(order_id)
+            return
+        if not self._slots.acquire(blocking=False):
+            with self._dropped_lock:
+                self.dropped += 1
+            logger.warning("⚠️ Notification queue full, dropping payment event for order #%s", order_id)
+            return
+        future = self._executor.submit(self._fan_out, order_id)
+        future.add_done_callback(lambda _: self._slots.release())
+
+    def _fan_out(self, order_id):
+        from .models import Order
+        try:
+            order = Order.objects.get(id=order_id)
+            event = build_payment_event(order)
+            for sink in self.sinks:
+                if sink.is_enabled():
+                    sink.deliver(event)
+        except Exception:
+            logger.exception("❌ Could not build payment event for order #%s", order_id)
+        finally:
+            if self.run_async:
+                close_old_connections()
+
+    def get_sink(self, name):
+        for sink in self.sinks:
+            if sink.name == name:
+                return sink
+        return None
+
+    def stats(self):
+        return {
+            'dropped': self.dropped,
+            'sinks': {sink.name: sink.stats() for sink in self.sinks},
+        }
+
+
+_notifier = None
+_notifier_lock = threading.Lock()
+
+
+def get_notifier():
+    global _notifier
+    with _notifier_lock:
+        if _notifier is None:
+            sinks = [
+                import_string(path)()
+                for path in getattr(settings, 'PAYMENT_NOTIFICATION_SINKS', [])
+            ]
+            _notifier = PaymentNotifier(
+                sinks,
+                workers=getattr(settings, 'PAYMENT_NOTIFICATION_WORKERS', 4),
+                queue_size=getattr(settings, 'PAYMENT_NOTIFICATION_QUEUE_SIZE', 100),
+                run_async=getattr(settings, 'PAYMENT_NOTIFICATIONS_ASYNC', True),
+            )
+        return _notifier
+
+
+def reset_notifier():
+    """Drop the cached notifier so the next event rebuilds it from settings."""
+    global _notifier
+    with _notifier_lock:
+        _notifier = None
+
+
+@receiver(payment_confirmed)
+def notify_payment_confirmed(sender, order, reconciled=False, **kwargs):
+    # Payments matched after the fact by the reconciliation job are not announced.
+    if not reconciled:
+        get_notifier().notify(order.id)
@@ -0,0 +1,242 @@
+"""
+Payment reconciliation.
+
+``MpesaCallbackView`` matches payments to orders heuristically, so some
+successful transactions end up with ``order=None`` and some paid orders never
+get their transaction linked. ``reconcile`` repairs both for a time window:
+
+1. Loads unmatched successful transactions and unpaid orders for the window
+   in two queries.
+2. Links transactions whose receipt already sits on a paid order's
+   ``transaction_id`` (the order was paid, only the FK is missing).
+3. Indexes the unpaid orders by ``(canonical phone, amount)`` and, for each
+   remaining transaction, scores the candidates under its key by how long
+   before the payment they were created. Pairs are assigned greedily,
+   closest first, so each order and each transaction is used at most once.
+4. With ``apply=True``, writes everything with ``bulk_update`` in one
+   transaction and sends ``payment_confirmed`` (``reconciled=True``) for each
+   order it marks paid.
+
+Daraja sends ``TransactionDate`` as East Africa Time with no offset; the
+callback parses it as Africa/Nairobi (orders/settlement.py), so stored
+transaction dates are aware and compare directly with ``Order.created_at``.
+"""
+import logging
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.db import transaction
+
+from .inventory import commit_order_reservations
+from .models import MpesaTransaction, Order
+from .signals import payment_confirmed
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_GAP = timedelta(hours=24)
+# How far a payment may appear to precede its order (clock drift between systems).
+DEFAULT_EARLY_TOLERANCE = timedelta(minutes=15)
+IN_CHUNK = 500
+# bulk_update emits a CASE per field that is evaluated linearly per row, so keep batches small.
+UPDATE_BATCH = 100
+MAX_REPORTED = 100
+
+
+def canonical_phone(phone):
+    """Reduce a Kenyan number to ``7XXXXXXXX``/``1XXXXXXXX`` so every stored format compares equal."""
+    digits = ''.join(ch for ch in str(phone or '') if ch.isdigit())
+    if digits.startswith('254') and len(digits) == 12:
+        return digits[3:]
+    if digits.startswith('0') and len(digits) == 10:
+        return digits[1:]
+    return digits
+
+
+def _chunks(values, size=IN_CHUNK):
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+@dataclass
+class ReconciliationReport:
+    start: object
+    end: object
+    applied: bool = False
+    transactions_scanned: int = 0
+    orders_scanned: int = 0
+    linked: list = field(default_factory=list)
+    matched: list = field(default_factory=list)
+    ambiguous: int = 0
+    unmatched_transactions: list = field(default_factory=list)
+    elapsed: float = 0.0
+
+    def as_dict(self):
+        return {
+            'window': {'start': self.start.isoformat(), 'end': self.end.isoformat()},
+            'applied': self.applied,
+            'transactions_scanned': self.transactions_scanned,
+            'orders_scanned': self.orders_scanned,
+            'linked_to_paid_orders': len(self.linked),
+            'matched_to_unpaid_orders': len(self.matched),
+            'ambiguous': self.ambiguous,
+            'unmatched_transactions': len(self.unmatched_transactions),
+            'elapsed_s': round(self.elapsed, 3),
+            'matches': self.matched[:MAX_REPORTED],
+            'links': self.linked[:MAX_REPORTED],
+            'unmatched': self.unmatched_transactions[:MAX_REPORTED],
+        }
+
+
+def _load_transactions(start, end):
+    return list(
+        MpesaTransaction.objects
+        .filter(order__isnull=True, result_code=0, transaction_date__gte=start, transaction_date__lt=end)
+        .order_by('transaction_date')
+        .values('id', 'receipt_number', 'phone_number', 'amount', 'transaction_date')
+    )
+
+
+def _paid_orders_by_receipt(receipts):
+    found = {}
+    for chunk in _chunks(receipts):
+        found.update(
+            Order.objects.filter(is_paid=True, transaction_id__in=chunk).values_list('transaction_id', 'id')
+        )
+    return found
+
+
+def _index_unpaid_orders(start, end):
+    index = defaultdict(list)
+    count = 0
+    orders = (
+        Order.objects
+        .filter(is_paid=False, created_at__gte=start, created_at__lt=end)
+        .values('id', 'customer_phone', 'total_amount', 'created_at')
+    )
+    for order in orders.iterator(chunk_size=2000):
+        index[(canonical_phone(order['customer_phone']), order['total_amount'])].append(order)
+        count += 1
+    return index, count
+
+
+def find_matches(transactions, index, max_gap=DEFAULT_MAX_GAP, early_tolerance=DEFAULT_EARLY_TOLERANCE):
+    """
+    Pair transactions with indexed orders. Returns ``(pairs, ambiguous)`` where
+    ``pairs`` is a list of ``(gap, transaction, order)`` and ``ambiguous`` is how
+    many transactions had more than one plausible order.
+    """
+    proposals = []
+    ambiguous = 0
+    for txn in transactions:
+        candidates = index.get((canonical_phone(txn['phone_number']), txn['amount']), ())
+        plausible = 0
+        for order in candidates:
+            gap = txn['transaction_date'] - order['created_at']
+            if -early_tolerance <= gap <= max_gap:
+                proposals.append((abs(gap), txn['id'], txn, order))
+                plausible += 1
+        if plausible > 1:
+            ambiguous += 1
+
+    # Closest pairs first; ids break ties so the result is deterministic.
+    proposals.sort(key=lambda p: (p[0], p[1], p[3]['id']))
+    used_txns, used_orders, pairs = set(), set(), []
+    for gap, txn_id, txn, order in proposals:
+        if txn_id in used_txns or order['id'] in used_orders:
+            continue
+        used_txns.add(txn_id)
+        used_orders.add(order['id'])
+        pairs.append((gap, txn, order))
+    return pairs, ambiguous
+
+
+def _apply(links, pairs):
+    """Write links and matches. Returns the orders actually marked paid."""
+    with transaction.atomic():
+        order_ids = [order['id'] for _, _, order in pairs]
+        # The callback may have paid some of these since they were loaded.
+        still_unpaid = set()
+        for chunk in _chunks(order_ids):
+            still_unpaid.update(
+                Order.objects.select_for_update().filter(id__in=chunk, is_paid=False).values_list('id', flat=True)
+            )
+        pairs = [pair for pair in pairs if pair[2]['id'] in still_unpaid]
+
+        orders = [
+            Order(id=order['id'], transaction_id=txn['receipt_number'], customer_phone=txn['phone_number'])
+            for _, txn, order in pairs
+        ]
+        paid_ids = [order.id for order in orders]
+        # Flags are the same for every row, so they go in a plain UPDATE.
+        for chunk in _chunks(paid_ids):
+            Order.objects.filter(id__in=chunk).update(is_paid=True, is_expired=False)
+        Order.objects.bulk_update(orders, ['transaction_id', 'customer_phone'], batch_size=UPDATE_BATCH)
+
+        transactions = [MpesaTransaction(id=txn['id'], order_id=order_id) for txn, order_id in links]
+        transactions += [MpesaTransaction(id=txn['id'], order_id=order['id']) for _, txn, order in pairs]
+        MpesaTransaction.objects.bulk_update(transactions, ['order'], batch_size=UPDATE_BATCH)
+
+        for chunk in _chunks(paid_ids):
+            commit_order_reservations(chunk)
+
+        def announce():
+            for chunk in _chunks(paid_ids):
+                for order in Order.objects.filter(id__in=chunk):
+                    payment_confirmed.send(sender=Order, order=order, mpesa_transaction=None, reconciled=True)
+
+        transaction.on_commit(announce)
+    return pairs
+
+
+def reconcile(start, end, apply=False, max_gap=DEFAULT_MAX_GAP, early_tolerance=DEFAULT_EARLY_TOLERANCE):
+    """
+    Reconcile transactions dated in ``[start, end)`` against unpaid orders
+    created up to ``max_gap`` before them. Nothing is written unless ``apply``.
+    Returns a ``ReconciliationReport``.
+    """
+    report = ReconciliationReport(start=start, end=end, applied=apply)
+    began = time.perf_counter()
+
+    transactions = _load_transactions(start, end)
+    report.transactions_scanned = len(transactions)
+
+    paid_by_receipt = _paid_orders_by_receipt([t['receipt_number'] for t in transactions])
+    links = []
+    remaining = []
+    for txn in transactions:
+        order_id = paid_by_receipt.get(txn['receipt_number'])
+        if order_id:
+            links.append((txn, order_id))
+        else:
+            remaining.append(txn)
+
+    index, report.orders_scanned = _index_unpaid_orders(start - max_gap, end + early_tolerance)
+    pairs, report.ambiguous = find_matches(remaining, index, max_gap, early_tolerance)
+
+    if apply and (links or pairs):
+        pairs = _apply(links, pairs)
+
+    matched_ids = {txn['id'] for _, txn, _ in pairs}
+    report.linked = [{'receipt_number': txn['receipt_number'], 'order_id': order_id} for txn, order_id in links]
+    report.matched = [
+        {
+            'receipt_number': txn['receipt_number'],
+            'order_id': order['id'],
+            'gap_s': int(gap.total_seconds()),
+        }
+        for gap, txn, order in pairs
+    ]
+    report.unmatched_transactions = [
+        {'receipt_number': txn['receipt_number'], 'phone_number': txn['phone_number'], 'amount': str(txn['amount'])}
+        for txn in remaining if txn['id'] not in matched_ids
+    ]
+    report.elapsed = time.perf_counter() - began
+    logger.info(
+        "Reconciled %s transactions: %s linked, %s matched, %s unmatched%s",
+        report.transactions_scanned, len(report.linked), len(report.matched),
+        len(report.unmatched_transactions), '' if apply else ' (dry run)',
+    )
+    return report
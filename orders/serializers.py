@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import Order, OrderItem, Location, MpesaTransaction
+from karen.fastjson import values_rows
+from .models import Order, OrderItem, Location, MpesaTransaction, ArchivedOrder, ArchivedOrderItem
 from products.models import Product
 
 class MpesaTransactionSerializer(serializers.ModelSerializer):
@@ -33,6 +34,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
 class OrderSerializer(serializers.ModelSerializer):
     items = OrderItemSerializer(many=True)
     is_paid = serializers.BooleanField(read_only=True)  # Include is_paid in API response, but not required during creation
+    is_expired = serializers.BooleanField(read_only=True)
 
     class Meta:
         model = Order
@@ -43,7 +45,9 @@ class OrderSerializer(serializers.ModelSerializer):
             'payment_method',
             'transaction_id',
             'total_amount',
+            'location',
             'is_paid',           # ✅ make sure this is included
+            'is_expired',
             'items',
             'created_at',
         ]
@@ -51,6 +55,82 @@ class OrderSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         items_data = validated_data.pop('items')
         order = Order.objects.create(**validated_data)
-        for item_data in items_data:
-            OrderItem.objects.create(order=order, **item_data)
+        OrderItem.objects.bulk_create([OrderItem(order=order, **item_data) for item_data in items_data])
         return order
+
+
+class ArchivedOrderItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ArchivedOrderItem
+        fields = ['product_id', 'quantity']
+
+
+class ArchivedOrderSerializer(serializers.ModelSerializer):
+    """Read-only; same output as ``OrderSerializer``."""
+    items = ArchivedOrderItemSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = ArchivedOrder
+        fields = OrderSerializer.Meta.fields
+
+
+def order_data(orders):
+    """Serialize a mix of live and archived orders, keeping their order."""
+    return [
+        (ArchivedOrderSerializer if isinstance(order, ArchivedOrder) else OrderSerializer)(order).data
+        for order in orders
+    ]
+
+
+def fast_order_list(orders):
+    """``OrderSerializer(orders, many=True).data`` from two ``values_list`` queries."""
+    rows = values_rows(orders, [
+        'id', 'customer_name', 'customer_phone', 'payment_method', 'transaction_id', 'total_amount',
+        'location', 'is_paid', 'is_expired', ('items', None), 'created_at',
+    ])
+    items = {}
+    order_items = (
+        OrderItem.objects
+        .filter(order_id__in=orders.values('id'))
+        .order_by('order_id', 'id')
+        .values_list('order_id', 'product_id', 'quantity')
+    )
+    for order_id, product_id, quantity in order_items:
+        items.setdefault(order_id, []).append({'product_id': product_id, 'quantity': quantity})
+    for row in rows:
+        row['items'] = items.get(row['id'], [])
+    return rows
+
+
+class OrderBulkUpdateItemSerializer(serializers.Serializer):
+    """One entry of an order bulk update; the view resolves ``id`` for the whole batch at once."""
+    id = serializers.IntegerField()
+    customer_name = serializers.CharField(max_length=255, required=False, allow_blank=True, allow_null=True)
+    customer_phone = serializers.CharField(max_length=20, required=False, allow_blank=True, allow_null=True)
+    payment_method = serializers.ChoiceField(choices=Order.PAYMENT_METHODS, required=False)
+    transaction_id = serializers.CharField(max_length=100, required=False, allow_blank=True)
+
+    def validate(self, attrs):
+        # Paying an order commits its stock and notifies (orders/settlement.py); a plain field write would not.
+        if 'is_paid' in self.initial_data:
+            raise serializers.ValidationError({'is_paid': "Payment status is set by settlement or reconciliation only."})
+        return attrs
+
+
+class OrderSearchParamsSerializer(serializers.Serializer):
+    """Query parameters of ``OrderSearchView``; ``date_to`` is inclusive."""
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    is_paid = serializers.BooleanField(required=False, allow_null=True, default=None)
+    payment_method = serializers.ChoiceField(choices=Order.PAYMENT_METHODS, required=False)
+    phone = serializers.RegexField(r'^(0[17]\d{8}|254[17]\d{8})$', required=False)
+    min_amount = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    max_amount = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+
+    def validate(self, attrs):
+        if attrs.get('date_from') and attrs.get('date_to') and attrs['date_from'] > attrs['date_to']:
+            raise serializers.ValidationError("date_from must not be after date_to.")
+        if (attrs.get('min_amount') is not None and attrs.get('max_amount') is not None
+                and attrs['min_amount'] > attrs['max_amount']):
+            raise serializers.ValidationError("min_amount must not be more than max_amount.")
+        return attrs
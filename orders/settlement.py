@@ -0,0 +1,213 @@
+"""
+Payment settlement shared by ``MpesaCallbackView`` and the STK status
+poller (mpesa/poller.py).
+
+``settle`` records the M-Pesa transaction when there is a receipt, finds
+the order (by AccountReference, or else by phone and amount among live
+unpaid orders) and marks it paid with a conditional update. Only the
+first settlement of an order commits its reservations and sends
+``payment_confirmed``, so a callback that arrives after the poller has
+already settled the order just attaches its receipt. A phone+amount match
+that loses the conditional update to a concurrent callback tries the next
+candidate, so two payments for look-alike orders settle both of them.
+"""
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from mpesa.models import StkPushAttempt
+
+from . import archive
+from .expiry import live_unpaid_orders
+from .inventory import commit_reservations
+from .models import ArchivedMpesaTransaction, MpesaTransaction, Order
+from .signals import payment_confirmed
+
+logger = logging.getLogger(__name__)
+
+FALLBACK_CANDIDATES = 20  # phone+amount matches tried before giving up
+DARAJA_TZ = ZoneInfo('Africa/Nairobi')  # Daraja timestamps are EAT wall-clock time with no offset
+DARAJA_TIMESTAMP = '%Y%m%d%H%M%S'
+
+
+def parse_daraja_timestamp(value):
+    """Daraja's ``TransactionDate`` (e.g. ``20261019120000``) as an aware datetime. Raises ValueError."""
+    return datetime.strptime(str(value), DARAJA_TIMESTAMP).replace(tzinfo=DARAJA_TZ)
+
+
+def daraja_timestamp(when):
+    """Format an aware datetime the way Daraja sends it (used by the callback replay and benchmarks)."""
+    return int(when.astimezone(DARAJA_TZ).strftime(DARAJA_TIMESTAMP))
+
+
+def normalize_phone(phone):
+    """
+    Normalize Safaricom phone numbers to 07XXXXXXXX or 01XXXXXXXX
+    Accepts:
+        - 2547XXXXXXXX → 07XXXXXXXX
+        - 2541XXXXXXXX → 01XXXXXXXX
+        - Already normalized formats remain unchanged
+    """
+    phone = str(phone).strip()
+    if phone.startswith("254") and len(phone) == 12:
+        return "0" + phone[3:]
+    elif phone.startswith("07") or phone.startswith("01"):
+        return phone
+    return phone
+
+
+class DuplicateReceipt(Exception):
+    def __init__(self, receipt_number):
+        self.receipt_number = receipt_number
+        super().__init__(f"A transaction with receipt number '{receipt_number}' already exists.")
+
+
+@dataclass
+class PaymentResult:
+    checkout_request_id: str
+    result_code: int
+    result_description: str = ''
+    merchant_request_id: str = ''
+    account_reference: Optional[str] = None
+    phone_number: str = ''
+    amount: Optional[Decimal] = None
+    # Only callbacks carry these; the STK query API does not return them.
+    receipt_number: str = ''
+    transaction_date: Optional[datetime] = None
+
+
+@dataclass
+class Settlement:
+    order: Optional[Order] = None
+    mpesa_transaction: Optional[MpesaTransaction] = None
+    newly_paid: bool = False
+    receipt_attached: bool = False  # the order was already paid; this call only recorded its receipt
+
+
+def record_attempt_result(result, status):
+    """Store the outcome on the matching STK attempt; a paid attempt is never downgraded."""
+    return (
+        StkPushAttempt.objects
+        .filter(checkout_request_id=result.checkout_request_id)
+        .exclude(status=StkPushAttempt.PAID)
+        .update(status=status, result_code=result.result_code, result_description=result.result_description or '')
+    )
+
+
+def _order_for_reference(account_reference):
+    if not account_reference:
+        return None
+    try:
+        order = Order.objects.get(id=int(account_reference))
+        logger.info("Found order #%s via AccountReference", order.id)
+        return order
+    except (ValueError, Order.DoesNotExist):
+        logger.warning("No order found with AccountReference: %s", account_reference)
+        return None
+
+
+def _fallback_candidates(result, normalized_phone):
+    """Live unpaid orders matching the payer's phone and amount, newest first."""
+    # Only orders still inside the payment window are candidates.
+    return live_unpaid_orders().filter(
+        Q(customer_phone=normalized_phone) | Q(customer_phone=result.phone_number),
+        total_amount=result.amount,
+        transaction_id__in=["", None]
+    ).order_by('-created_at')[:FALLBACK_CANDIDATES]
+
+
+def _mark_paid(order, updates):
+    """Conditionally mark ``order`` paid; True only for the call that flipped it."""
+    return bool(Order.objects.filter(pk=order.pk, is_paid=False).update(**updates))
+
+
+def _archived_receipt(result):
+    # Receipts only move to the archive once their transaction date is past the cutoff.
+    when = result.transaction_date
+    if when is not None and timezone.is_naive(when):
+        when = timezone.make_aware(when, DARAJA_TZ)
+    if when is not None and not archive.includes_archive(when):
+        return False
+    return ArchivedMpesaTransaction.objects.filter(receipt_number=result.receipt_number).exists()
+
+
+def settle(result):
+    """Apply a successful payment. Raises DuplicateReceipt if the receipt was already recorded."""
+    if result.result_code != 0:
+        record_attempt_result(result, StkPushAttempt.FAILED)
+        return Settlement()
+
+    normalized_phone = normalize_phone(result.phone_number)
+    order = _order_for_reference(result.account_reference)
+
+    mpesa_transaction = None
+    if result.receipt_number:
+        if _archived_receipt(result):
+            raise DuplicateReceipt(result.receipt_number)
+        try:
+            with transaction.atomic():
+                mpesa_transaction = MpesaTransaction.objects.create(
+                    receipt_number=result.receipt_number,
+                    phone_number=normalized_phone,
+                    amount=result.amount,
+                    transaction_date=result.transaction_date,
+                    merchant_request_id=result.merchant_request_id,
+                    checkout_request_id=result.checkout_request_id,
+                    result_code=result.result_code,
+                    result_description=result.result_description,
+                    order=order,
+                )
+        except IntegrityError:
+            raise DuplicateReceipt(result.receipt_number)
+
+    updates = {'is_paid': True, 'is_expired': False, 'customer_phone': normalized_phone}
+    if result.receipt_number:
+        updates['transaction_id'] = result.receipt_number
+
+    record_attempt_result(result, StkPushAttempt.PAID)
+    # Read before the transaction so its first statement is the write (SQLite
+    # cannot upgrade a read transaction while another writer holds the lock).
+    candidates = [] if order is not None else list(_fallback_candidates(result, normalized_phone))
+    newly_paid = receipt_attached = False
+    with transaction.atomic():
+        if order is not None:
+            newly_paid = _mark_paid(order, updates)
+            if not newly_paid and result.receipt_number:
+                # Settled earlier without a receipt (by the poller); record it now.
+                receipt_attached = bool(
+                    Order.objects.filter(pk=order.pk, transaction_id="").update(transaction_id=result.receipt_number)
+                )
+        else:
+            # Concurrent callbacks for the same phone and amount see the same
+            # candidates; one that loses the conditional update moves on to the
+            # next order instead of attaching its payment to nothing.
+            for candidate in candidates:
+                if _mark_paid(candidate, updates):
+                    order, newly_paid = candidate, True
+                    break
+
+        if order is None:
+            return Settlement(mpesa_transaction=mpesa_transaction)
+        if newly_paid:
+            commit_reservations(order)
+        if mpesa_transaction is not None and mpesa_transaction.order_id is None:
+            MpesaTransaction.objects.filter(pk=mpesa_transaction.pk).update(order=order)
+            mpesa_transaction.order = order
+        order.refresh_from_db()
+
+    if newly_paid:
+        logger.info("✅ Order #%s updated with transaction %s", order.id,
+                    result.receipt_number or result.checkout_request_id)
+        # Notifications run on a background pool; this only queues them.
+        transaction.on_commit(lambda: payment_confirmed.send(
+            sender=Order, order=order, mpesa_transaction=mpesa_transaction
+        ))
+    return Settlement(order=order, mpesa_transaction=mpesa_transaction, newly_paid=newly_paid,
+                      receipt_attached=receipt_attached)
@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+# Sent after an order has been marked paid and the change committed.
+# Arguments: order, mpesa_transaction (may be None), reconciled (True when
+# the payment was matched later by orders/reconciliation.py).
+payment_confirmed = Signal()
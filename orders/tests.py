@@ -1,3 +1,660 @@
-from django.test import TestCase
+import threading
+import time
+from datetime import date, datetime, timedelta
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.views import APIView
+
+from products.models import Category, Product
+
+from . import archive, earnings
+from .archive import archive_settled_orders
+from .expiry import expire_stale_orders, live_unpaid_orders
+from .idempotency import idempotent, purge_expired_keys, request_fingerprint
+from .inventory import release_expired_reservations, reserve_stock
+from .models import (
+    ArchivedOrder, IdempotencyKey, MonthlyEarningsSnapshot, MpesaTransaction, Order, OrderItem, StockReservation,
+)
+from .notifications import LocalSink, NotificationSink, PaymentNotifier, get_notifier, reset_notifier
+from .search import load_page, search_orders
+from .reconciliation import find_matches
+from .settlement import PaymentResult, daraja_timestamp, parse_daraja_timestamp, settle
+from .signals import payment_confirmed
+
+
+@skipUnless(connection.vendor == 'postgresql', "EXPLAIN plans are checked on PostgreSQL only")
+class OrderSearchPlanTests(TestCase):
+    """The search predicates must stay index-friendly (no casts on created_at)."""
+
+    def plan(self, **params):
+        queryset = search_orders({'date_from': date.today(), **params})
+        with transaction.atomic(), connection.cursor() as cursor:
+            # An empty test table is cheapest to scan; make the planner show whether an index applies.
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            return queryset.explain()
+
+    def assertUsesIndex(self, plan, index):
+        self.assertIn(index, plan)
+        self.assertNotIn('Seq Scan on orders_order', plan)
+
+    def test_date_range_uses_created_index(self):
+        self.assertUsesIndex(self.plan(date_to=date.today()), 'orders_created_idx')
+
+    def test_paid_status_uses_unpaid_age_index(self):
+        self.assertUsesIndex(self.plan(is_paid=False), 'orders_unpaid_age_idx')
+
+    def test_phone_uses_phone_index(self):
+        self.assertUsesIndex(self.plan(phone='0712345678', min_amount=Decimal('10')), 'orders_phone_created_idx')
+
+
+class FlakyView(APIView):
+    """Answers with whatever ``outcomes`` holds next; ``gate`` holds the handler open."""
+    permission_classes = []
+    outcomes = []
+    gate = None
+    calls = 0
+
+    @idempotent('test')
+    def post(self, request):
+        type(self).calls += 1
+        if self.gate is not None:
+            self.gate.wait(5)
+        if not self.outcomes:
+            raise AssertionError(f"FlakyView ran more often than expected (call {type(self).calls})")
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return Response({"n": type(self).calls}, status=outcome)
+
+
+@override_settings(PAYMENT_NOTIFICATIONS_ASYNC=False, EMAIL_OUTBOX_WORKER=False)
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Vegetables', slug='vegetables')
+        self.product = Product.objects.create(
+            name='Kale', description='', price=Decimal('50.00'), unit='kg', category=category,
+        )
+        FlakyView.calls, FlakyView.gate = 0, None
+
+    def order_body(self, quantity=1):
+        return {
+            'customer_name': 'Wanjiku', 'customer_phone': '0712345678', 'payment_method': 'mpesa',
+            'total_amount': str(50 * quantity), 'items': [{'product_id': self.product.id, 'quantity': quantity}],
+        }
+
+    def create(self, body, key='3f1c2a7e-0000-4000-8000-000000000001', client=None):
+        return (client or APIClient()).post(reverse('order-create'), body, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def flaky(self, outcomes, key='k-1'):
+        FlakyView.outcomes = list(outcomes)
+        request = APIRequestFactory().post('/flaky/', {'a': 1}, format='json', HTTP_IDEMPOTENCY_KEY=key)
+        return FlakyView.as_view()(request)
+
+    def test_first_request_runs_and_stores_the_response(self):
+        response = self.create(self.order_body())
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+        record = IdempotencyKey.objects.get()
+        self.assertEqual((record.scope, record.status_code), ('order-create', 201))
+
+    def test_retry_replays_without_a_second_order(self):
+        first = self.create(self.order_body())
+        replay = self.create(self.order_body())
+        self.assertEqual(replay.status_code, 201)
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(replay.json(), first.json())
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_key_reused_with_a_different_body_is_rejected(self):
+        self.create(self.order_body())
+        response = self.create(self.order_body(quantity=2))
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_keys_are_scoped_per_authenticated_user(self):
+        for name in ('amina', 'baraka'):
+            client = APIClient()
+            client.force_authenticate(User.objects.create_user(name, password='pw'))
+            self.assertNotIn('Idempotent-Replayed', self.create(self.order_body(), client=client))
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_server_error_releases_the_key(self):
+        self.assertEqual(self.flaky([503]).status_code, 503)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        response = self.flaky([200])
+        self.assertEqual((response.status_code, FlakyView.calls), (200, 2))
+        self.assertNotIn('Idempotent-Replayed', response)
+
+    def test_exception_releases_the_key(self):
+        with self.assertRaises(RuntimeError):
+            self.flaky([RuntimeError('boom')])
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(self.flaky([201]).status_code, 201)
+
+    def test_client_errors_are_replayed(self):
+        self.flaky([400])
+        response = self.flaky([201])
+        self.assertEqual((response.status_code, response['Idempotent-Replayed'], FlakyView.calls), (400, 'true', 1))
+
+    @override_settings(IDEMPOTENCY_WAIT_SECONDS=0)
+    def test_duplicate_of_an_unfinished_request_gets_409(self):
+        request = FlakyView().initialize_request(APIRequestFactory().post('/flaky/', {'a': 1}, format='json'))
+        IdempotencyKey.objects.create(
+            scope='test', key='k-1', request_hash=request_fingerprint(request),
+            expires_at=timezone.now() + timedelta(hours=1),
+        )
+        response = self.flaky([200])
+        self.assertEqual((response.status_code, response['Retry-After'], FlakyView.calls), (409, '1', 0))
+
+    def test_abandoned_in_flight_key_is_taken_over_after_its_lease(self):
+        request = FlakyView().initialize_request(APIRequestFactory().post('/flaky/', {'a': 1}, format='json'))
+        IdempotencyKey.objects.create(
+            scope='test', key='k-1', request_hash=request_fingerprint(request),
+            expires_at=timezone.now() + timedelta(hours=24),
+        )
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(minutes=5))
+        response = self.flaky([201])
+        self.assertEqual((response.status_code, FlakyView.calls), (201, 1))
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(IdempotencyKey.objects.get().status_code, 201)
+
+    def test_purge_deletes_only_expired_keys(self):
+        now = timezone.now()
+        for index, hours in enumerate((-2, -1, 1)):
+            IdempotencyKey.objects.create(scope='test', key=f'k-{index}', request_hash='x', status_code=200,
+                                          expires_at=now + timedelta(hours=hours))
+        self.assertEqual(purge_expired_keys(batch_size=1, now=now), 2)
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['k-2'])
+
+
+@skipUnless(connection.vendor == 'postgresql', "SQLite locks the whole table against concurrent writers")
+class IdempotencyConcurrencyTests(TransactionTestCase):
+    """Duplicates that arrive while the first request runs wait for it and replay its response."""
+
+    def test_concurrent_duplicates_run_the_handler_once(self):
+        FlakyView.calls, FlakyView.outcomes, FlakyView.gate = 0, [201], threading.Event()
+        view = FlakyView.as_view()
+        responses = []
+
+        def send():
+            request = APIRequestFactory().post('/flaky/', {'a': 1}, format='json', HTTP_IDEMPOTENCY_KEY='k-1')
+            try:
+                responses.append(view(request))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=send) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + 5
+        while not IdempotencyKey.objects.exists() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.2)  # let the duplicates reach the wait
+        FlakyView.gate.set()
+        for thread in threads:
+            thread.join(10)
+
+        self.assertEqual(FlakyView.calls, 1)
+        self.assertEqual(sorted(r.status_code for r in responses), [201] * 4)
+        self.assertEqual(sum(r.has_header('Idempotent-Replayed') for r in responses), 3)
+
+
+@override_settings(PAYMENT_NOTIFICATIONS_ASYNC=False, EMAIL_OUTBOX_WORKER=False)
+class AnalyticsCacheTests(TestCase):
+    """Cached reports are dropped when a product's price changes (orders/analytics.py)."""
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Vegetables', slug='vegetables')
+        self.product = Product.objects.create(
+            name='Kale', description='', price=Decimal('50.00'), unit='kg', category=category,
+        )
+        order = Order.objects.create(payment_method='mpesa', total_amount=Decimal('100.00'), is_paid=True)
+        OrderItem.objects.create(order=order, product=self.product, quantity=2)
+        self.admin = APIClient()
+        self.admin.force_authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+
+    def revenue(self):
+        response = self.admin.get(reverse('analytics-top-products'))
+        self.assertEqual(response.status_code, 200)
+        return response.data['results'][0]['revenue']
+
+    def test_price_change_through_save_invalidates(self):
+        self.assertEqual(self.revenue(), '100.00')
+        self.product.price = Decimal('60.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        self.assertEqual(self.revenue(), '120.00')
+
+    def test_price_change_through_bulk_update_invalidates(self):
+        self.assertEqual(self.revenue(), '100.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.admin.patch(reverse('product-bulk-update'), [
+                {'id': self.product.id, 'price': '70.00'},
+            ], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.revenue(), '140.00')
+
+    def test_top_products_rejects_granularity(self):
+        response = self.admin.get(reverse('analytics-top-products'), {'granularity': 'day'})
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('granularity', self.admin.get(reverse('analytics-top-products')).data)
+
+
+@override_settings(PAYMENT_NOTIFICATIONS_ASYNC=False, EMAIL_OUTBOX_WORKER=False)
+class SettlementTests(TestCase):
+    """Fallback matching by phone and amount (orders/settlement.py)."""
+
+    def setUp(self):
+        self.orders = [
+            Order.objects.create(customer_phone='0712345678', payment_method='mpesa', total_amount=Decimal('100.00'))
+            for _ in range(2)
+        ]
+
+    def pay(self, receipt):
+        return settle(PaymentResult(
+            checkout_request_id=f'ws_{receipt}', result_code=0, phone_number='254712345678',
+            amount=Decimal('100.00'), receipt_number=receipt, transaction_date=timezone.now(),
+        ))
+
+    def test_loser_of_a_race_settles_the_next_candidate(self):
+        newest_first = list(reversed(self.orders))
+        # Both callbacks read the candidates before either one wrote.
+        with mock.patch('orders.settlement._fallback_candidates', return_value=newest_first):
+            first, second = self.pay('RCP1'), self.pay('RCP2')
+        self.assertEqual((first.order, second.order), (self.orders[1], self.orders[0]))
+        self.assertTrue(first.newly_paid and second.newly_paid)
+        self.assertEqual(Order.objects.filter(is_paid=True).count(), 2)
+        self.assertEqual(
+            dict(MpesaTransaction.objects.values_list('receipt_number', 'order_id')),
+            {'RCP1': self.orders[1].id, 'RCP2': self.orders[0].id},
+        )
+
+    def test_no_candidate_left_settles_nothing(self):
+        self.pay('RCP1')
+        self.pay('RCP2')
+        third = self.pay('RCP3')
+        self.assertIsNone(third.order)
+        self.assertIsNone(MpesaTransaction.objects.get(receipt_number='RCP3').order_id)
+
+
+class FindMatchesTests(SimpleTestCase):
+    """Pure pairing logic of orders/reconciliation.py."""
+
+    paid_at = datetime(2026, 10, 19, 9, 0, tzinfo=dt_timezone.utc)
+
+    def txn(self, pk, at=None, phone='254712345678'):
+        return {'id': pk, 'receipt_number': f'R{pk}', 'phone_number': phone, 'amount': Decimal('100.00'),
+                'transaction_date': at or self.paid_at}
+
+    def index(self, *orders):
+        index = {}
+        for pk, created_at in orders:
+            index.setdefault(('712345678', Decimal('100.00')), []).append(
+                {'id': pk, 'customer_phone': '0712345678', 'total_amount': Decimal('100.00'), 'created_at': created_at}
+            )
+        return index
+
+    def test_nearest_earlier_order_wins(self):
+        index = self.index((1, self.paid_at - timedelta(minutes=5)), (2, self.paid_at - timedelta(hours=3)),
+                           (3, self.paid_at + timedelta(hours=2)))
+        pairs, ambiguous = find_matches([self.txn(10)], index)
+        self.assertEqual([(txn['id'], order['id']) for _, txn, order in pairs], [(10, 1)])
+        self.assertEqual(pairs[0][0], timedelta(minutes=5))
+        self.assertEqual(ambiguous, 1)  # orders 1 and 2 are plausible; order 3 is past the early tolerance
+
+    def test_each_order_and_transaction_is_used_once(self):
+        index = self.index((1, self.paid_at - timedelta(minutes=5)), (2, self.paid_at - timedelta(minutes=30)))
+        later = self.txn(11, self.paid_at + timedelta(minutes=1))
+        pairs, ambiguous = find_matches([self.txn(10), later], index)
+        self.assertEqual(sorted((txn['id'], order['id']) for _, txn, order in pairs), [(10, 1), (11, 2)])
+        self.assertEqual(ambiguous, 2)
+
+    def test_early_tolerance_and_max_gap(self):
+        index = self.index((1, self.paid_at + timedelta(minutes=10)))
+        self.assertEqual(len(find_matches([self.txn(10)], index)[0]), 1)
+        self.assertEqual(find_matches([self.txn(10)], index, early_tolerance=timedelta(minutes=5)), ([], 0))
+        old = self.index((1, self.paid_at - timedelta(days=2)))
+        self.assertEqual(find_matches([self.txn(10)], old), ([], 0))
+        self.assertEqual(find_matches([self.txn(10, phone='254799999999')], index), ([], 0))
+
+    def test_daraja_timestamps_are_east_africa_time(self):
+        # Noon in Nairobi is 09:00 UTC.
+        self.assertEqual(parse_daraja_timestamp('20261019120000'), self.paid_at)
+        self.assertEqual(daraja_timestamp(self.paid_at), 20261019120000)
+
+
+class OrderBulkUpdateTests(TestCase):
+    def test_is_paid_cannot_be_bulk_updated(self):
+        order = Order.objects.create(customer_phone='0712345678', payment_method='mpesa', total_amount=Decimal('10'))
+        admin = APIClient()
+        admin.force_authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        response = admin.patch(reverse('order-bulk-update'), [
+            {'id': order.id, 'is_paid': True},
+            {'id': order.id, 'customer_name': 'Wanjiku'},
+        ], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['status'] for r in response.data['results']], ['invalid', 'updated'])
+        order.refresh_from_db()
+        self.assertEqual((order.is_paid, order.customer_name), (False, 'Wanjiku'))
+
+
+@override_settings(PAYMENT_NOTIFICATIONS_ASYNC=False, EMAIL_OUTBOX_WORKER=False)
+class StockReservationTests(TestCase):
+    """Checkout takes stock and holds it until payment or release (orders/inventory.py)."""
+
+    def setUp(self):
+        category = Category.objects.create(name='Vegetables', slug='vegetables')
+        self.kale, self.leek, self.salt = (
+            Product.objects.create(name=name, description='', price=Decimal('50.00'), unit='kg', category=category,
+                                   stock=stock)
+            for name, stock in (('Kale', 10), ('Leek', 2), ('Salt', None))
+        )
+
+    def checkout(self, *items):
+        return APIClient().post(reverse('order-create'), {
+            'customer_name': 'Wanjiku', 'customer_phone': '0712345678', 'payment_method': 'mpesa',
+            'total_amount': str(50 * sum(quantity for _, quantity in items)),
+            'items': [{'product_id': product.id, 'quantity': quantity} for product, quantity in items],
+        }, format='json')
+
+    def stock(self, product):
+        product.refresh_from_db()
+        return product.stock
+
+    def pay(self, order_id):
+        return settle(PaymentResult(
+            checkout_request_id='ws_1', result_code=0, account_reference=str(order_id), phone_number='254712345678',
+            amount=Decimal('150.00'), receipt_number='RCP1', transaction_date=timezone.now(),
+        ))
+
+    def test_checkout_reserves_and_decrements(self):
+        response = self.checkout((self.kale, 2), (self.kale, 1))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.stock(self.kale), 7)
+        reservation = StockReservation.objects.get()
+        self.assertEqual((reservation.order_id, reservation.quantity, reservation.status),
+                         (response.data['id'], 3, StockReservation.HELD))
+
+    def test_shortage_is_409_and_takes_nothing(self):
+        response = self.checkout((self.kale, 3), (self.leek, 5))
+        self.assertEqual((response.status_code, response.data['product_ids']), (409, [self.leek.id]))
+        self.assertEqual((self.stock(self.kale), self.stock(self.leek)), (10, 2))
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_untracked_stock_is_unlimited(self):
+        self.assertEqual(self.checkout((self.salt, 1000)).status_code, 201)
+        self.assertIsNone(self.stock(self.salt))
+
+    def test_payment_commits_held_stock(self):
+        order_id = self.checkout((self.kale, 3)).data['id']
+        self.assertTrue(self.pay(order_id).newly_paid)
+        self.assertEqual(StockReservation.objects.get().status, StockReservation.COMMITTED)
+        self.assertEqual(self.stock(self.kale), 7)
+        self.assertEqual(release_expired_reservations(now=timezone.now() + timedelta(days=1)), 0)
+        self.assertEqual(self.stock(self.kale), 7)
+
+    def test_payment_after_the_reservation_lapsed_takes_stock_again(self):
+        order_id = self.checkout((self.kale, 3)).data['id']
+        self.assertEqual(release_expired_reservations(now=timezone.now() + timedelta(days=1)), 1)
+        self.assertEqual((self.stock(self.kale), StockReservation.objects.get().status), (10, StockReservation.RELEASED))
+
+        self.pay(order_id)
+        self.assertEqual((self.stock(self.kale), StockReservation.objects.get().status), (7, StockReservation.COMMITTED))
+
+    def test_release_on_expiry_returns_stock_once(self):
+        self.checkout((self.kale, 3))
+        self.assertEqual(release_expired_reservations(now=timezone.now()), 0)  # not due yet
+        later = timezone.now() + timedelta(days=1)
+        self.assertEqual(release_expired_reservations(now=later), 1)
+        self.assertEqual(release_expired_reservations(now=later), 0)
+        self.assertEqual(self.stock(self.kale), 10)
+
+    def test_bulk_delete_returns_held_stock(self):
+        order_id = self.checkout((self.kale, 3), (self.leek, 2)).data['id']
+        admin = APIClient()
+        admin.force_authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        response = admin.post(reverse('order-bulk-delete'), {'ids': [order_id]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((self.stock(self.kale), self.stock(self.leek)), (10, 2))
+        self.assertFalse(StockReservation.objects.exists())
+
+
+class FailingSink(NotificationSink):
+    name = 'failing'
+
+    def send(self, event):
+        raise ConnectionError("webhook down")
+
+
+@override_settings(PAYMENT_NOTIFICATIONS_ASYNC=False, EMAIL_OUTBOX_WORKER=False,
+                   PAYMENT_NOTIFICATION_SINKS=['orders.notifications.LocalSink'])
+class PaymentNotificationTests(TestCase):
+    """orders/notifications.py, with the in-memory LocalSink."""
+
+    def setUp(self):
+        reset_notifier()
+        self.addCleanup(reset_notifier)
+        self.order = Order.objects.create(customer_phone='0712345678', payment_method='mpesa',
+                                          total_amount=Decimal('100.00'))
+
+    def pay(self, receipt):
+        with self.captureOnCommitCallbacks(execute=True):
+            return settle(PaymentResult(
+                checkout_request_id=f'ws_{receipt}', result_code=0, account_reference=str(self.order.id),
+                phone_number='254712345678', amount=Decimal('100.00'), receipt_number=receipt,
+                transaction_date=timezone.now(),
+            ))
+
+    def test_settlement_delivers_exactly_one_event(self):
+        self.pay('RCP1')
+        self.pay('RCP2')  # the order is already paid; nothing new to announce
+        sink = get_notifier().get_sink('local')
+        self.assertEqual([event['order']['id'] for event in sink.events], [self.order.id])
+        self.assertEqual(sink.events[0]['order']['transaction_id'], 'RCP1')
+        self.assertEqual(get_notifier().stats()['sinks']['local']['sent'], 1)
+
+    def test_reconciled_payments_are_not_announced(self):
+        payment_confirmed.send(sender=Order, order=self.order, mpesa_transaction=None, reconciled=True)
+        self.assertEqual(get_notifier().get_sink('local').events, [])
+
+    def test_a_failing_sink_is_counted_and_does_not_stop_the_others(self):
+        failing, local = FailingSink(), LocalSink()
+        with self.assertLogs('orders.notifications', 'ERROR'):
+            PaymentNotifier([failing, local], run_async=False).notify(self.order.id)
+        self.assertEqual((failing.stats()['sent'], failing.stats()['failed']), (0, 1))
+        self.assertEqual(len(local.events), 1)
+
+    def test_a_full_queue_drops_and_counts(self):
+        notifier = PaymentNotifier([LocalSink()], workers=1, queue_size=1)
+        gate = threading.Event()
+        notifier._fan_out = lambda order_id: gate.wait(5)  # hold the only slot
+        with self.assertLogs('orders.notifications', 'WARNING'):
+            notifier.notify(1)
+            notifier.notify(2)
+            notifier.notify(3)
+        gate.set()
+        notifier._executor.shutdown(wait=True)
+        self.assertEqual(notifier.stats()['dropped'], 2)
+
+
+class MonthlyEarningsTests(TestCase):
+    """Closed months are frozen into snapshots (orders/earnings.py)."""
+
+    def setUp(self):
+        self.current = earnings.month_of(timezone.now())
+        self.previous = earnings._previous_month(self.current)
+        self.older = earnings._previous_month(self.previous)
+
+    def paid_order(self, month, amount):
+        order = Order.objects.create(payment_method='mpesa', total_amount=Decimal(amount), is_paid=True)
+        created_at = earnings._as_datetime(month) + timedelta(days=2)
+        Order.objects.filter(pk=order.pk).update(created_at=created_at)  # no signal, like old history
+        order.created_at = created_at
+        return order
+
+    def aggregate_calls(self):
+        with mock.patch('orders.earnings._aggregate', wraps=earnings._aggregate) as aggregate:
+            result = earnings.monthly_earnings()
+        starts = [call.args[0] if call.args else call.kwargs['start'] for call in aggregate.call_args_list]
+        return result, starts
+
+    def test_closed_months_are_frozen_once(self):
+        self.paid_order(self.older, '100.00')
+        self.paid_order(self.previous, '50.00')
+        self.paid_order(self.current, '30.00')
+        expected = [(self.older, Decimal('100.00')), (self.previous, Decimal('50.00')),
+                    (self.current, Decimal('30.00'))]
+
+        self.assertEqual(earnings.monthly_earnings(), expected)
+        self.assertEqual(list(MonthlyEarningsSnapshot.objects.values_list('month', 'order_count')),
+                         [(self.older, 1), (self.previous, 1)])
+        result, starts = self.aggregate_calls()
+        self.assertEqual((result, starts), (expected, [self.current]))
+
+    def test_late_change_recomputes_only_the_stale_month(self):
+        order = self.paid_order(self.older, '100.00')
+        self.paid_order(self.previous, '50.00')
+        earnings.monthly_earnings()
+
+        order.total_amount = Decimal('120.00')
+        order.save()
+        self.assertTrue(MonthlyEarningsSnapshot.objects.get(month=self.older).stale)
+        result, starts = self.aggregate_calls()
+        self.assertEqual(result, [(self.older, Decimal('120.00')), (self.previous, Decimal('50.00'))])
+        self.assertEqual(starts, [self.older, self.current])
+        self.assertFalse(MonthlyEarningsSnapshot.objects.filter(stale=True).exists())
+
+    def test_empty_history_is_recorded_so_reads_stay_fast(self):
+        self.paid_order(self.current, '30.00')
+        self.assertEqual(earnings.monthly_earnings(), [(self.current, Decimal('30.00'))])
+        snapshot = MonthlyEarningsSnapshot.objects.get()
+        self.assertEqual((snapshot.month, snapshot.order_count), (self.previous, 0))
+
+        result, starts = self.aggregate_calls()
+        self.assertEqual((result, starts), ([(self.current, Decimal('30.00'))], [self.current]))
+
+
+@override_settings(ORDER_UNPAID_TTL_MINUTES=60)
+class OrderExpiryTests(TestCase):
+    """Unpaid orders past the TTL are expired and leave the fallback window (orders/expiry.py)."""
+
+    def setUp(self):
+        category = Category.objects.create(name='Vegetables', slug='vegetables')
+        self.kale = Product.objects.create(name='Kale', description='', price=Decimal('50.00'), unit='kg',
+                                           category=category, stock=10)
+
+    def order(self, age_minutes, is_paid=False, quantity=0):
+        order = Order.objects.create(customer_phone='0712345678', payment_method='mpesa',
+                                     total_amount=Decimal('100.00'), is_paid=is_paid)
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(minutes=age_minutes))
+        if quantity:
+            with transaction.atomic():
+                reserve_stock(order, [(self.kale.id, quantity)])
+        return order
+
+    def expired_ids(self):
+        return set(Order.objects.filter(is_expired=True).values_list('id', flat=True))
+
+    def test_stale_unpaid_orders_expire_in_batches(self):
+        stale = [self.order(90) for _ in range(5)]
+        fresh, paid = self.order(30), self.order(90, is_paid=True)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(expire_stale_orders(batch_size=2), 5)
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "orders_order"')]
+        self.assertEqual(len(updates), 3)  # 2 + 2 + 1
+        self.assertEqual(self.expired_ids(), {order.id for order in stale})
+        self.assertEqual(set(live_unpaid_orders()), {fresh})
+        self.assertNotIn(paid.id, self.expired_ids())
+        self.assertEqual(expire_stale_orders(), 0)
+
+    def test_expiry_releases_held_stock(self):
+        stale, fresh = self.order(90, quantity=3), self.order(30, quantity=2)
+        self.kale.refresh_from_db()
+        self.assertEqual(self.kale.stock, 5)
+
+        expire_stale_orders()
+        self.kale.refresh_from_db()
+        self.assertEqual(self.kale.stock, 8)
+        self.assertEqual(
+            dict(StockReservation.objects.values_list('order_id', 'status')),
+            {stale.id: StockReservation.RELEASED, fresh.id: StockReservation.HELD},
+        )
+
+    def test_fallback_matcher_only_sees_live_orders(self):
+        out_of_window = self.order(90)
+        expired = self.order(30)
+        Order.objects.filter(pk=expired.pk).update(is_expired=True)
+        live = self.order(45)
+
+        payment = PaymentResult(
+            checkout_request_id='ws_1', result_code=0, phone_number='254712345678', amount=Decimal('100.00'),
+            receipt_number='RCP1', transaction_date=timezone.now(),
+        )
+        self.assertEqual(settle(payment).order, live)
+        payment.checkout_request_id, payment.receipt_number = 'ws_2', 'RCP2'
+        unmatched = settle(payment)
+        self.assertIsNone(unmatched.order)
+        self.assertFalse(Order.objects.filter(pk__in=[out_of_window.pk, expired.pk], is_paid=True).exists())
+
+
+@override_settings(ORDER_ARCHIVE_AFTER_DAYS=365)
+class OrderArchiveTests(TestCase):
+    """Settled orders move to the Archived* tables and stay searchable (orders/archive.py)."""
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Vegetables', slug='vegetables')
+        self.kale = Product.objects.create(name='Kale', description='', price=Decimal('50.00'), unit='kg',
+                                           category=category)
+        self.old = timezone.now() - timedelta(days=400)
+
+    def order(self, is_paid):
+        order = Order.objects.create(customer_name='Wanjiku', customer_phone='0712345678', payment_method='mpesa',
+                                     total_amount=Decimal('100.00'), is_paid=is_paid,
+                                     transaction_id='RCP1' if is_paid else '')
+        Order.objects.filter(pk=order.pk).update(created_at=self.old)
+        OrderItem.objects.create(order=order, product=self.kale, quantity=2)
+        return Order.objects.get(pk=order.pk)
+
+    def test_old_paid_order_moves_with_its_items_and_transaction(self):
+        paid, unpaid = self.order(is_paid=True), self.order(is_paid=False)
+        MpesaTransaction.objects.create(
+            receipt_number='RCP1', phone_number='254712345678', amount=Decimal('100.00'), transaction_date=self.old,
+            merchant_request_id='m1', checkout_request_id='ws_1', result_code=0, result_description='OK', order=paid,
+        )
+
+        totals = archive_settled_orders()
+        self.assertEqual((totals['orders'], totals['items'], totals['transactions']), (1, 1, 1))
+        self.assertFalse(Order.objects.filter(pk=paid.pk).exists())
+        self.assertFalse(OrderItem.objects.filter(order_id=paid.pk).exists())
+        self.assertFalse(MpesaTransaction.objects.exists())
+
+        archived = ArchivedOrder.objects.get()
+        self.assertEqual(
+            [getattr(archived, field) for field in archive.ORDER_FIELDS],
+            [getattr(paid, field) for field in archive.ORDER_FIELDS],
+        )
+        self.assertEqual(list(archived.items.values_list('product_id', 'quantity')), [(self.kale.id, 2)])
+        self.assertEqual(list(archived.transactions.values_list('receipt_number', flat=True)), ['RCP1'])
+
+        rows = list(search_orders({'date_from': self.old.date()}))
+        self.assertEqual([(row['id'], row['archived']) for row in rows], [(unpaid.id, False), (paid.id, True)])
+        self.assertEqual([type(order) for order in load_page(rows)], [Order, ArchivedOrder])
+
+        # Unpaid orders never move, even when handed to a batch directly.
+        self.assertEqual(archive._archive_order_batch([unpaid.id]), (0, 0, 0))
+        self.assertTrue(Order.objects.filter(pk=unpaid.pk).exists())
+        self.assertEqual(ArchivedOrder.objects.count(), 1)
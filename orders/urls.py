@@ -4,6 +4,7 @@ from .views import (
     OrderByPhoneView,
     AllOrdersView,
     OrdersByDateView,
+    OrderSearchView,
     LocationListCreateView,
     MpesaCallbackView,
     MpesaTransactionListView,
@@ -11,6 +12,11 @@ from .views import (
     MonthlyEarningsView,
     LocationDetailView,
     MpesaStatusByCheckoutIDView,
+    OrderBulkUpdateView,
+    OrderBulkDeleteView,
+    TopProductsView,
+    SalesByCategoryView,
+    SalesByLocationView,
 )
 
 urlpatterns = [
@@ -18,11 +24,17 @@ urlpatterns = [
     path('by-phone/', OrderByPhoneView.as_view(), name='order-by-phone'),
     path('all/', AllOrdersView.as_view(), name='all-orders'),
     path('by-date/', OrdersByDateView.as_view(), name='orders-by-date'),
+    path('search/', OrderSearchView.as_view(), name='order-search'),
     path('locations/', LocationListCreateView.as_view(), name='location-list'),
     path('locations/<int:id>/', LocationDetailView.as_view(), name='location-detail'),
     path('callback/', MpesaCallbackView.as_view(), name='mpesa-callback'),
     path('transactions/', MpesaTransactionListView.as_view(), name='mpesa-transactions'),
     path('transactions/by-phone/', MpesaTransactionByPhoneView.as_view(), name='mpesa-transactions-by-phone'),
-    path("earnings/monthly/", MonthlyEarningsView.as_view()),
+    path("earnings/monthly/", MonthlyEarningsView.as_view(), name="monthly-earnings"),
     path('status/', MpesaStatusByCheckoutIDView.as_view(), name='mpesa-status'),
+    path('bulk-update/', OrderBulkUpdateView.as_view(), name='order-bulk-update'),
+    path('bulk-delete/', OrderBulkDeleteView.as_view(), name='order-bulk-delete'),
+    path('analytics/top-products/', TopProductsView.as_view(), name='analytics-top-products'),
+    path('analytics/by-category/', SalesByCategoryView.as_view(), name='analytics-by-category'),
+    path('analytics/by-location/', SalesByLocationView.as_view(), name='analytics-by-location'),
 ]
@@ -7,18 +7,33 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.parsers import JSONParser, FormParser
-from django.db.utils import IntegrityError
+from rest_framework.pagination import PageNumberPagination
+from django.db import transaction
 from django.db.models import Q
 
 from .models import Order, Location, MpesaTransaction, OrderItem
-from .serializers import OrderSerializer, LocationSerializer, MpesaTransactionSerializer
-
-
-from django.db.models.functions import TruncMonth
-from django.db.models import Sum
+from .serializers import (
+    OrderSerializer,
+    LocationSerializer,
+    MpesaTransactionSerializer,
+    OrderBulkUpdateItemSerializer,
+    fast_order_list,
+    order_data,
+    OrderSearchParamsSerializer,
+)
+from .inventory import InsufficientStock, release_order_reservations, reserve_stock
+from .earnings import mark_stale_for_orders, monthly_earnings
+from .idempotency import idempotent
+from .settlement import DuplicateReceipt, PaymentResult, normalize_phone, parse_daraja_timestamp, settle
+from . import analytics
+from .search import load_page, search_orders, searches_archive
 
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from .permissions import IsAdminUserOnly
+from karen import fastjson
+from karen.bulk import BulkIdsSerializer, bulk_items, bulk_update_changed
+from karen.fastjson import FastJSONMixin
+from karen.throttling import ListThrottle
 
 logger = logging.getLogger(__name__)
 
@@ -54,46 +69,77 @@ class LocationDetailView(APIView):
 
 
 class MonthlyEarningsView(APIView):
+    use_replica = True  # read-only dashboard query; see karen/db_router.py
     def get(self, request):
-        # Only paid orders
-        earnings = (
-            Order.objects
-            .filter(is_paid=True)
-            .annotate(month=TruncMonth("created_at"))
-            .values("month")
-            .annotate(total_earnings=Sum("total_amount"))
-            .order_by("month")
-        )
-
-        # Format the response
+        # Closed months come from frozen snapshots; only the current month is summed live.
         data = [
             {
-                "month": entry["month"].strftime("%Y-%m"),
-                "total_earnings": float(entry["total_earnings"])
+                "month": month.strftime("%Y-%m"),
+                "total_earnings": float(total)
             }
-            for entry in earnings
+            for month, total in monthly_earnings()
         ]
 
         return Response(data, status=status.HTTP_200_OK)
 
 
-def normalize_phone(phone):
+class AnalyticsView(APIView):
     """
-    Normalize Safaricom phone numbers to 07XXXXXXXX or 01XXXXXXXX
-    Accepts:
-        - 2547XXXXXXXX → 07XXXXXXXX
-        - 2541XXXXXXXX → 01XXXXXXXX
-        - Already normalized formats remain unchanged
+    Base for the sales analytics endpoints. Query params: ``start``, ``end``
+    (YYYY-MM-DD, end exclusive; defaults to the last 30 days) and, where
+    supported (``bucketed``), ``granularity`` (total, day, week or month).
     """
-    phone = str(phone).strip()
-    if phone.startswith("254") and len(phone) == 12:
-        return "0" + phone[3:]
-    elif phone.startswith("07") or phone.startswith("01"):
-        return phone
-    return phone
+    permission_classes = [IsAuthenticated, IsAdminUserOnly]
+    use_replica = True
+    bucketed = True
+
+    def get(self, request):
+        if not self.bucketed and 'granularity' in request.GET:
+            return Response({"error": "This report does not support granularity."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            start, end, granularity = analytics.parse_range(request.GET)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        result = self.report(request, start, end, granularity)
+        if isinstance(result, Response):
+            return result
+        return Response({
+            "start": start.date().isoformat(),
+            "end": end.date().isoformat(),
+            **({"granularity": granularity} if self.bucketed else {}),
+            "results": result,
+        }, status=status.HTTP_200_OK)
+
+
+class TopProductsView(AnalyticsView):
+    bucketed = False
+
+    def report(self, request, start, end, granularity):
+        order_by = request.GET.get('by', 'revenue')
+        if order_by not in ('revenue', 'quantity'):
+            return Response({"error": "by must be revenue or quantity."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(max(int(request.GET.get('limit', 10)), 1), analytics.MAX_LIMIT)
+        except ValueError:
+            return Response({"error": "limit must be a number."}, status=status.HTTP_400_BAD_REQUEST)
+        return analytics.top_products(start, end, order_by=order_by, limit=limit)
+
+
+class SalesByCategoryView(AnalyticsView):
+    def report(self, request, start, end, granularity):
+        return analytics.sales_by_category(start, end, granularity)
+
+
+class SalesByLocationView(AnalyticsView):
+    def report(self, request, start, end, granularity):
+        return analytics.sales_by_location(start, end, granularity)
 
 
 class MpesaTransactionListView(APIView):
+    use_replica = True
+    throttle_classes = [ListThrottle]
+    expensive = True
     def get(self, request):
         transactions = MpesaTransaction.objects.all().order_by('-transaction_date')
         serializer = MpesaTransactionSerializer(transactions, many=True)
@@ -101,6 +147,7 @@ class MpesaTransactionListView(APIView):
 
 
 class MpesaTransactionByPhoneView(APIView):
+    use_replica = True
     def get(self, request):
         phone = request.GET.get("phone")
         if not phone:
@@ -154,8 +201,14 @@ class MpesaCallbackView(APIView):
                 logger.error("Missing stkCallback in request data.")
                 return Response({"error": "Invalid callback data"}, status=status.HTTP_400_BAD_REQUEST)
 
+            checkout_request_id = stk_callback.get("CheckoutRequestID")  # 📍 pulled out for logging
             if stk_callback.get("ResultCode") != 0:
                 logger.info("Transaction failed: %s", stk_callback.get("ResultDesc"))
+                settle(PaymentResult(
+                    checkout_request_id=checkout_request_id,
+                    result_code=stk_callback.get("ResultCode"),
+                    result_description=stk_callback.get("ResultDesc") or "",
+                ))
                 return Response({"message": "Transaction failed or cancelled"}, status=status.HTTP_200_OK)
 
             metadata = stk_callback.get("CallbackMetadata", {}).get("Item", [])
@@ -165,8 +218,6 @@ class MpesaCallbackView(APIView):
             phone_number = str(meta_dict.get("PhoneNumber", ""))
             raw_amount = meta_dict.get("Amount", 0)
             raw_date = str(meta_dict.get("TransactionDate", ""))
-            account_reference = stk_callback.get("AccountReference")
-            checkout_request_id = stk_callback.get("CheckoutRequestID")  # 📍 pulled out for logging
 
             logger.info("💾 CheckoutRequestID to be saved: %s", checkout_request_id)  # 📍 Added log
 
@@ -175,60 +226,38 @@ class MpesaCallbackView(APIView):
                 return Response({"error": "Incomplete callback metadata"}, status=status.HTTP_400_BAD_REQUEST)
 
             try:
-                transaction_date = datetime.strptime(raw_date, "%Y%m%d%H%M%S")
+                transaction_date = parse_daraja_timestamp(raw_date)
             except ValueError:
                 logger.error("Invalid date format: %s", raw_date)
                 return Response({"error": "Invalid transaction date format"}, status=status.HTTP_400_BAD_REQUEST)
 
             amount = Decimal(str(raw_amount))
-            normalized_phone = normalize_phone(phone_number)
-
-            order = None
-            if account_reference:
-                try:
-                    order_id = int(account_reference)
-                    order = Order.objects.get(id=order_id)
-                    logger.info("Found order #%s via AccountReference", order_id)
-                except (ValueError, Order.DoesNotExist):
-                    logger.warning("No order found with AccountReference: %s", account_reference)
 
             try:
-                MpesaTransaction.objects.create(
-                    receipt_number=receipt_number,
-                    phone_number=normalized_phone,
-                    amount=amount,
-                    transaction_date=transaction_date,
-                    merchant_request_id=stk_callback.get("MerchantRequestID"),
+                settlement = settle(PaymentResult(
                     checkout_request_id=checkout_request_id,
-                    result_code=stk_callback.get("ResultCode"),
+                    result_code=0,
                     result_description=stk_callback.get("ResultDesc"),
-                    order=order
-                )
-            except IntegrityError:
+                    merchant_request_id=stk_callback.get("MerchantRequestID"),
+                    account_reference=stk_callback.get("AccountReference"),
+                    phone_number=phone_number,
+                    amount=amount,
+                    receipt_number=receipt_number,
+                    transaction_date=transaction_date,
+                ))
+            except DuplicateReceipt:
                 logger.warning("Duplicate receipt number: %s", receipt_number)
                 return Response(
                     {"error": f"A transaction with receipt number '{receipt_number}' already exists."},
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            matched_order = order
-            if not matched_order:
-                matched_order = Order.objects.filter(
-                    Q(customer_phone=normalized_phone) | Q(customer_phone=phone_number),
-                    total_amount=amount,
-                    is_paid=False,
-                    transaction_id__in=["", None]
-                ).order_by('-created_at').first()
-
-            if matched_order:
-                matched_order.transaction_id = receipt_number
-                matched_order.customer_phone = normalized_phone
-                matched_order.is_paid = True
-                matched_order.save()
-                logger.info("✅ Order #%s updated with transaction %s", matched_order.id, receipt_number)
-                return Response({"message": f"Order {matched_order.id} updated with payment"}, status=status.HTTP_200_OK)
+            if settlement.newly_paid or settlement.receipt_attached:
+                return Response({"message": f"Order {settlement.order.id} updated with payment"}, status=status.HTTP_200_OK)
+            elif settlement.order:
+                logger.warning("⚠️ Order #%s was already paid; receipt %s logged only", settlement.order.id, receipt_number)
             else:
-                logger.warning("⚠️ No matching order found for phone %s and amount %s", normalized_phone, amount)
+                logger.warning("⚠️ No matching order found for phone %s and amount %s", normalize_phone(phone_number), amount)
 
             return Response({"message": "Callback received and logged"}, status=status.HTTP_200_OK)
 
@@ -256,6 +285,7 @@ class LocationListCreateView(APIView):
 
 
 class OrderCreateView(APIView):
+    @idempotent('order-create')
     def post(self, request):
         data = request.data.copy()
         data['transaction_id'] = ""
@@ -263,7 +293,17 @@ class OrderCreateView(APIView):
         data['customer_phone'] = normalize_phone(data.get('customer_phone', ''))
         serializer = OrderSerializer(data=data)
         if serializer.is_valid():
-            order = serializer.save()
+            items = [(item['product'].id, item['quantity']) for item in serializer.validated_data['items']]
+            try:
+                # Order, items and stock decrements commit together or not at all.
+                with transaction.atomic():
+                    order = serializer.save()
+                    reserve_stock(order, items)
+            except InsufficientStock as e:
+                return Response(
+                    {"error": "Insufficient stock", "product_ids": e.product_ids},
+                    status=status.HTTP_409_CONFLICT,
+                )
             return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -291,14 +331,20 @@ class OrderByPhoneView(APIView):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class AllOrdersView(APIView):
+class AllOrdersView(FastJSONMixin, APIView):
+    use_replica = True
+    throttle_classes = [ListThrottle]
+    expensive = True
     def get(self, request):
         orders = Order.objects.all().order_by('-created_at')
+        if fastjson.is_enabled():
+            return Response(fast_order_list(orders), status=status.HTTP_200_OK)
         serializer = OrderSerializer(orders, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
 class OrdersByDateView(APIView):
+    use_replica = True
     def get(self, request):
         date_str = request.GET.get('date')
         if not date_str:
@@ -311,9 +357,124 @@ class OrdersByDateView(APIView):
             return Response({"error": "Invalid date format. Use YYYY-MM-DD."},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        orders = Order.objects.filter(created_at__date=date).order_by('-created_at')
-        if not orders.exists():
+        # Half-open bounds on created_at instead of created_at__date, so the index applies.
+        params = {'date_from': date, 'date_to': date}
+        orders = search_orders(params)
+        if searches_archive(params):
+            data = order_data(load_page(list(orders)))
+        else:
+            data = OrderSerializer(orders, many=True).data
+        if not data:
             return Response({"message": "No orders found for the specified date."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(data, status=status.HTTP_200_OK)
 
-        serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+
+class OrderSearchPagination(PageNumberPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+class OrderSearchView(APIView):
+    """
+    Admin order search: ``date_from``/``date_to`` (YYYY-MM-DD, inclusive),
+    ``is_paid``, ``payment_method``, ``phone``, ``min_amount``/``max_amount``,
+    paginated newest first. See orders/search.py.
+    """
+    permission_classes = [IsAuthenticated, IsAdminUserOnly]
+    use_replica = True
+
+    def get(self, request):
+        params = OrderSearchParamsSerializer(data=request.query_params)
+        if not params.is_valid():
+            return Response(params.errors, status=status.HTTP_400_BAD_REQUEST)
+        paginator = OrderSearchPagination()
+        page = paginator.paginate_queryset(search_orders(params.validated_data), request, view=self)
+        if searches_archive(params.validated_data):
+            data = order_data(load_page(page))
+        else:
+            data = OrderSerializer(page, many=True).data
+        return paginator.get_paginated_response(data)
+
+
+class OrderBulkUpdateView(APIView):
+    """
+    Apply partial updates to many orders in one transaction.
+
+    Body: a list (or ``{"updates": [...]}``) of ``{"id": ..., <fields>}``.
+    Orders are locked and fetched once for the batch, and each is written
+    with only the fields its items set (karen/bulk.py).
+    """
+    permission_classes = [IsAuthenticated, IsAdminUserOnly]
+
+    def patch(self, request):
+        items, error = bulk_items(request.data)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = [None] * len(items)
+        valid = []
+        for index, item in enumerate(items):
+            serializer = OrderBulkUpdateItemSerializer(data=item)
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                results[index] = {"id": item.get('id') if isinstance(item, dict) else None,
+                                  "status": "invalid", "errors": serializer.errors}
+
+        changed = {}
+        with transaction.atomic():
+            orders = {
+                order.id: order
+                for order in Order.objects.select_for_update().filter(id__in=[data['id'] for _, data in valid])
+                .order_by('id')
+            }
+            for index, data in valid:
+                order = orders.get(data['id'])
+                if order is None:
+                    results[index] = {"id": data['id'], "status": "not_found"}
+                    continue
+                _, fields = changed.setdefault(order.id, (order, set()))
+                for field, value in data.items():
+                    if field == 'id':
+                        continue
+                    if field == 'customer_phone' and value:
+                        value = normalize_phone(value)
+                    setattr(order, field, value)
+                    fields.add(field)
+                results[index] = {"id": order.id, "status": "updated"}
+
+            changed = {pk: entry for pk, entry in changed.items() if entry[1]}
+            bulk_update_changed(Order, changed)
+
+        if changed:
+            analytics.bump_version()
+            mark_stale_for_orders([order for order, _ in changed.values()])
+
+        return Response({"updated": len(changed), "results": results}, status=status.HTTP_200_OK)
+
+    post = patch
+
+
+class OrderBulkDeleteView(APIView):
+    """Delete many orders (and their items) by id, returning held stock. Body: ``{"ids": [...]}``."""
+    permission_classes = [IsAuthenticated, IsAdminUserOnly]
+
+    def post(self, request):
+        serializer = BulkIdsSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        ids = serializer.validated_data['ids']
+        with transaction.atomic():
+            orders = Order.objects.filter(id__in=ids)
+            existing = set(orders.values_list('id', flat=True))
+            # The reservations cascade away with the orders; give their held stock back first.
+            release_order_reservations(list(existing))
+            orders.delete()
+        analytics.bump_version()
+
+        results = [{"id": pk, "status": "deleted" if pk in existing else "not_found"} for pk in ids]
+        return Response({"deleted": len(existing), "results": results}, status=status.HTTP_200_OK)
+
+    delete = post
@@ -0,0 +1,408 @@
+"""
+Streaming catalog import/export.
+
+Rows are read one at a time from CSV or JSON (a JSON array or JSON Lines),
+validated, and written in batches with ``bulk_create(update_conflicts=True)``
+inside one transaction per batch. Products upsert on ``sku``; rows without a
+SKU update the product with their ``id`` when it exists (exports carry it,
+so an export/import round trip updates rather than duplicates) and are
+inserted otherwise. Categories upsert on ``slug``. Category slugs are
+resolved through a single ``{slug: id}`` map loaded up front.
+"""
+import codecs
+import csv
+import io
+import json
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection, transaction
+from django.utils.text import slugify
+
+from . import cache as catalog
+from .models import Category, Product
+from .signals import prices_changed
+
+PRODUCT_FIELDS = ['sku', 'name', 'description', 'long_description', 'price', 'unit', 'category']
+CATEGORY_FIELDS = ['slug', 'name']
+MAX_ERRORS = 100
+MAX_PRICE = Decimal('1e8')  # Product.price is max_digits=10, decimal_places=2
+# Checked per row: on PostgreSQL an over-long value fails the whole batch.
+PRODUCT_MAX_LENGTHS = {name: Product._meta.get_field(name).max_length for name in ('sku', 'name', 'unit')}
+CATEGORY_MAX_LENGTHS = {name: Category._meta.get_field(name).max_length for name in ('slug', 'name')}
+
+
+@dataclass
+class ImportReport:
+    rows: int = 0
+    imported: int = 0  # distinct records written
+    superseded: int = 0  # valid rows overridden by a later row for the same record
+    failed: int = 0
+    categories_created: int = 0
+    errors: list = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def rows_per_sec(self):
+        return round(self.rows / self.elapsed, 1) if self.elapsed else None
+
+    def add_error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({'line': line, 'error': message})
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'imported': self.imported,
+            'superseded': self.superseded,
+            'categories_created': self.categories_created,
+            'failed': self.failed,
+            'errors': self.errors,
+            'elapsed_s': round(self.elapsed, 3),
+            'rows_per_sec': self.rows_per_sec,
+        }
+
+
+@dataclass
+class UnreadableRow:
+    """Stands in for a line that could not be decoded or parsed; importers report it."""
+    error: str
+
+
+def _decoded_lines(stream):
+    """
+    Yield ``(line_number, text)`` from a binary (or text) stream, decoding
+    each line on its own; ``text`` is None for a line that is not UTF-8.
+    """
+    for line_number, line in enumerate(stream, start=1):
+        if isinstance(line, bytes):
+            if line_number == 1 and line.startswith(codecs.BOM_UTF8):
+                line = line[len(codecs.BOM_UTF8):]
+            try:
+                line = line.decode('utf-8')
+            except UnicodeDecodeError:
+                line = None
+        yield line_number, line
+
+
+def _json_row(line_number, row):
+    if not isinstance(row, dict):
+        return line_number, UnreadableRow("expected a JSON object")
+    return line_number, row
+
+
+def read_rows(stream, file_format):
+    """
+    Yield ``(line_number, row)`` from a binary or text stream.
+
+    ``file_format`` is ``csv`` or ``json``. JSON may be a top-level array
+    (loaded in one go) or JSON Lines (streamed line by line). A line that is
+    not UTF-8, not valid JSON or not an object yields an ``UnreadableRow`` in
+    place of its dict, so the import reports it and carries on rather than
+    stopping after earlier batches have been committed.
+    """
+    if file_format not in ('csv', 'json'):
+        raise ValueError(f"Unsupported format: {file_format}")
+    lines = _decoded_lines(stream)
+
+    if file_format == 'csv':
+        bad_lines = []
+
+        def texts():
+            for line_number, text in lines:
+                if text is None:
+                    bad_lines.append(line_number)
+                    text = '\ufffd\n'  # a placeholder record, so the bad line keeps its own row
+                yield text
+
+        reader = csv.DictReader(texts())
+        previous = 1
+        try:
+            for row in reader:
+                # A record may span several physical lines; reject it if any of them was undecodable.
+                if bad_lines and bad_lines[-1] > previous:
+                    yield reader.line_num, UnreadableRow("not valid UTF-8")
+                else:
+                    yield reader.line_num, row
+                previous = reader.line_num
+        except csv.Error as e:
+            yield reader.line_num, UnreadableRow(f"invalid CSV: {e}")
+        return
+
+    first = True
+    for line_number, text in lines:
+        if text is None:
+            yield line_number, UnreadableRow("not valid UTF-8")
+            first = False
+            continue
+        if not text.strip():
+            continue
+        if first and text.lstrip().startswith('['):
+            # A JSON array is parsed whole, before anything is written.
+            rest = [(n, t) for n, t in lines]
+            undecodable = [n for n, t in rest if t is None]
+            if undecodable:
+                yield undecodable[0], UnreadableRow("not valid UTF-8")
+                return
+            try:
+                rows = json.loads(text + ''.join(t for _, t in rest))
+            except ValueError as e:
+                yield line_number, UnreadableRow(f"invalid JSON: {e}")
+                return
+            if not isinstance(rows, list):
+                yield line_number, UnreadableRow("expected a JSON array")
+                return
+            for index, row in enumerate(rows, start=1):
+                yield _json_row(index, row)
+            return
+        first = False
+        try:
+            row = json.loads(text)
+        except ValueError as e:
+            yield line_number, UnreadableRow(f"invalid JSON: {e}")
+            continue
+        yield _json_row(line_number, row)
+
+
+def _batches(rows, size):
+    batch = []
+    for item in rows:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _upsert_kwargs(unique_fields, update_fields):
+    kwargs = {'update_conflicts': True, 'update_fields': update_fields}
+    # MySQL's ON DUPLICATE KEY UPDATE takes no conflict target.
+    if connection.features.supports_update_conflicts_with_target:
+        kwargs['unique_fields'] = unique_fields
+    return kwargs
+
+
+def _clean(value):
+    return value.strip() if isinstance(value, str) else value
+
+
+def _too_long(values, max_lengths):
+    """An error message for the first value over its column's max_length, or None."""
+    for name, value in values.items():
+        if value and len(str(value)) > max_lengths[name]:
+            return f"{name} is longer than {max_lengths[name]} characters"
+    return None
+
+
+def import_categories(rows, batch_size=500):
+    report = ImportReport()
+    start = time.perf_counter()
+    written = set()
+    for batch in _batches(rows, batch_size):
+        objs = {}
+        for line, row in batch:
+            report.rows += 1
+            if isinstance(row, UnreadableRow):
+                report.add_error(line, row.error)
+                continue
+            slug = _clean(row.get('slug')) or slugify(_clean(row.get('name')) or '')
+            name = _clean(row.get('name'))
+            if not slug or not name:
+                report.add_error(line, "name and slug are required")
+                continue
+            error = _too_long({'slug': slug, 'name': name}, CATEGORY_MAX_LENGTHS)
+            if error:
+                report.add_error(line, error)
+                continue
+            if slug in objs:
+                report.superseded += 1
+            objs[slug] = Category(slug=slug, name=name)  # last row for a slug wins
+        with transaction.atomic():
+            Category.objects.bulk_create(list(objs.values()), **_upsert_kwargs(['slug'], ['name']))
+        report.superseded += len(written & objs.keys())
+        written.update(objs)
+    report.imported = len(written)
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def _ensure_categories(names_by_slug, category_ids, report):
+    """Create categories for unknown slugs and add them to ``category_ids``."""
+    missing = [slug for slug in names_by_slug if slug not in category_ids]
+    if not missing:
+        return
+    Category.objects.bulk_create(
+        [Category(slug=slug, name=names_by_slug[slug] or slug.replace('-', ' ').title()) for slug in missing],
+        ignore_conflicts=True,
+    )
+    for category_id, slug in Category.objects.filter(slug__in=missing).values_list('id', 'slug'):
+        category_ids[slug] = category_id
+    report.categories_created += len(missing)
+
+
+def import_products(rows, batch_size=500, create_categories=True):
+    """
+    Upsert products from ``(line, row)`` pairs. Returns an ``ImportReport``.
+
+    ``row['category']`` is a category slug. Unknown slugs are created (named
+    after ``row['category_name']`` when present) unless ``create_categories``
+    is False, in which case the row is rejected. Rows are matched to existing
+    products by ``sku``, else by ``id``; a record written by several rows
+    counts once in ``imported`` and the earlier rows as ``superseded``.
+    """
+    report = ImportReport()
+    start = time.perf_counter()
+    category_ids = dict(Category.objects.values_list('slug', 'id'))
+    update_fields = ['name', 'description', 'long_description', 'price', 'unit', 'category']
+    written = set()  # ('sku', sku) / ('id', id) of records already written
+    inserted = 0
+
+    for batch in _batches(rows, batch_size):
+        cleaned = []
+        new_categories = {}
+        for line, row in batch:
+            report.rows += 1
+            if isinstance(row, UnreadableRow):
+                report.add_error(line, row.error)
+                continue
+            name = _clean(row.get('name'))
+            slug = _clean(row.get('category'))
+            unit = _clean(row.get('unit'))
+            sku = _clean(row.get('sku')) or None
+            if not name or not slug or not unit:
+                report.add_error(line, "name, unit and category are required")
+                continue
+            error = _too_long({'sku': sku, 'name': name, 'unit': unit}, PRODUCT_MAX_LENGTHS)
+            if error:
+                report.add_error(line, error)
+                continue
+            product_id = _clean(row.get('id'))
+            if product_id in ('', None):
+                product_id = None
+            else:
+                try:
+                    product_id = int(product_id)
+                except (TypeError, ValueError):
+                    report.add_error(line, f"invalid id: {row.get('id')!r}")
+                    continue
+            try:
+                price = Decimal(str(_clean(row.get('price'))))
+            except (InvalidOperation, TypeError, ValueError):
+                report.add_error(line, f"invalid price: {row.get('price')!r}")
+                continue
+            if not price.is_finite() or price < 0 or price >= MAX_PRICE:
+                report.add_error(line, f"invalid price: {row.get('price')!r}")
+                continue
+            price = price.quantize(Decimal('0.01'))
+            if slug not in category_ids:
+                if not create_categories:
+                    report.add_error(line, f"unknown category: {slug}")
+                    continue
+                category_name = _clean(row.get('category_name'))
+                error = _too_long({'slug': slug, 'name': category_name}, CATEGORY_MAX_LENGTHS)
+                if error:
+                    report.add_error(line, f"category {error}")
+                    continue
+                new_categories.setdefault(slug, category_name)
+            cleaned.append((line, row, name, slug, unit, price, sku, product_id))
+
+        with transaction.atomic():
+            _ensure_categories(new_categories, category_ids, report)
+
+            by_sku, by_id, inserts = {}, {}, []
+            for line, row, name, slug, unit, price, sku, product_id in cleaned:
+                product = Product(
+                    sku=sku,
+                    name=name,
+                    description=_clean(row.get('description')) or '',
+                    long_description=_clean(row.get('long_description')) or '',
+                    price=price,
+                    unit=unit,
+                    category_id=category_ids[slug],
+                )
+                # One upsert may not touch the same row twice; keep the last.
+                if sku:
+                    report.superseded += sku in by_sku
+                    by_sku[sku] = product
+                elif product_id is not None:
+                    report.superseded += product_id in by_id
+                    by_id[product_id] = product
+                else:
+                    inserts.append(product)
+
+            updates = []
+            if by_id:
+                existing = set(Product.objects.filter(id__in=by_id).values_list('id', flat=True))
+                for product_id, product in by_id.items():
+                    if product_id in existing:
+                        product.id = product_id
+                        updates.append(product)
+                    else:
+                        inserts.append(product)
+
+            if by_sku:
+                Product.objects.bulk_create(list(by_sku.values()), **_upsert_kwargs(['sku'], update_fields))
+            if updates:
+                Product.objects.bulk_update(updates, update_fields)
+            if inserts:
+                Product.objects.bulk_create(inserts)
+
+        keys = {('sku', sku) for sku in by_sku} | {('id', product.id) for product in updates}
+        report.superseded += len(written & keys)
+        written.update(keys)
+        inserted += len(inserts)
+
+    report.imported = len(written) + inserted
+    if report.imported:
+        from .summary import refresh_summaries  # summary imports this module
+
+        # bulk_create sends no post_save, and upserts do not report which rows they touched.
+        catalog.invalidate_all()
+        transaction.on_commit(lambda: prices_changed.send(sender=Product))
+        refresh_summaries()
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+EXPORT_COLUMNS = ['id'] + PRODUCT_FIELDS + ['category_name']
+
+
+def export_products(file_format, chunk_size=2000):
+    """Yield the catalog as CSV or JSON Lines text chunks, streaming from the DB."""
+    rows = (
+        Product.objects
+        .order_by('id')
+        .values_list('id', 'sku', 'name', 'description', 'long_description', 'price', 'unit',
+                     'category__slug', 'category__name')
+        .iterator(chunk_size=chunk_size)
+    )
+
+    if file_format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        for index, row in enumerate(rows, start=1):
+            writer.writerow(['' if value is None else value for value in row])
+            if index % chunk_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+        return
+
+    if file_format != 'json':
+        raise ValueError(f"Unsupported format: {file_format}")
+
+    lines = []
+    for row in rows:
+        record = dict(zip(EXPORT_COLUMNS, row))
+        record['price'] = str(record['price'])
+        lines.append(json.dumps(record, ensure_ascii=False))
+        if len(lines) >= chunk_size:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
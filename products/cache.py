@@ -0,0 +1,78 @@
+"""
+Catalog cache for storefront product lookups.
+
+Each product's frontend row (``ProductFrontendSerializer`` fields, with the
+image as its storage name rather than a URL) is cached under its own key, so
+a cart of any size is one ``get_many`` and, for the misses, one ``id__in``
+query. Saving or deleting a product evicts its key once the transaction
+commits, with one ``delete_many`` per transaction however many rows a
+queryset ``delete()`` removed. Bulk update evicts the ids it wrote. Imports
+cannot tell which rows their upserts touched, so they bump the catalog
+version carried in every key, which drops all entries at once.
+
+Like orders/analytics.py this relies on the shared cache configured in
+settings, so an eviction on one worker is seen by all of them.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from karen.commit import CommitBatch
+
+from .models import Product
+
+FIELDS = ['id', 'name', 'description', 'long_description', 'image']
+VERSION_KEY = 'products:catalog:version'
+MISSING = 'missing'  # cached for ids with no product, so dead cart entries stay cheap
+
+
+def get_version():
+    return cache.get_or_set(VERSION_KEY, 1, timeout=None)
+
+
+def bump_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 2, timeout=None)
+
+
+def _key(version, product_id):
+    return f'products:catalog:{version}:{product_id}'
+
+
+def get_products(ids):
+    """``{id: row}`` for the products in ``ids`` that exist; missing ids are absent."""
+    version = get_version()
+    keys = {_key(version, pk): pk for pk in ids}
+    rows = {keys[key]: row for key, row in cache.get_many(list(keys)).items()}
+    missing = [pk for pk in keys.values() if pk not in rows]
+    if missing:
+        fetched = {row['id']: row for row in Product.objects.filter(id__in=missing).values(*FIELDS)}
+        cache.set_many(
+            {_key(version, pk): fetched.get(pk, MISSING) for pk in missing},
+            timeout=getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300),
+        )
+        rows.update(fetched)
+    return {pk: row for pk, row in rows.items() if row != MISSING}
+
+
+def evict(ids):
+    version = get_version()
+    cache.delete_many([_key(version, pk) for pk in ids])
+
+
+def invalidate_all():
+    """Drop every cached row once the current transaction commits (for bulk writes)."""
+    transaction.on_commit(bump_version)
+
+
+evict_on_commit = CommitBatch(evict)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed(sender, instance, **kwargs):
+    evict_on_commit.add([instance.pk])
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from products.bulk import export_products
+
+
+class Command(BaseCommand):
+    help = "Stream the product catalog to stdout or a file as CSV or JSON Lines."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', dest='file_format', choices=['csv', 'json'], default='csv')
+        parser.add_argument('--output', help="File to write; defaults to stdout.")
+
+    def handle(self, *args, **options):
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as fh:
+                for chunk in export_products(options['file_format']):
+                    fh.write(chunk)
+        else:
+            for chunk in export_products(options['file_format']):
+                self.stdout.write(chunk, ending='')
@@ -0,0 +1,43 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.bulk import import_categories, import_products, read_rows
+
+
+class Command(BaseCommand):
+    help = "Stream products (or categories, with --categories) from a CSV or JSON file into the catalog."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', dest='file_format', choices=['csv', 'json'],
+                            help="Defaults to the file extension.")
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--categories', action='store_true', help="The file contains categories (slug, name).")
+        parser.add_argument('--no-create-categories', action='store_true',
+                            help="Reject products whose category slug does not exist.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['file_format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        if file_format in ('jsonl', 'ndjson'):
+            file_format = 'json'
+        if file_format not in ('csv', 'json'):
+            raise CommandError("Cannot tell the file format; pass --format csv|json")
+
+        try:
+            with open(path, 'rb') as stream:
+                rows = read_rows(stream, file_format)
+                if options['categories']:
+                    report = import_categories(rows, batch_size=options['batch_size'])
+                else:
+                    report = import_products(
+                        rows,
+                        batch_size=options['batch_size'],
+                        create_categories=not options['no_create_categories'],
+                    )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(json.dumps(report.as_dict(), indent=2))
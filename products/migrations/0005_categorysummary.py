@@ -0,0 +1,42 @@
+# Generated by Django 4.2.1 on 2026-10-19 21:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_summaries(apps, schema_editor):
+    Category = apps.get_model('products', 'Category')
+    CategorySummary = apps.get_model('products', 'CategorySummary')
+    Product = apps.get_model('products', 'Product')
+    stats = {
+        row.pop('category_id'): row
+        for row in Product.objects.values('category_id').annotate(
+            product_count=models.Count('id'), min_price=models.Min('price'), max_price=models.Max('price'),
+        ).order_by()
+    }
+    CategorySummary.objects.bulk_create(
+        [CategorySummary(category_id=pk, **stats.get(pk, {})) for pk in Category.objects.values_list('id', flat=True)],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_product_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategorySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_count', models.PositiveIntegerField(default=0)),
+                ('min_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('max_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='summary', to='products.category')),
+            ],
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
@@ -8,6 +8,8 @@ class Category(models.Model):
         return self.name
 
 class Product(models.Model):
+    # Optional stock-keeping code; bulk imports upsert on it.
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)
     name = models.CharField(max_length=200)
     description = models.TextField()
     long_description = models.TextField(blank=True)
@@ -15,6 +17,23 @@ class Product(models.Model):
     unit = models.CharField(max_length=20)
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='products')
     image = models.ImageField(upload_to='product_images/', blank=True, null=True)
+    # Units available to sell. NULL means stock is not tracked for this product.
+    stock = models.PositiveIntegerField(null=True, blank=True)
 
     def __str__(self):
         return self.name
+
+
+class CategorySummary(models.Model):
+    """
+    Product count and price range of a category, denormalized for the
+    storefront menu. Kept current by products/summary.py.
+    """
+    category = models.OneToOneField(Category, on_delete=models.CASCADE, related_name='summary')
+    product_count = models.PositiveIntegerField(default=0)
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    max_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.category}: {self.product_count} products"
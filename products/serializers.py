@@ -1,6 +1,9 @@
 from rest_framework import serializers
+from karen.fastjson import values_rows
 from .models import Product, Category
 
+MAX_BATCH_IDS = 100
+
 class ProductFrontendSerializer(serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
 
@@ -15,11 +18,54 @@ class ProductFrontendSerializer(serializers.ModelSerializer):
         return None
 
 
+def frontend_rows(rows, request):
+    """Turn ``image`` storage names in ``rows`` into absolute URLs, as ``ProductFrontendSerializer`` does."""
+    storage = Product._meta.get_field('image').storage
+    return [
+        {**row, 'image': request.build_absolute_uri(storage.url(row['image'])) if row['image'] else None}
+        for row in rows
+    ]
+
+
+def fast_product_frontend_list(products, request):
+    """``ProductFrontendSerializer(products, many=True).data`` from one ``values_list`` query."""
+    return frontend_rows(values_rows(products, ['id', 'name', 'description', 'long_description', 'image']), request)
+
+
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = ['id', 'name', 'slug']
 
+class CategoryStatsSerializer(CategorySerializer):
+    """``CategorySerializer`` plus product count and price range from ``CategorySummary``."""
+    product_count = serializers.SerializerMethodField()
+    min_price = serializers.SerializerMethodField()
+    max_price = serializers.SerializerMethodField()
+
+    class Meta(CategorySerializer.Meta):
+        fields = CategorySerializer.Meta.fields + ['product_count', 'min_price', 'max_price']
+
+    def _summary(self, obj):
+        # Categories that never had a product have no summary row.
+        return getattr(obj, 'summary', None)
+
+    def get_product_count(self, obj):
+        summary = self._summary(obj)
+        return summary.product_count if summary else 0
+
+    def get_min_price(self, obj):
+        summary = self._summary(obj)
+        return self._price(summary.min_price if summary else None)
+
+    def get_max_price(self, obj):
+        summary = self._summary(obj)
+        return self._price(summary.max_price if summary else None)
+
+    def _price(self, value):
+        return None if value is None else serializers.DecimalField(max_digits=10, decimal_places=2).to_representation(value)
+
+
 class ProductSerializer(serializers.ModelSerializer):
     # Read: nested category object
     category_detail = CategorySerializer(source='category', read_only=True)
@@ -38,3 +84,42 @@ class ProductSerializer(serializers.ModelSerializer):
             'category_detail', # for read
             'image',
         ]
+
+
+class ProductAdminSerializer(ProductSerializer):
+    """``ProductSerializer`` plus inventory, for the admin-only endpoints."""
+
+    class Meta(ProductSerializer.Meta):
+        fields = ProductSerializer.Meta.fields + ['stock']
+
+
+class ProductBulkUpdateItemSerializer(serializers.Serializer):
+    """
+    One entry of a bulk update. Validates shapes only; the view resolves
+    ``id`` and ``category`` against rows it fetched once for the whole batch.
+    """
+    id = serializers.IntegerField()
+    name = serializers.CharField(max_length=200, required=False)
+    description = serializers.CharField(required=False)
+    long_description = serializers.CharField(required=False, allow_blank=True)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+    unit = serializers.CharField(max_length=20, required=False)
+    category = serializers.IntegerField(required=False)
+    stock = serializers.IntegerField(min_value=0, required=False, allow_null=True)
+
+
+class ProductBatchIdsSerializer(serializers.Serializer):
+    """``?ids=3,1,2`` for the batch lookup; order is kept and duplicates dropped."""
+    ids = serializers.CharField()
+
+    def validate_ids(self, value):
+        try:
+            ids = [int(part) for part in value.split(',') if part.strip()]
+        except ValueError:
+            raise serializers.ValidationError("ids must be a comma-separated list of integers.")
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            raise serializers.ValidationError("Send at least one id.")
+        if len(ids) > MAX_BATCH_IDS:
+            raise serializers.ValidationError(f"At most {MAX_BATCH_IDS} ids per request.")
+        return ids
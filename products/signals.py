@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Sent after a bulk write that skips post_save (bulk update, import) has
+# changed product prices and committed. No arguments.
+prices_changed = Signal()
@@ -0,0 +1,71 @@
+"""
+Denormalized per-category product counts and price ranges.
+
+``refresh_summaries`` recomputes ``CategorySummary`` rows for some (or all)
+categories with one grouped aggregate over ``Product`` and writes them with
+a single upsert. Product saves and deletes collect the categories they
+touch, including the old category when a product moves, and refresh them
+all at once when the transaction commits (karen/commit.py). Writes that
+skip signals (bulk update, imports) call it directly.
+"""
+from django.db.models import Count, Max, Min
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from karen.commit import CommitBatch
+
+from .bulk import _upsert_kwargs
+from .models import Category, CategorySummary, Product
+
+SUMMARY_FIELDS = ['product_count', 'min_price', 'max_price', 'updated_at']
+
+
+def category_stats(products):
+    """``{category_id: {'product_count', 'min_price', 'max_price'}}`` in one grouped query."""
+    rows = (
+        products.values('category_id')
+        .annotate(product_count=Count('id'), min_price=Min('price'), max_price=Max('price'))
+        .order_by()
+    )
+    return {row.pop('category_id'): row for row in rows}
+
+
+def refresh_summaries(category_ids=None):
+    """Recompute the summaries of ``category_ids`` (every category when None)."""
+    products = Product.objects.all()
+    categories = Category.objects.all()
+    if category_ids is not None:
+        category_ids = {pk for pk in category_ids if pk is not None}
+        if not category_ids:
+            return
+        products = products.filter(category_id__in=category_ids)
+        categories = categories.filter(id__in=category_ids)
+
+    stats = category_stats(products)
+    empty = {'product_count': 0, 'min_price': None, 'max_price': None}
+    # Deleted categories drop out here; their summary went with them.
+    summaries = [
+        CategorySummary(category_id=pk, **stats.get(pk, empty))
+        for pk in categories.values_list('id', flat=True)
+    ]
+    if summaries:
+        CategorySummary.objects.bulk_create(summaries, **_upsert_kwargs(['category'], SUMMARY_FIELDS))
+
+
+# One refresh per transaction, covering every category its product writes touched.
+refresh_on_commit = CommitBatch(refresh_summaries)
+
+
+@receiver(pre_save, sender=Product)
+def remember_category(sender, instance, update_fields=None, **kwargs):
+    instance._previous_category_id = None
+    if instance.pk is not None and (update_fields is None or 'category' in update_fields):
+        instance._previous_category_id = (
+            Product.objects.filter(pk=instance.pk).values_list('category_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed(sender, instance, **kwargs):
+    refresh_on_commit.add({instance.category_id, getattr(instance, '_previous_category_id', None)})
@@ -1,3 +1,248 @@
-from django.test import TestCase
+import io
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from .bulk import export_products, import_products, read_rows
+from .models import Category, CategorySummary, Product
+from .serializers import MAX_BATCH_IDS
+
+
+def make_product(category, price, **kwargs):
+    return Product.objects.create(
+        name=kwargs.pop('name', 'Tomatoes'), description='Fresh', price=Decimal(price), unit='kg',
+        category=category, **kwargs,
+    )
+
+
+class CategorySummaryTests(TestCase):
+    """CategorySummary stays in step with product writes (products/summary.py)."""
+
+    def setUp(self):
+        self.veg = Category.objects.create(name='Vegetables', slug='vegetables')
+        self.fruit = Category.objects.create(name='Fruit', slug='fruit')
+        self.admin = APIClient()
+        self.admin.force_authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+
+    def summary(self, category):
+        summary = CategorySummary.objects.get(category=category)
+        return summary.product_count, summary.min_price, summary.max_price
+
+    def test_with_stats_lists_counts_and_price_ranges(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_product(self.veg, '50.00')
+            make_product(self.veg, '120.50')
+        empty = Category.objects.create(name='Empty', slug='empty')
+
+        with self.assertNumQueries(1):
+            response = APIClient().get(reverse('category-list'), {'with_stats': 1})
+        self.assertEqual(response.status_code, 200)
+        rows = {row['slug']: row for row in response.data}
+        self.assertEqual(rows['vegetables']['product_count'], 2)
+        self.assertEqual(rows['vegetables']['min_price'], '50.00')
+        self.assertEqual(rows['vegetables']['max_price'], '120.50')
+        self.assertEqual(rows[empty.slug]['product_count'], 0)
+        self.assertIsNone(rows[empty.slug]['min_price'])
+
+        plain = APIClient().get(reverse('category-list'))
+        self.assertNotIn('product_count', plain.data[0])
+
+    def test_moving_a_product_refreshes_both_categories(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            cheap = make_product(self.veg, '10.00')
+            make_product(self.veg, '90.00')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.admin.put(reverse('product-detail', args=[cheap.id]), {
+                'name': 'Mango', 'description': 'Ripe', 'price': '30.00', 'unit': 'kg', 'category': self.fruit.id,
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.summary(self.veg), (1, Decimal('90.00'), Decimal('90.00')))
+        self.assertEqual(self.summary(self.fruit), (1, Decimal('30.00'), Decimal('30.00')))
+
+    def test_bulk_update_move_refreshes_both_categories(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = make_product(self.veg, '10.00')
+        response = self.admin.patch(reverse('product-bulk-update'), [
+            {'id': product.id, 'category': self.fruit.id, 'price': '12.00'},
+        ], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.summary(self.veg), (0, None, None))
+        self.assertEqual(self.summary(self.fruit), (1, Decimal('12.00'), Decimal('12.00')))
+
+    def test_bulk_delete_refreshes_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            products = [make_product(self.veg, f'{price}.00') for price in range(1, 51)]
+            kept = make_product(self.veg, '99.00')
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = self.admin.post(reverse('product-bulk-delete'), {'ids': [p.id for p in products]}, format='json')
+        self.assertEqual(response.data['deleted'], 50)
+        self.assertEqual(self.summary(self.veg), (1, kept.price, kept.price))
+
+        # The collected work runs in the first callback; the rest find nothing pending.
+        with self.assertNumQueries(0):
+            for callback in callbacks:
+                callback()
+
+
+class CategorySummaryBackfillTests(TransactionTestCase):
+    """Migration 0005 creates a summary for every existing category."""
+
+    migrate_from = [('products', '0004_product_stock')]
+    migrate_to = [('products', '0005_categorysummary')]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_backfill(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_from)
+        apps = executor.loader.project_state(self.migrate_from).apps
+        OldCategory = apps.get_model('products', 'Category')
+        OldProduct = apps.get_model('products', 'Product')
+        veg = OldCategory.objects.create(name='Vegetables', slug='vegetables')
+        empty = OldCategory.objects.create(name='Empty', slug='empty')
+        for price in ('15.00', '40.00', '25.00'):
+            OldProduct.objects.create(name='Kale', description='', price=Decimal(price), unit='kg', category=veg)
+
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(self.migrate_to)
+
+        summaries = {s.category_id: s for s in CategorySummary.objects.all()}
+        self.assertEqual(
+            (summaries[veg.id].product_count, summaries[veg.id].min_price, summaries[veg.id].max_price),
+            (3, Decimal('15.00'), Decimal('40.00')),
+        )
+        self.assertEqual(summaries[empty.id].product_count, 0)
+        self.assertIsNone(summaries[empty.id].max_price)
+
+
+class ProductImportTests(TestCase):
+    def setUp(self):
+        self.veg = Category.objects.create(name='Vegetables', slug='vegetables')
+        self.admin = APIClient()
+        self.admin.force_authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+
+    def test_export_import_round_trip_updates_in_place(self):
+        make_product(self.veg, '10.00', name='Kale')
+        make_product(self.veg, '20.00', name='Spinach', sku='SPN-1')
+        for file_format in ('csv', 'json'):
+            text = ''.join(export_products(file_format))
+            report = import_products(read_rows(io.StringIO(text), file_format))
+            self.assertEqual((report.imported, report.failed), (2, 0))
+            self.assertEqual(Product.objects.count(), 2)
+
+    def test_rejects_values_longer_than_their_columns(self):
+        report = import_products([
+            (2, {'name': 'x' * 201, 'unit': 'kg', 'price': '1', 'category': 'vegetables'}),
+            (3, {'name': 'Kale', 'unit': 'u' * 21, 'price': '1', 'category': 'vegetables'}),
+            (4, {'sku': 's' * 65, 'name': 'Kale', 'unit': 'kg', 'price': '1', 'category': 'vegetables'}),
+            (5, {'name': 'Kale', 'unit': 'kg', 'price': '1', 'category': 'vegetables'}),
+        ])
+        self.assertEqual([error['line'] for error in report.errors], [2, 3, 4])
+        self.assertEqual((report.imported, report.failed), (1, 3))
+
+    def test_duplicate_skus_count_once(self):
+        rows = [(line, {'sku': 'KALE', 'name': f'Kale {line}', 'unit': 'kg', 'price': '1', 'category': 'vegetables'})
+                for line in range(2, 7)]
+        report = import_products(rows, batch_size=2)
+        self.assertEqual((report.imported, report.superseded), (1, 4))
+        self.assertEqual(Product.objects.get().name, 'Kale 6')
+
+    def upload(self, name, content, batch_size=1):
+        response = self.admin.post(reverse('product-import'), {
+            'file': SimpleUploadedFile(name, content), 'batch_size': batch_size,
+        }, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def jsonl(self, name):
+        return f'{{"name": "{name}", "unit": "kg", "price": "1", "category": "vegetables"}}\n'.encode()
+
+    def test_malformed_json_line_is_reported_and_the_rest_imported(self):
+        report = self.upload('p.jsonl', self.jsonl('Kale') + b'{"name": \n' + self.jsonl('Leek'))
+        self.assertEqual((report['imported'], report['failed']), (2, 1))
+        self.assertEqual(report['errors'][0]['line'], 2)
+        self.assertIn('invalid JSON', report['errors'][0]['error'])
+
+    def test_rows_that_are_not_objects_are_reported(self):
+        report = self.upload('p.jsonl', self.jsonl('Kale') + b'[1, 2]\n"x"\n')
+        self.assertEqual((report['imported'], report['failed']), (1, 2))
+        self.assertEqual([error['line'] for error in report['errors']], [2, 3])
+
+        report = self.upload('p.json', b'[{"name": "Leek", "unit": "kg", "price": "1", "category": "vegetables"}, 7]')
+        self.assertEqual((report['imported'], report['errors']), (1, [{'line': 2, 'error': 'expected a JSON object'}]))
+
+    def test_undecodable_lines_are_reported(self):
+        report = self.upload('p.jsonl', self.jsonl('Kale') + b'{"name": "\xff"}\n' + self.jsonl('Leek'))
+        self.assertEqual((report['imported'], report['errors']), (2, [{'line': 2, 'error': 'not valid UTF-8'}]))
+
+        csv_file = b'\xef\xbb\xbfname,unit,price,category\nOkra,kg,1,vegetables\nBad\xff,kg,1,vegetables\nYam,kg,2,vegetables\n'
+        report = self.upload('p.csv', csv_file)
+        self.assertEqual((report['imported'], report['errors']), (2, [{'line': 3, 'error': 'not valid UTF-8'}]))
+        self.assertEqual(Product.objects.filter(name__in=['Okra', 'Yam']).count(), 2)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ProductBatchTests(TestCase):
+    """The storefront batch lookup (products/cache.py)."""
+
+    def setUp(self):
+        cache.clear()
+        veg = Category.objects.create(name='Vegetables', slug='vegetables')
+        self.kale, self.spinach, self.onion = (
+            make_product(veg, '10.00', name=name) for name in ('Kale', 'Spinach', 'Onion')
+        )
+
+    def batch(self, ids):
+        return APIClient().get(reverse('product-frontend-batch'), {'ids': ids})
+
+    def test_keeps_request_order_and_lists_missing_ids(self):
+        response = self.batch(f'{self.onion.id},999,{self.kale.id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.data['products']], [self.onion.id, self.kale.id])
+        self.assertEqual(response.data['missing'], [999])
+
+    def test_duplicates_are_dropped(self):
+        response = self.batch(f'{self.spinach.id},{self.kale.id},{self.spinach.id}')
+        self.assertEqual([row['id'] for row in response.data['products']], [self.spinach.id, self.kale.id])
+
+    def test_rejects_more_than_the_cap(self):
+        self.assertEqual(self.batch(','.join(str(pk) for pk in range(1, MAX_BATCH_IDS + 1))).status_code, 200)
+        self.assertEqual(self.batch(','.join(str(pk) for pk in range(1, MAX_BATCH_IDS + 2))).status_code, 400)
+        self.assertEqual(self.batch('1,x').status_code, 400)
+
+    def test_second_lookup_is_served_from_the_cache(self):
+        ids = f'{self.kale.id},{self.spinach.id},999'
+        self.batch(ids)
+        with self.assertNumQueries(0):
+            response = self.batch(ids)
+        self.assertEqual(len(response.data['products']), 2)
+
+    def test_save_evicts_the_cached_row(self):
+        self.batch(str(self.kale.id))
+        self.kale.name = 'Curly kale'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.kale.save()
+        self.assertEqual(self.batch(str(self.kale.id)).data['products'][0]['name'], 'Curly kale')
+
+
+class ProductSerializerTests(TestCase):
+    def test_stock_is_only_shown_to_admins(self):
+        product = make_product(Category.objects.create(name='Fruit', slug='fruit'), '10.00', stock=4)
+        public = APIClient().get(reverse('product-list'))
+        self.assertNotIn('stock', public.data['results'][0])
+
+        admin = APIClient()
+        admin.force_authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        self.assertEqual(admin.get(reverse('product-detail', args=[product.id])).data['stock'], 4)
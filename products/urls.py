@@ -6,7 +6,13 @@ from .views import (
     ProductDetailView,
     CategoryCreateView,
     CategoryDetailView,
-    ProductFrontendListView
+    ProductFrontendListView,
+    ProductFrontendDetailView,
+    ProductBatchView,
+    ProductImportView,
+    ProductExportView,
+    ProductBulkUpdateView,
+    ProductBulkDeleteView,
 )
 
 urlpatterns = [
@@ -16,8 +22,13 @@ urlpatterns = [
     # Admin routes
     path('products/create/', ProductCreateView.as_view(), name='product-create'),
     path('products/<int:id>/', ProductDetailView.as_view(), name='product-detail'),
+    path('products/import/', ProductImportView.as_view(), name='product-import'),
+    path('products/export/', ProductExportView.as_view(), name='product-export'),
+    path('products/bulk-update/', ProductBulkUpdateView.as_view(), name='product-bulk-update'),
+    path('products/bulk-delete/', ProductBulkDeleteView.as_view(), name='product-bulk-delete'),
     path('categories/create/', CategoryCreateView.as_view(), name='category-create'), 
     path('categories/<int:id>/', CategoryDetailView.as_view(), name='category-detail'),
     path('frontend/products/', ProductFrontendListView.as_view(), name='frontend-product-list'),# ← New route
-    path('frontend/products/<int:id>/', ProductFrontendListView.as_view(), name='product-frontend-detail'),
+    path('frontend/products/batch/', ProductBatchView.as_view(), name='product-frontend-batch'),
+    path('frontend/products/<int:id>/', ProductFrontendDetailView.as_view(), name='product-frontend-detail'),
 ]
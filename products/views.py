@@ -2,30 +2,79 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from .models import Product, Category
-from .serializers import ProductSerializer, CategorySerializer, ProductFrontendSerializer
+from .serializers import (
+    ProductSerializer,
+    ProductAdminSerializer,
+    CategorySerializer,
+    CategoryStatsSerializer,
+    ProductFrontendSerializer,
+    ProductBulkUpdateItemSerializer,
+    fast_product_frontend_list,
+    frontend_rows,
+    ProductBatchIdsSerializer,
+)
 from django.shortcuts import get_object_or_404
 from rest_framework.permissions import IsAuthenticated
 from .permissions import IsAdminUserOnly
 from rest_framework.pagination import PageNumberPagination
 from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.db import transaction
+from . import cache as catalog
+from .signals import prices_changed
+from .summary import refresh_summaries
+from .bulk import export_products, import_categories, import_products, read_rows
+from karen import fastjson
+from karen.bulk import BulkIdsSerializer, bulk_items, bulk_update_changed
+from karen.fastjson import FastJSONMixin
+from karen.throttling import ListThrottle
 
 
 
 class ProductPagination(PageNumberPagination):
     page_size = 20
 
-class ProductFrontendListView(APIView):
-    def get(self, request, id=None):
-        if id is not None:
-            product = get_object_or_404(Product, id=id)
-            serializer = ProductFrontendSerializer(product, context={'request': request})
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        
+class ProductFrontendListView(FastJSONMixin, APIView):
+    throttle_classes = [ListThrottle]
+    expensive = True
+
+    def get(self, request):
         products = Product.objects.all()
+        if fastjson.is_enabled():
+            return Response(fast_product_frontend_list(products, request), status=status.HTTP_200_OK)
         serializer = ProductFrontendSerializer(products, many=True, context={'request': request})
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+class ProductFrontendDetailView(APIView):
+    """One storefront product. A single-row lookup, so not throttled or admission-controlled like the list."""
+
+    def get(self, request, id):
+        product = get_object_or_404(Product, id=id)
+        serializer = ProductFrontendSerializer(product, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class ProductBatchView(APIView):
+    """
+    Storefront multi-get for cart hydration: ``?ids=3,1,2``. Returns the
+    products in request order and the ids that do not exist, served from the
+    catalog cache (products/cache.py) with one ``id__in`` query for misses.
+    """
+
+    def get(self, request):
+        serializer = ProductBatchIdsSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        ids = serializer.validated_data['ids']
+        rows = catalog.get_products(ids)
+        return Response({
+            "products": frontend_rows([rows[pk] for pk in ids if pk in rows], request),
+            "missing": [pk for pk in ids if pk not in rows],
+        }, status=status.HTTP_200_OK)
+
+
 class CategoryDetailView(APIView):
     permission_classes = [IsAuthenticated, IsAdminUserOnly]
 
@@ -87,6 +136,10 @@ class ProductListView(APIView):
 class CategoryListView(APIView):
     def get(self, request):
         categories = Category.objects.all()
+        if request.GET.get('with_stats') in ('1', 'true'):
+            # Product count and price range from CategorySummary, joined in the same query.
+            serializer = CategoryStatsSerializer(categories.select_related('summary'), many=True)
+            return Response(serializer.data, status=status.HTTP_200_OK)
         serializer = CategorySerializer(categories, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -95,7 +148,7 @@ class ProductCreateView(APIView):
     permission_classes = [IsAuthenticated, IsAdminUserOnly]
 
     def post(self, request):
-        serializer = ProductSerializer(data=request.data)
+        serializer = ProductAdminSerializer(data=request.data)
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -105,9 +158,10 @@ class ProductCreateView(APIView):
 class ProductDetailView(APIView):
     permission_classes = [IsAuthenticated, IsAdminUserOnly]
 
-    def get_object(self, id):
+    def get_object(self, id, for_update=False):
+        products = Product.objects.select_for_update() if for_update else Product.objects
         try:
-            return Product.objects.get(id=id)
+            return products.get(id=id)
         except Product.DoesNotExist:
             return None
 
@@ -115,17 +169,19 @@ class ProductDetailView(APIView):
         product = self.get_object(id)
         if not product:
             return Response({"detail": "Not found"}, status=status.HTTP_404_NOT_FOUND)
-        serializer = ProductSerializer(product)
+        serializer = ProductAdminSerializer(product)
         return Response(serializer.data)
 
     def put(self, request, id):
-        product = self.get_object(id)
-        if not product:
-            return Response({"detail": "Not found"}, status=status.HTTP_404_NOT_FOUND)
-        serializer = ProductSerializer(product, data=request.data)
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data)
+        # Locked so the stock written back is not a value a concurrent checkout has since decremented.
+        with transaction.atomic():
+            product = self.get_object(id, for_update=True)
+            if not product:
+                return Response({"detail": "Not found"}, status=status.HTTP_404_NOT_FOUND)
+            serializer = ProductAdminSerializer(product, data=request.data)
+            if serializer.is_valid():
+                serializer.save()
+                return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def delete(self, request, id):
@@ -134,4 +190,146 @@ class ProductDetailView(APIView):
             return Response({"detail": "Not found"}, status=status.HTTP_404_NOT_FOUND)
         product.delete()
         return Response({"detail": "Deleted"}, status=status.HTTP_204_NO_CONTENT)
-    
\ No newline at end of file
+    
+
+class ProductImportView(APIView):
+    """
+    Bulk upsert products (or categories with ?kind=categories) from an uploaded
+    CSV or JSON file in the ``file`` field. Returns the import report.
+    """
+    permission_classes = [IsAuthenticated, IsAdminUserOnly]
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response({"error": "Upload a CSV or JSON file in the 'file' field."}, status=status.HTTP_400_BAD_REQUEST)
+
+        file_format = request.data.get('file_format') or upload.name.rsplit('.', 1)[-1].lower()
+        if file_format in ('jsonl', 'ndjson'):
+            file_format = 'json'
+        if file_format not in ('csv', 'json'):
+            return Response({"error": "file_format must be csv or json."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            batch_size = max(1, min(int(request.data.get('batch_size', 500)), 5000))
+        except (TypeError, ValueError):
+            return Response({"error": "batch_size must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Lines are decoded one at a time; unreadable ones are reported per line.
+        rows = read_rows(upload.file, file_format)
+        if request.query_params.get('kind') == 'categories':
+            report = import_categories(rows, batch_size=batch_size)
+        else:
+            report = import_products(rows, batch_size=batch_size)
+
+        return Response(report.as_dict(), status=status.HTTP_200_OK)
+
+
+class ProductExportView(APIView):
+    """Stream the catalog as CSV (default) or JSON Lines (?file_format=json)."""
+    permission_classes = [IsAuthenticated, IsAdminUserOnly]
+
+    def get(self, request):
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in ('csv', 'json'):
+            return Response({"error": "file_format must be csv or json."}, status=status.HTTP_400_BAD_REQUEST)
+
+        content_type = 'text/csv' if file_format == 'csv' else 'application/x-ndjson'
+        extension = 'csv' if file_format == 'csv' else 'jsonl'
+        response = StreamingHttpResponse(export_products(file_format), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="products.{extension}"'
+        return response
+
+
+class ProductBulkUpdateView(APIView):
+    """
+    Apply partial updates to many products in one transaction.
+
+    Body: a list (or ``{"updates": [...]}``) of ``{"id": ..., <fields>}``.
+    Products are locked and fetched once for the whole batch, referenced
+    categories once, and each product is written with only the fields its
+    items set (karen/bulk.py). Returns one result per item.
+    """
+    permission_classes = [IsAuthenticated, IsAdminUserOnly]
+
+    def patch(self, request):
+        items, error = bulk_items(request.data)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = [None] * len(items)
+        valid = []
+        for index, item in enumerate(items):
+            serializer = ProductBulkUpdateItemSerializer(data=item)
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                results[index] = {"id": item.get('id') if isinstance(item, dict) else None,
+                                  "status": "invalid", "errors": serializer.errors}
+
+        categories = Category.objects.in_bulk({data['category'] for _, data in valid if 'category' in data})
+
+        changed = {}
+        with transaction.atomic():
+            products = {
+                product.id: product
+                for product in Product.objects.select_for_update().filter(id__in=[data['id'] for _, data in valid])
+                .order_by('id')
+            }
+            previous_categories = {product.id: product.category_id for product in products.values()}
+            for index, data in valid:
+                product = products.get(data['id'])
+                if product is None:
+                    results[index] = {"id": data['id'], "status": "not_found"}
+                    continue
+                if 'category' in data and data['category'] not in categories:
+                    results[index] = {"id": data['id'], "status": "invalid",
+                                      "errors": {"category": [f"Invalid pk \"{data['category']}\" - object does not exist."]}}
+                    continue
+                _, fields = changed.setdefault(product.id, (product, set()))
+                for field, value in data.items():
+                    if field == 'id':
+                        continue
+                    if field == 'category':
+                        product.category = categories[value]
+                    else:
+                        setattr(product, field, value)
+                    fields.add(field)
+                results[index] = {"id": product.id, "status": "updated"}
+
+            changed = {pk: entry for pk, entry in changed.items() if entry[1]}
+            bulk_update_changed(Product, changed)
+
+        if changed:
+            # bulk_update sends no post_save.
+            catalog.evict(list(changed))
+            if any(fields & {'category', 'price'} for _, fields in changed.values()):
+                refresh_summaries({previous_categories[pk] for pk in changed}
+                                  | {product.category_id for product, _ in changed.values()})
+            if any('price' in fields for _, fields in changed.values()):
+                prices_changed.send(sender=Product)
+
+        return Response({"updated": len(changed), "results": results}, status=status.HTTP_200_OK)
+
+    post = patch
+
+
+class ProductBulkDeleteView(APIView):
+    """Delete many products by id in one query. Body: ``{"ids": [...]}``."""
+    permission_classes = [IsAuthenticated, IsAdminUserOnly]
+
+    def post(self, request):
+        serializer = BulkIdsSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        ids = serializer.validated_data['ids']
+        with transaction.atomic():
+            products = Product.objects.filter(id__in=ids)
+            existing = set(products.values_list('id', flat=True))
+            products.delete()
+
+        results = [{"id": pk, "status": "deleted" if pk in existing else "not_found"} for pk in ids]
+        return Response({"deleted": len(existing), "results": results}, status=status.HTTP_200_OK)
+
+    delete = post